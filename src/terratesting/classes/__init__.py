@@ -2,4 +2,10 @@ from .base import *
 from .state import *
 from .defaults import *
 from .workspace import *
+from .outputs import *
+from .parallelism import *
+from .graph import *
+from .timeline import *
+from .profile import *
+from .history import *
 from .exceptions import *
@@ -1,7 +1,4 @@
-import sys
-
-sys.path.append("..")
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
 
 class TerraformResult:
@@ -34,11 +31,18 @@ class Terraform:
         lock (bool): Whether to use state locking
         lock_timeout (str): How long to wait for state lock
         interactive (bool): Whether to ask for input interactively
-        paralellism (int): Number of parallel operations
+        paralellism (int|str): Number of parallel operations, "auto" to let `tuner` pick it
+        tuner (ParallelismTuner): Picks the parallelism of "auto" runs from the previous ones
         color (bool): Whether to use color in output
         var_file (str): Path to variable definition file
         plan_file (str): Default plan file name
+        refresh_ttl (float): Seconds a full refresh stays fresh for `refresh="auto"`
+        history (DurationStore): Duration of every command per stack and workspace, None unless `history_file` is given, `HISTORY_FILE` is the shared default location
+        raw_output (bool): Write shown command output as is in buffered chunks instead of one log record per line
         version_dict (dict): Terraform version information
+        env (dict): Extra environment variables passed to every terraform command
+        log_context (LogContext): Env label and nesting of this instance's logs, active during every method call of the instance whatever the thread, use `with tf.log_context.use():` for other log calls
+        outputs (Outputs): Root module outputs read from the cached state snapshot
         cmd_name (str): The base Terraform command (default: 'terraform')
 
     Example:
@@ -60,11 +64,16 @@ class Terraform:
     lock_timeout: str
     interactive: bool
     workspace: str
-    paralellism: int
+    paralellism: Union[int, str]
     color: bool
     var_file: str
     plan_file: str
+    refresh_ttl: float
+    history: Any
+    raw_output: bool
     version_dict: Dict
+    env: Dict[str, str]
+    log_context: Any
     cmd_name: str
 
     def version(self, quiet: Optional[bool] = False) -> TerraformResult:
@@ -173,9 +182,11 @@ class Terraform:
         command: list,
         title: Optional[str] = None,
         chdir: Optional[str] = None,
-        show_output: bool = True,
+        show_output: Union[bool, str] = True,
         callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
         line_callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
+        stdin: Optional[Any] = None,
+        env: Optional[Dict[str, str]] = None,
     ):
         """Run CLI Terraform command
 
@@ -186,9 +197,11 @@ class Terraform:
             command (list): List of arguments for terraform command
             title (str, optional): Title of the command to run. Defaults to None.
             chdir (str, optional): Working directory to run the command in. Defaults to None.
-            show_output (bool, optional): Show command output. Defaults to True.
+            show_output (bool|str, optional): Show command output, "raw" writes it as is in buffered chunks. Defaults to True.
             callback (Callable(str,str)->Any, optional): Function to handle command output (stdout,stderr). Defaults to None.
             line_callback (Callable(str,str)->Any, optional): Function to handle per line command output. Defaults to None.
+            stdin (bytes|str|IO|Iterable, optional): Data streamed to the command stdin. Defaults to None.
+            env (dict, optional): Extra environment variables for the command, merged over `env`. Defaults to None.
 
         Returns:
             CommandResult: Result of the command with attributes:
@@ -213,9 +226,11 @@ class Terraform:
         command: list,
         title: Optional[str] = None,
         chdir: Optional[str] = None,
-        show_output: bool = True,
+        show_output: Union[bool, str] = True,
         callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
         line_callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
+        stdin: Optional[Any] = None,
+        env: Optional[Dict[str, str]] = None,
     ):
         """Run CLI Terraform command
 
@@ -226,9 +241,11 @@ class Terraform:
             command (list): List of arguments for terraform command
             title (str, optional): Title of the command to run. Defaults to None.
             chdir (str, optional): Working directory to run the command in. Defaults to None.
-            show_output (bool, optional): Show command output. Defaults to True.
+            show_output (bool|str, optional): Show command output, "raw" writes it as is in buffered chunks. Defaults to True.
             callback (Callable(str,str)->Any, optional): Function to handle command output (stdout,stderr). Defaults to None.
             line_callback (Callable(str,str)->Any, optional): Function to handle per line command output. Defaults to None.
+            stdin (bytes|str|IO|Iterable, optional): Data streamed to the command stdin. Defaults to None.
+            env (dict, optional): Extra environment variables for the command, merged over `env`. Defaults to None.
 
         Returns:
             CommandResult: Result of the command with attributes:
@@ -248,6 +265,39 @@ class Terraform:
         """
         pass
 
+    def for_each_workspace(
+        self,
+        names: Iterable[str],
+        fn: Callable[["Terraform"], Any],
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, TerraformResult]:
+        """Run an operation concurrently against several workspaces
+
+        Each job gets a copy of this object bound to one workspace through the
+        `TF_WORKSPACE` environment variable and its own plan file, so nothing is
+        selected in `.terraform/environment` and the jobs can share one initialized
+        directory. The workspaces must already exist.
+
+        Args:
+            names (Iterable[str]): Workspaces to run on.
+            fn (Callable(Terraform)->Any): Operation to run, receives the workspace bound object.
+            max_workers (int, optional): Maximum concurrent jobs. Defaults to one per workspace (max 32).
+
+        Raises:
+            TerraformError: If any of the workspaces does not exist
+
+        Returns:
+            Dict[str, TerraformResult]: Result per workspace, holding the `fn` return value or the raised exception
+
+        Example:
+            ```python
+            results = tf.for_each_workspace(
+                ["dev", "staging", "prod"], lambda ws: ws.plan(vars=vars)
+            )
+            ```
+        """
+        pass
+
     def init(
         self,
         color: Optional[bool] = None,
@@ -312,14 +362,18 @@ class Terraform:
     @staticmethod
     def _parse_vars(vars: Optional[Dict[str, Any]] = None) -> List[str]:
         """
-        Parse variable dictionary into command-line arguments.
+        Write the variable dictionary to a var file and return the argument to load it.
+
+        The file is named after the hash of its content in a private temp directory,
+        reused by every call with the same vars and removed on exit, so the command
+        line size does not grow with the vars and no shell quoting is involved.
 
         Args:
             vars (Dict[str, Any], optional): Dictionary of variable values.
                 Defaults to None.
 
         Returns:
-            List[str]: List of formatted variable arguments
+            List[str]: The `-var-file=<path>` argument, empty if there are no vars
         """
         pass
 
@@ -327,10 +381,10 @@ class Terraform:
         self,
         out: Optional[str] = None,
         destroy: bool = False,
-        refresh: Optional[bool] = True,
+        refresh: Optional[Union[bool, str]] = True,
         refresh_only: bool = False,
-        replace: Optional[str] = None,
-        target: Optional[str] = None,
+        replace: Optional[Union[str, List[str]]] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -339,19 +393,21 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         chdir: Optional[str] = None,
         state: Optional[str] = None,
+        detailed_exitcode: bool = False,
+        has_changes_only: bool = False,
     ):
         """Terraform Plan Command
 
         Args:
             out (str, optional): Writes the generated plan to the given filename in an opaque file format that you can later pass to terraform apply to execute the planned changes. `-out=<filename>` arg Defaults to None.
             destroy (bool, optional): Plan terraform to destroy resources. `-destroy` arg. Defaults to False.
-            refresh (bool, optional): Ignore external state changes if false. `-refresh=<true|false>` arg. Defaults to True.
+            refresh (bool|str, optional): Ignore external state changes if false. With "auto" the refresh is skipped while the last full refresh of an "auto" plan on the same state serial is younger than `refresh_ttl`, recorded in the data dir for the local backend only. `-refresh=<true|false>` arg. Defaults to True.
             refresh_only (bool, optional): Only update terraform state. -refresh-only arg. Defaults to False.
-            replace (str, optional): Instructs Terraform to plan to replace the resource instance with the given address. `-replace=<value>` arg. Defaults to None.
-            target (str, optional): Instructs Terraform to focus its planning efforts only on resource instances which match the given address. `-target=<value>` arg. Defaults to None.
+            replace (str|List[str], optional): Instructs Terraform to plan to replace the resource instances with the given addresses. `-replace=<value>` arg, repeated per address. Defaults to None.
+            target (str|List[str], optional): Instructs Terraform to focus its planning efforts only on resource instances which match the given addresses. `-target=<value>` arg, repeated per address. Addresses nested in another target are dropped, and when the command line would exceed ARG_MAX the targets are split over several sequential runs. Defaults to None.
             vars (dict, optional): Dict of vars to pass on CLI. `-var key=value` args in dict format. Defaults to None.
             var_file (str, optional): Path to terraform vars file. `-var-file=<path>` arg. Defaults to None.
             compact_warnings (bool, optional): Shows any warning messages in a compact form. `-compact-warnings` arg. Defaults to False.
@@ -360,15 +416,44 @@ class Terraform:
             lock (bool, optional): Don't hold a state lock during the operation. `-lock=<true|false>` arg. Defaults to None.
             lock_timeout (str, optional): Unless locking is disabled with -lock=false, instructs Terraform to retry acquiring a lock for a period of time before returning an error. `-lock-timeout<int>` arg. Defaults to None.
             color (bool, optional): Enable color output. Defaults to None.
-            parallelism (int, optional): Limit the number of concurrent operations as Terraform walks the graph. `-paralellism=<int>` arg. Defaults to 20.
+            parallelism (int, optional): Limit the number of concurrent operations as Terraform walks the graph, "auto" uses the parallelism tuned from the throttling seen in previous runs. `-paralellism=<int>` arg. Defaults to 20.
             chdir (str, optional): Directory to run the command at. `-chdir=<path>` arg. Defaults to None.
             state (str, optional): Pass the local state file to plan. `-state=<path>` arg. Defaults to None.
+            detailed_exitcode (bool, optional): Exit code 2 means the plan has changes instead of a failure, reported as `has_changes`. `-detailed-exitcode` arg. Defaults to False.
+            has_changes_only (bool, optional): Fast check, implies `detailed_exitcode`, writes no plan file and only parses the change summary from the streamed output. Defaults to False.
 
         Raises:
             TerraformError: Terraform Plan Exception
 
         Returns:
-            bool|dict: Returns true if success or the plan output file parsed with 'terraform show -json' command
+            dict: Command stdout, callback output and the written `plan_files`, one per run when the targets were split, plus `has_changes` with `detailed_exitcode`. With `has_changes_only` just the stdout, `has_changes` and the `changes` counts
+        """
+        pass
+
+    def refresh_profile(
+        self,
+        target: Optional[Union[str, List[str]]] = None,
+        vars: Optional[dict] = None,
+        var_file: Optional[str] = None,
+        trace: bool = False,
+        parallelism: Optional[Union[int, str]] = None,
+        chdir: Optional[str] = None,
+    ):
+        """Time the refresh of each resource during a plan without plan file
+
+        Args:
+            target (str|List[str], optional): Only profile these addresses and their dependencies. Defaults to None.
+            vars (dict, optional): Dict of vars to pass on CLI. Defaults to None.
+            var_file (str, optional): Path to terraform vars file. Defaults to None.
+            trace (bool, optional): Read the timings from a `TF_LOG=trace` log instead of the `-json` events, always the case before terraform 1.0. Defaults to False.
+            parallelism (int|str, optional): Parallelism of the plan. Defaults to None.
+            chdir (str, optional): Directory to run the command at. Defaults to None.
+
+        Raises:
+            TerraformError: Terraform Plan Exception
+
+        Returns:
+            RefreshProfile: Refresh timings, `report()` ranks them by resource, type and provider
         """
         pass
 
@@ -397,13 +482,13 @@ class Terraform:
 
     def apply(
         self,
-        plan_file: Optional[str] = None,
+        plan_file: Optional[Union[str, List[str]]] = None,
         auto_approve: bool = False,
         destroy: bool = False,
-        refresh: Optional[bool] = True,
+        refresh: Optional[Union[bool, str]] = True,
         refresh_only: bool = False,
-        replace: Optional[str] = None,
-        target: Optional[str] = None,
+        replace: Optional[Union[str, List[str]]] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -412,22 +497,23 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
         backup: Optional[str] = None,
         chdir: Optional[str] = None,
+        replan: bool = False,
     ):
         """Terraform Plan Command
 
         Args:
-            plan_file (str, optional): Plan state file result. Defaults to None.
+            plan_file (str|List[str], optional): Plan file, or the `plan_files` of a split plan applied in order. Defaults to None.
             auto_approve (bool, optional): Auto approve apply. Defaults to False.
             destroy (bool, optional): Plan terraform to destroy resources. `-destroy` arg. Defaults to False.
-            refresh (bool, optional): Ignore external state changes if false. `-refresh=<true|false>` arg. Defaults to True.
+            refresh (bool|str, optional): Ignore external state changes if false. With "auto" the refresh is skipped while the last full refresh of an "auto" plan on the same state serial is younger than `refresh_ttl`, recorded in the data dir for the local backend only. `-refresh=<true|false>` arg. Defaults to True.
             refresh_only (bool, optional): Only update terraform state. -refresh-only arg. Defaults to False.
-            replace (str, optional): Instructs Terraform to plan to replace the resource instance with the given address. `-replace=<value>` arg. Defaults to None.
-            target (str, optional): Instructs Terraform to focus its planning efforts only on resource instances which match the given address. `-target=<value>` arg. Defaults to None.
+            replace (str|List[str], optional): Instructs Terraform to plan to replace the resource instances with the given addresses. `-replace=<value>` arg, repeated per address. Defaults to None.
+            target (str|List[str], optional): Instructs Terraform to focus its planning efforts only on resource instances which match the given addresses. `-target=<value>` arg, repeated per address. Addresses nested in another target are dropped, and when the command line would exceed ARG_MAX the targets are split over several sequential runs. Defaults to None.
             vars (dict, optional): Dict of vars to pass on CLI. `-var key=value` args in dict format. Defaults to None.
             var_file (str, optional): Path to terraform vars file. `-var-file=<path>` arg. Defaults to None.
             compact_warnings (bool, optional): Shows any warning messages in a compact form. `-compact-warnings` arg. Defaults to False.
@@ -436,24 +522,25 @@ class Terraform:
             lock (bool, optional): Don't hold a state lock during the operation. `-lock=<true|false>` arg. Defaults to None.
             lock_timeout (str, optional): Unless locking is disabled with -lock=false, instructs Terraform to retry acquiring a lock for a period of time before returning an error. `-lock-timeout<int>` arg. Defaults to None.
             color (bool, optional): Enable color output. Defaults to None.
-            parallelism (int, optional): Limit the number of concurrent operations as Terraform walks the graph. `-paralellism=<int>` arg. Defaults to 20.
+            parallelism (int, optional): Limit the number of concurrent operations as Terraform walks the graph, "auto" uses the parallelism tuned from the throttling seen in previous runs. `-paralellism=<int>` arg. Defaults to 20.
             state (str, optional): Overrides the state filename when reading the prior state snapshot. `-state=<path>` arg. Defaults to None.
             state_out (str, optional):overrides the state filename when writing new state snapshots. `-state-out=<path>` arg. Defaults to None.
             backup (str, optional): Overrides the default filename that the local backend would normally choose dynamically to create backup files when it writes new state. `-backup=<path>` arg. Defaults to None.
             chdir (str, optional): Directory to run the command at. `-chdir=<path>` arg. Defaults to None.
+            replan (bool, optional): Plan each part of a split plan again with its original command after the previous one is applied, the applied plans are then not the reviewed ones. Without it only a single plan file is applied. Defaults to False.
 
         Raises:
             TerraformError: Terraform Apply Exception
 
         Returns:
-            Any: Output from callback
+            Any: Command stdout, in -json mode a dict with the stdout, the callback output and the `timeline` of the resource operations
         """
 
         pass
 
     def destroy(
         self,
-        target: Optional[str] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[Dict[str, Any]] = None,
         var_file: Optional[str] = None,
         auto_approve: bool = False,
@@ -461,14 +548,14 @@ class Terraform:
         color: Optional[bool] = None,
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         chdir: Optional[str] = None,
     ) -> bool:
         """
         Destroy Terraform-managed infrastructure.
 
         Args:
-            target (str, optional): Resource address to target. Defaults to None.
+            target (str|List[str], optional): Resource addresses to target, split over several runs if they exceed ARG_MAX. Defaults to None.
             vars (Dict[str, Any], optional): Dictionary of variable values. Defaults to None.
             var_file (str, optional): Path to variable file. Defaults to None.
             auto_approve (bool): Skip interactive approval. Defaults to False.
@@ -570,6 +657,53 @@ class Terraform:
     ):
         pass
 
+    def duration_summary(
+        self,
+        command: str,
+        percentiles: Iterable[float] = (50, 90, 99),
+        chdir: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Duration percentiles of a command on this stack and workspace
+
+        Args:
+            command (str): Command name, like `plan` or `state pull`
+            percentiles (Iterable[float], optional): Percentiles to compute. Defaults to (50, 90, 99).
+            chdir (str, optional): Stack directory. Defaults to None.
+
+        Raises:
+            TerraformError: The history is disabled, no `history_file` was given
+
+        Returns:
+            dict: `count`, `mean`, `min`, `max` and one `p<rank>` key per percentile
+        """
+        pass
+
+    def dependency_graph(
+        self,
+        type: Optional[str] = None,
+        plan: Optional[str] = None,
+        refresh: Optional[bool] = False,
+        chdir: Optional[str] = None,
+    ):
+        """Dependency graph of the stack parsed from `terraform graph`
+
+        The graph is cached by a hash of the configuration files, including the
+        installed modules, and of the plan file when one is given.
+
+        Args:
+            type (str, optional): Type of graph to output, one of TERRAFORM_GRAPH_TYPES. Defaults to None.
+            plan (str, optional): Plan file to render the graph of. Defaults to None.
+            refresh (bool, optional): Ignore the cached graph. Defaults to False.
+            chdir (str, optional): Directory to run the command at. Defaults to None.
+
+        Raises:
+            TerraformError: Terraform Graph Exception
+
+        Returns:
+            DependencyGraph: Parsed graph with layering, cycle and ancestor queries
+        """
+        pass
+
     def Import(
         self,
         address: str,
@@ -579,7 +713,7 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[int] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         provider: Optional[str] = None,
         vars: Optional[Dict[str, Any]] = None,
         var_file: Optional[str] = None,
@@ -590,9 +724,48 @@ class Terraform:
     ):
         pass
 
+    def bulk_import(
+        self,
+        mapping: Dict[str, str],
+        vars: Optional[Dict[str, Any]] = None,
+        var_file: Optional[str] = None,
+        parallelism: Optional[Union[int, str]] = None,
+        lock: Optional[bool] = None,
+        lock_timeout: Optional[str] = None,
+        allow_other_changes: bool = False,
+        max_workers: int = 4,
+        chdir: Optional[str] = None,
+    ) -> TerraformResult:
+        """Import many existing resources at once
+
+        On terraform >= 1.5 a temporary file of `import` blocks is written to the
+        module directory and everything is imported by a single plan/apply, then the
+        file and plan are removed. Older versions fall back to running `terraform import`
+        per address with at most `max_workers` concurrent runs, waiting on the state
+        lock and retrying when it is held.
+
+        Args:
+            mapping (Dict[str, str]): Resource address to remote object ID.
+            vars (dict, optional): Dict of vars to pass on CLI. Defaults to None.
+            var_file (str, optional): Path to terraform vars file. Defaults to None.
+            parallelism (int, optional): Terraform graph parallelism. Defaults to None.
+            lock (bool, optional): Use state locking. Defaults to None.
+            lock_timeout (str, optional): State lock timeout. Defaults to None (60s in the fallback).
+            allow_other_changes (bool, optional): Apply even when the plan changes resources outside `mapping`. Defaults to False.
+            max_workers (int, optional): Concurrent imports for the fallback. Defaults to 4.
+            chdir (str, optional): Directory to run the command at. Defaults to None.
+
+        Raises:
+            TerraformError: If the plan or apply fails, or the plan changes other resources
+
+        Returns:
+            TerraformResult: Success when every address was imported, the result maps each address to its own TerraformResult
+        """
+        pass
+
     def _legacy_refresh(
         self,
-        target: Optional[str] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -600,7 +773,7 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
         backup: Optional[str] = None,
@@ -610,7 +783,7 @@ class Terraform:
 
     def refresh(
         self,
-        target: Optional[str] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -619,7 +792,7 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
         backup: Optional[str] = None,
@@ -643,7 +816,7 @@ class Terraform:
 
     def taint(
         self,
-        address: str,
+        address: Union[str, List[str]],
         backup: Optional[str] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
@@ -655,11 +828,26 @@ class Terraform:
         var_file: Optional[str] = None,
         chdir: Optional[str] = None,
     ):
+        """Mark resource instances for replacement
+
+        Since 0.15.2 this plans with one `-replace=<address>` per address into the
+        default plan file, apply it to replace the instances, `backup`, `state_out`,
+        `ignore_remote_version` and `allow_missing` raise a TerraformError then.
+        Older versions run `terraform taint` for a single address, or flag all the
+        instances in the state and push it once, with the lock args, when several
+        addresses are given.
+
+        Args:
+            address (str|List[str]): Resource instance address or addresses.
+
+        Returns:
+            TerraformResult: Plan result, or the list of tainted addresses
+        """
         pass
 
     def untaint(
         self,
-        address: str,
+        address: Union[str, List[str]],
         backup: Optional[str] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
@@ -669,6 +857,18 @@ class Terraform:
         lock_timeout: Optional[str] = None,
         chdir: Optional[str] = None,
     ):
+        """Remove the tainted flag from resource instances
+
+        Several addresses are untainted in memory and the state is pulled and pushed
+        once, with the lock args, `backup`, `state` and `state_out` raise a
+        TerraformError then.
+
+        Args:
+            address (str|List[str]): Resource instance address or addresses.
+
+        Returns:
+            TerraformResult: Command output, or the list of untainted addresses
+        """
         pass
 
     def force_unlock(
@@ -1,6 +1,26 @@
 import re
 
 VERSION_REGEX = re.compile(r"^(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)$")
+PLAN_SUMMARY_REGEX = re.compile(
+    r"Plan: (?P<add>\d+) to add, (?P<change>\d+) to change, (?P<remove>\d+) to destroy"
+)
+THROTTLE_REGEX = re.compile(
+    r"throttl|rate ?limit|rate exceeded|too ?many ?requests|requestlimitexceeded"
+    r"|slow ?down|quota exceeded|\b429\b",
+    re.IGNORECASE,
+)
+# Terraform writes the serial and lineage at the top of every state file
+STATE_SERIAL_REGEX = re.compile(r'"serial":\s*(?P<serial>\d+)')
+STATE_LINEAGE_REGEX = re.compile(r'"lineage":\s*"(?P<lineage>[^"]*)"')
+# Header of an error or warning block, boxed in the human output unless -no-color
+DIAGNOSTIC_REGEX = re.compile(r"^[│\s]*(Error|Warning): ")
+RESOURCE_OPERATION_REGEX = re.compile(
+    r": (Refreshing state|Reading|Creation complete|Modifications complete"
+    r"|Destruction complete|Read complete)"
+)
+
+# Environment of every terraform command, over the process one
+TERRAFORM_ENV = {"TF_IN_AUTOMATION": "1"}
 
 TERRAFORM_ARGS = {
     "color": "-no-color",
@@ -55,6 +75,7 @@ TERRAFORM_ARGS = {
     "dry_run": "-dry-run",
     "force": "-force",
     "or_create": "-or-create",
+    "detailed_exitcode": "-detailed-exitcode",
 }
 
 TERRAFORM_GRAPH_TYPES = [
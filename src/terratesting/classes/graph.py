@@ -0,0 +1,361 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+from .exceptions import *
+import json as _json
+import os
+import re
+
+DOT_ID = r'"((?:[^"\\]|\\.)*)"'
+DOT_EDGE_REGEX = re.compile(rf"^\s*{DOT_ID}\s*->\s*{DOT_ID}")
+DOT_NODE_REGEX = re.compile(rf"^\s*{DOT_ID}\s*(?:\[(?P<attrs>.*)\])?\s*;?\s*$")
+NODE_DECORATION_REGEX = re.compile(
+    r"^\[root\] |\s+\((?:expand|close|prepare state|orphan)\)$"
+)
+NODE_MODULE_REGEX = re.compile(
+    r"^(?P<module>(?:module\.[^.\[]+(?:\[[^\]]+\])?\.)*)(?P<rest>.*)$"
+)
+CONFIG_EXTENSIONS = (".tf", ".tf.json", ".tfvars", ".tfvars.json")
+
+
+def __unescape__(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def __node_name__(name: str) -> str:
+    previous = None
+    while previous != name:
+        previous, name = name, NODE_DECORATION_REGEX.sub("", name)
+    return name
+
+
+def config_hash(workdir: str) -> str:
+    """Hash of the configuration files of a stack and of its installed modules
+
+    Args:
+        workdir (str): Root module directory
+
+    Returns:
+        str: sha256 hex digest
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    dirs = [workdir]
+    data_dir = os.path.join(workdir, os.environ.get("TF_DATA_DIR", ".terraform"))
+    try:
+        with open(os.path.join(data_dir, "modules", "modules.json"), "r") as file:
+            modules = _json.load(file).get("Modules") or []
+        dirs.extend(
+            os.path.join(workdir, module["Dir"])
+            for module in modules
+            if module.get("Dir")
+        )
+    except (OSError, ValueError):
+        pass
+    for directory in dict.fromkeys(os.path.normpath(d) for d in dirs):
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            if not name.endswith(CONFIG_EXTENSIONS) and name != ".terraform.lock.hcl":
+                continue
+            path = os.path.join(directory, name)
+            try:
+                with open(path, "rb") as file:
+                    digest.update(path.encode() + b"\0" + file.read() + b"\0")
+            except OSError:
+                continue
+    return digest.hexdigest()
+
+
+class GraphNode:
+    """Node of a terraform dependency graph
+
+    Attributes:
+        name (str): Address of the node without the `[root]` prefix and `(expand)` suffixes
+        kind (str): One of resource, data, module, provider, variable, local, output or meta
+        module (str): Module path of the node, empty for the root module
+        provider (str): Provider node the resource depends on, if any
+        label (str): DOT label of the node
+    """
+
+    name: str
+    kind: str
+    module: str
+    provider: Optional[str]
+    label: Optional[str]
+
+    def __init__(self, name: str, label: Optional[str] = None):
+        self.name = name
+        self.label = label
+        self.provider = None
+        match = NODE_MODULE_REGEX.match(name)
+        self.module = match.group("module").rstrip(".")
+        rest = match.group("rest")
+        if rest.startswith("provider[") or rest.startswith("provider."):
+            self.kind = "provider"
+        elif rest.startswith("data."):
+            self.kind = "data"
+        elif rest.startswith("var."):
+            self.kind = "variable"
+        elif rest.startswith("local."):
+            self.kind = "local"
+        elif rest.startswith("output."):
+            self.kind = "output"
+        elif not rest and self.module:
+            self.kind = "module"
+        elif rest.count(".") >= 1 and not rest.startswith("meta.") and " " not in rest:
+            self.kind = "resource"
+        else:
+            self.kind = "meta"
+
+    def __str__(self):
+        return f"GraphNode(name={self.name}, kind={self.kind})"
+
+
+class DependencyGraph:
+    """Dependency graph parsed from `terraform graph`
+
+    Edges point from a node to the nodes it depends on, so ancestors are the
+    transitive dependencies of a node and descendants the nodes depending on it.
+
+    Attributes:
+        nodes (Dict[str, GraphNode]): Nodes by name
+        dependencies (Dict[str, Set[str]]): Direct dependencies of each node
+        dependents (Dict[str, Set[str]]): Direct dependents of each node
+    """
+
+    nodes: Dict[str, GraphNode]
+    dependencies: Dict[str, Set[str]]
+    dependents: Dict[str, Set[str]]
+
+    def __init__(self):
+        self.nodes = {}
+        self.dependencies = {}
+        self.dependents = {}
+
+    def add_node(self, name: str, label: Optional[str] = None) -> GraphNode:
+        node = self.nodes.get(name)
+        if node is None:
+            node = GraphNode(name, label)
+            self.nodes[name] = node
+            self.dependencies[name] = set()
+            self.dependents[name] = set()
+        elif label and not node.label:
+            node.label = label
+        return node
+
+    def add_edge(self, name: str, dependency: str):
+        self.add_node(name)
+        self.add_node(dependency)
+        if name == dependency:
+            return
+        self.dependencies[name].add(dependency)
+        self.dependents[dependency].add(name)
+
+    @staticmethod
+    def from_dot(dot: str) -> "DependencyGraph":
+        """Parse the DOT output of `terraform graph`, both the legacy and the 1.7+ format"""
+        graph = DependencyGraph()
+        for line in dot.splitlines():
+            match = DOT_EDGE_REGEX.match(line)
+            if match:
+                graph.add_edge(
+                    __node_name__(__unescape__(match.group(1))),
+                    __node_name__(__unescape__(match.group(2))),
+                )
+                continue
+            match = DOT_NODE_REGEX.match(line)
+            if match:
+                label = re.search(rf"label\s*=\s*{DOT_ID}", match.group("attrs") or "")
+                graph.add_node(
+                    __node_name__(__unescape__(match.group(1))),
+                    __unescape__(label.group(1)) if label else None,
+                )
+        graph.nodes.pop("root", None)
+        for name in graph.dependents.pop("root", set()):
+            graph.dependencies[name].discard("root")
+        for name in graph.dependencies.pop("root", set()):
+            graph.dependents[name].discard("root")
+        for name, node in graph.nodes.items():
+            if node.kind in ("resource", "data"):
+                providers = [
+                    dependency
+                    for dependency in graph.dependencies[name]
+                    if graph.nodes[dependency].kind == "provider"
+                ]
+                node.provider = min(providers) if providers else None
+        return graph
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.nodes
+
+    def __check__(self, name: str):
+        if name not in self.nodes:
+            raise TerraformError(f"Node '{name}' not found in the graph", "graph")
+
+    def __walk__(self, names: Iterable[str], edges: Dict[str, Set[str]]) -> Set[str]:
+        seen = set()
+        stack = list(names)
+        while stack:
+            for following in edges[stack.pop()]:
+                if following not in seen:
+                    seen.add(following)
+                    stack.append(following)
+        return seen
+
+    def ancestors(self, name: str) -> Set[str]:
+        """Every node the given node depends on, directly or not"""
+        self.__check__(name)
+        return self.__walk__([name], self.dependencies)
+
+    def descendants(self, name: str) -> Set[str]:
+        """Every node depending on the given node, directly or not"""
+        self.__check__(name)
+        return self.__walk__([name], self.dependents)
+
+    def of_kind(self, *kinds: str) -> List[str]:
+        return [name for name, node in self.nodes.items() if node.kind in kinds]
+
+    def subgraph(
+        self, kinds: Iterable[str] = ("resource", "data")
+    ) -> "DependencyGraph":
+        """Graph restricted to the given node kinds
+
+        Dependencies going through dropped nodes, like variables or locals, are kept
+        as direct edges between the remaining nodes.
+        """
+        kinds = set(kinds)
+        graph = DependencyGraph()
+        for name, node in self.nodes.items():
+            if node.kind not in kinds:
+                continue
+            kept = graph.add_node(name, node.label)
+            kept.provider = node.provider
+            seen = set()
+            stack = list(self.dependencies[name])
+            while stack:
+                dependency = stack.pop()
+                if dependency in seen:
+                    continue
+                seen.add(dependency)
+                if self.nodes[dependency].kind in kinds:
+                    graph.add_edge(name, dependency)
+                else:
+                    stack.extend(self.dependencies[dependency])
+        return graph
+
+    def cycles(self) -> List[List[str]]:
+        """Strongly connected components with more than one node, iterative Tarjan"""
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+        for root in self.nodes:
+            if root in index:
+                continue
+            work = [(root, iter(sorted(self.dependencies[root])))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                name, children = work[-1]
+                child = next(children, None)
+                if child is not None:
+                    if child not in index:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self.dependencies[child]))))
+                    elif child in on_stack:
+                        low[name] = min(low[name], index[child])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[name])
+                if low[name] == index[name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    if len(component) > 1:
+                        cycles.append(sorted(component))
+        return cycles
+
+    def layers(self) -> List[List[str]]:
+        """Topological layers, the first one holds the nodes without dependencies
+
+        Every node of a layer only depends on nodes of the previous layers, so a
+        layer is the set of nodes terraform could walk at the same time.
+
+        Raises:
+            TerraformError: The graph has cycles
+        """
+        remaining = {
+            name: len(dependencies) for name, dependencies in self.dependencies.items()
+        }
+        layer = sorted(name for name, count in remaining.items() if count == 0)
+        layers = []
+        while layer:
+            layers.append(layer)
+            following = []
+            for name in layer:
+                for dependent in self.dependents[name]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        following.append(dependent)
+            layer = sorted(following)
+        if sum(len(layer) for layer in layers) != len(self.nodes):
+            raise TerraformError(
+                f"The graph has cycles: {self.cycles()}",
+                "graph",
+            )
+        return layers
+
+    def minimal_targets(self, addresses: Iterable[str]) -> List[str]:
+        """Drop the addresses another one already pulls in as a dependency
+
+        `-target` includes the dependencies of each target, so only the addresses
+        no other address depends on are needed.
+        """
+        addresses = list(dict.fromkeys(addresses))
+        for address in addresses:
+            self.__check__(address)
+        covered = self.__walk__(addresses, self.dependencies)
+        return [address for address in addresses if address not in covered]
+
+    def report(self) -> Dict[str, Any]:
+        """Size, depth and width of the graph
+
+        Returns:
+            dict: `nodes`, `edges`, node count per `kinds`, `depth` as the number of
+                layers, `width` as the widest layer, `layer_widths` and `cycles`
+        """
+        cycles = self.cycles()
+        layers = [] if cycles else self.layers()
+        kinds = {}
+        for node in self.nodes.values():
+            kinds[node.kind] = kinds.get(node.kind, 0) + 1
+        return dict(
+            nodes=len(self.nodes),
+            edges=sum(len(dependencies) for dependencies in self.dependencies.values()),
+            kinds=kinds,
+            depth=len(layers),
+            width=max((len(layer) for layer in layers), default=0),
+            layer_widths=[len(layer) for layer in layers],
+            cycles=cycles,
+        )
+
+    def __str__(self):
+        return f"DependencyGraph(nodes={len(self.nodes)})"
@@ -0,0 +1,214 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from contextlib import closing
+import heapq
+import os
+import sqlite3
+import time
+
+HISTORY_FILE = os.path.join("~", ".terratesting", "history.db")
+HISTORY_LIMIT = 100
+ETA_MIN_SECONDS = 5
+# Quick commands, recording them would cost more than they take
+HISTORY_IGNORED = frozenset(
+    (
+        "version",
+        "fmt",
+        "output",
+        "workspace list",
+        "workspace show",
+        "workspace select",
+        "state list",
+    )
+)
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stack TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    command TEXT NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    resources INTEGER,
+    changes_add INTEGER,
+    changes_change INTEGER,
+    changes_remove INTEGER,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_lookup ON runs (stack, workspace, command, id);
+"""
+
+
+def percentile(values: List[float], rank: float) -> Optional[float]:
+    """Linear interpolated percentile of the values, None when there are none"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * rank / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class DurationStore:
+    """Durations and change counts of every terraform command, kept in SQLite
+
+    Runs are keyed by stack, the absolute working directory, workspace and
+    command, like `plan` or `state pull`. Only the latest `limit` runs of each
+    key are kept.
+
+    Attributes:
+        path (str): SQLite database file
+        limit (int): Runs kept per stack, workspace and command
+    """
+
+    path: str
+    limit: int
+
+    def __init__(self, path: str = HISTORY_FILE, limit: int = HISTORY_LIMIT):
+        self.path = os.path.expanduser(path)
+        self.limit = limit
+        self.__ready__ = False
+
+    def __connect__(self) -> sqlite3.Connection:
+        if not self.__ready__:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self.__ready__:
+            connection.executescript(HISTORY_SCHEMA)
+            self.__ready__ = True
+        return connection
+
+    def record(
+        self,
+        stack: str,
+        workspace: str,
+        command: str,
+        duration: float,
+        success: bool = True,
+        resources: Optional[int] = None,
+        changes: Optional[Dict[str, int]] = None,
+    ):
+        changes = changes or {}
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                "INSERT INTO runs (stack, workspace, command, duration, success, resources,"
+                " changes_add, changes_change, changes_remove, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    stack,
+                    workspace,
+                    command,
+                    duration,
+                    int(bool(success)),
+                    resources,
+                    changes.get("add"),
+                    changes.get("change"),
+                    changes.get("remove"),
+                    time.time(),
+                ),
+            )
+            connection.execute(
+                "DELETE FROM runs WHERE stack = ? AND workspace = ? AND command = ?"
+                " AND id <= (SELECT id FROM runs WHERE stack = ? AND workspace = ?"
+                " AND command = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (stack, workspace, command, stack, workspace, command, self.limit),
+            )
+
+    def runs(
+        self,
+        stack: str,
+        workspace: str,
+        command: str,
+        limit: int = HISTORY_LIMIT,
+        successful: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Latest runs of a command, newest first"""
+        query = "SELECT * FROM runs WHERE stack = ? AND workspace = ? AND command = ?"
+        if successful:
+            query += " AND success = 1"
+        with closing(self.__connect__()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(
+                query + " ORDER BY id DESC LIMIT ?", (stack, workspace, command, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def summary(
+        self,
+        stack: str,
+        workspace: str,
+        command: str,
+        percentiles: Iterable[float] = (50, 90, 99),
+        limit: int = HISTORY_LIMIT,
+    ) -> Dict[str, Any]:
+        """Duration percentiles of the latest successful runs
+
+        Returns:
+            dict: `count`, `mean`, `min`, `max` and one `p<rank>` key per percentile
+        """
+        durations = [
+            run["duration"] for run in self.runs(stack, workspace, command, limit)
+        ]
+        summary = dict(
+            count=len(durations),
+            mean=sum(durations) / len(durations) if durations else None,
+            min=min(durations, default=None),
+            max=max(durations, default=None),
+        )
+        for rank in percentiles:
+            summary[f"p{rank:g}"] = percentile(durations, rank)
+        return summary
+
+    def predict(
+        self,
+        stack: str,
+        workspace: str,
+        command: str,
+        rank: float = 50,
+        limit: int = 20,
+    ) -> Optional[float]:
+        """Expected duration of the next run, None without history"""
+        durations = [
+            run["duration"] for run in self.runs(stack, workspace, command, limit)
+        ]
+        return percentile(durations, rank)
+
+    def predict_fleet(
+        self,
+        stacks: Iterable[Union[str, Tuple[str, str]]],
+        commands: Iterable[str] = ("plan",),
+        workers: int = 1,
+        rank: float = 50,
+    ) -> Dict[str, Any]:
+        """Expected time of a run over many stacks, longest first
+
+        Args:
+            stacks (Iterable[str|Tuple[str, str]]): Stack directories, or `(stack, workspace)` pairs, the default workspace otherwise
+            commands (Iterable[str], optional): Commands run on each stack. Defaults to ("plan",).
+            workers (int, optional): Stacks run at the same time. Defaults to 1.
+            rank (float, optional): Percentile used for each prediction. Defaults to 50.
+
+        Returns:
+            dict: `total` wall time with the longest-first schedule over the workers,
+                the `order` to start the stacks in with their expected time and the
+                stacks without history as `unknown`
+        """
+        commands = list(commands)
+        expected = []
+        unknown = []
+        for stack in stacks:
+            stack, workspace = (stack, "default") if isinstance(stack, str) else stack
+            stack = os.path.abspath(stack)
+            predictions = [
+                self.predict(stack, workspace, command, rank) for command in commands
+            ]
+            if any(prediction is None for prediction in predictions):
+                unknown.append((stack, workspace))
+                continue
+            expected.append((stack, workspace, sum(predictions)))
+        expected.sort(key=lambda item: item[2], reverse=True)
+        loads = [0.0] * max(1, workers)
+        for _, _, seconds in expected:
+            heapq.heappush(loads, heapq.heappop(loads) + seconds)
+        return dict(total=max(loads), order=expected, unknown=unknown)
@@ -0,0 +1,112 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .base import *
+from .exceptions import *
+
+
+class OutputValue:
+    """Root module output decoded from the state
+
+    Attributes:
+        name (str): Output name
+        value (Any): Output value
+        type (Any): Terraform type of the value, as encoded in the state
+        sensitive (bool): Whether the output is marked as sensitive
+    """
+
+    name: str
+    value: Any
+    type: Any
+    sensitive: bool
+
+    def __init__(self, name: str, value: Any, type: Any = None, sensitive=False):
+        self.name = name
+        self.value = value
+        self.type = type
+        self.sensitive = sensitive
+
+    def __str__(self):
+        value = "(sensitive value)" if self.sensitive else self.value
+        return f"OutputValue(name={self.name}, type={self.type}, value={value})"
+
+
+class Outputs:
+    """Read root module outputs straight from the state
+
+    The state is pulled at most once and shared with `State.snapshot`, so reading
+    any number of outputs costs zero or one terraform call until the state changes.
+    """
+
+    _tf: Terraform
+
+    def __init__(self, terraform_object: Terraform):
+        self._tf = terraform_object
+        self.__snapshot__ = None
+        self.__decoded__: Dict[str, OutputValue] = {}
+
+    def __decode__(
+        self, refresh: Optional[bool] = False, chdir: Optional[str] = None
+    ) -> Dict[str, OutputValue]:
+        snapshot = self._tf.state.snapshot(refresh=refresh, chdir=chdir)
+        if snapshot is not self.__snapshot__:
+            self.__decoded__ = {
+                name: OutputValue(
+                    name,
+                    output.get("value"),
+                    output.get("type"),
+                    output.get("sensitive", False),
+                )
+                for name, output in snapshot.outputs.items()
+            }
+            self.__snapshot__ = snapshot
+        return self.__decoded__
+
+    def refresh(self, chdir: Optional[str] = None) -> Dict[str, OutputValue]:
+        """Pull the state again and decode the outputs"""
+        return self.__decode__(refresh=True, chdir=chdir)
+
+    def all(self, chdir: Optional[str] = None) -> Dict[str, OutputValue]:
+        return dict(self.__decode__(chdir=chdir))
+
+    def output(self, name: str, chdir: Optional[str] = None) -> OutputValue:
+        outputs = self.__decode__(chdir=chdir)
+        if name not in outputs:
+            raise TerraformError(
+                f"Output '{name}' not found in state",
+                "output",
+            )
+        return outputs[name]
+
+    def get(self, name: str, default: Any = None, chdir: Optional[str] = None) -> Any:
+        output = self.__decode__(chdir=chdir).get(name)
+        return output.value if output is not None else default
+
+    def get_many(
+        self, names: Iterable[str], chdir: Optional[str] = None
+    ) -> Dict[str, Any]:
+        names = list(names)
+        outputs = self.__decode__(chdir=chdir)
+        missing = [name for name in names if name not in outputs]
+        if missing:
+            raise TerraformError(
+                f"Outputs not found in state: {', '.join(missing)}",
+                "output",
+            )
+        return {name: outputs[name].value for name in names}
+
+    def sensitive(self, name: str, chdir: Optional[str] = None) -> bool:
+        return self.output(name, chdir=chdir).sensitive
+
+    def type(self, name: str, chdir: Optional[str] = None) -> Any:
+        return self.output(name, chdir=chdir).type
+
+    def keys(self) -> List[str]:
+        return list(self.__decode__().keys())
+
+    def __getitem__(self, name: str) -> Any:
+        return self.output(name).value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__decode__()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
@@ -0,0 +1,182 @@
+from typing import Any, Dict, Iterator, Optional
+from .base import *
+from .defaults import *
+from ..utils import log
+from threading import Lock
+import json as _json
+import os
+import time
+
+PARALLELISM_STORE = os.path.join("terratesting", "parallelism.json")
+# Mean operation time growth over the previous run that stops any increase
+SLOWDOWN_RATIO = 1.5
+
+__STORE_LOCK__ = Lock()
+
+
+class ParallelismTuner:
+    """Pick `-parallelism` per stack and workspace from the previous runs
+
+    Additive increase while the runs are throttle free, saturated and not slower
+    per operation than the previous one, halved as soon as the provider starts
+    throttling. The history is kept in the terraform data dir of each stack.
+
+    Attributes:
+        minimum (int): Lowest parallelism ever passed
+        maximum (int): Highest parallelism ever passed
+    """
+
+    _tf: Terraform
+    minimum: int
+    maximum: int
+
+    def __init__(
+        self, terraform_object: Terraform, minimum: int = 1, maximum: int = 64
+    ):
+        self._tf = terraform_object
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __store_path__(self, chdir: Optional[str] = None) -> str:
+        return os.path.join(self._tf.workspace.__data_dir__(chdir), PARALLELISM_STORE)
+
+    def __read_store__(self, chdir: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            with open(self.__store_path__(chdir), "r") as file:
+                return _json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def __write_store__(self, store: Dict[str, Any], chdir: Optional[str] = None):
+        path = self.__store_path__(chdir)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w") as file:
+                _json.dump(store, file, indent=2)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            log.warn(f"Failed to save the parallelism history: {e}")
+
+    def __default__(self) -> int:
+        if isinstance(self._tf.paralellism, int):
+            return self._tf.paralellism
+        return 10
+
+    def history(self, chdir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Last recorded run of the current workspace, None if there is none"""
+        return self.__read_store__(chdir).get(self._tf.workspace.current)
+
+    def next(self, chdir: Optional[str] = None) -> int:
+        """Parallelism for the next run of the current workspace"""
+        record = self.history(chdir)
+        if not record:
+            return self.__default__()
+        return min(self.maximum, max(self.minimum, int(record["parallelism"])))
+
+    @staticmethod
+    def __diagnostics__(stdout: str = None) -> Iterator[str]:
+        """Error and warning lines of a run stdout, plan values are never matched"""
+        block = False
+        for line in (stdout or "").splitlines():
+            if line.startswith("{"):
+                block = False
+                try:
+                    line = _json.loads(line)
+                except ValueError:
+                    continue
+                if line.get("type") == "diagnostic":
+                    diagnostic = line.get("diagnostic", {})
+                    yield "\n".join(
+                        (diagnostic.get("summary", ""), diagnostic.get("detail", ""))
+                    )
+                continue
+            if DIAGNOSTIC_REGEX.match(line):
+                block = True
+            elif line.startswith(("╵", "  #", "Plan:")) or (
+                RESOURCE_OPERATION_REGEX.search(line)
+            ):
+                # End of the box, or plan output after an unboxed -no-color block
+                block = False
+            if block:
+                yield line
+
+    @staticmethod
+    def signals(stdout: str = None, stderr: str = None) -> Dict[str, Any]:
+        """Throttling messages and resource operations found in a run output
+
+        Throttling is only looked for in stderr and in the error and warning blocks
+        of stdout.
+
+        Args:
+            stdout (str, optional): Command stdout, human or `-json` output. Defaults to None.
+            stderr (str, optional): Command stderr. Defaults to None.
+
+        Returns:
+            dict: `throttled` line count, `operations` count and their `durations`
+        """
+        lines = [
+            *ParallelismTuner.__diagnostics__(stdout),
+            *(stderr or "").splitlines(),
+        ]
+        throttled = sum(1 for line in lines if THROTTLE_REGEX.search(line))
+        operations = 0
+        durations = []
+        for line in (stdout or "").splitlines():
+            if line.startswith("{"):
+                try:
+                    line = _json.loads(line)
+                except ValueError:
+                    continue
+                if line.get("type") in ("apply_complete", "refresh_complete"):
+                    operations += 1
+                    elapsed = line.get("hook", {}).get("elapsed_seconds")
+                    if elapsed is not None:
+                        durations.append(elapsed)
+            elif RESOURCE_OPERATION_REGEX.search(line):
+                operations += 1
+        return dict(throttled=throttled, operations=operations, durations=durations)
+
+    def observe(
+        self, parallelism: int, result: Any, chdir: Optional[str] = None
+    ) -> int:
+        """Record a run and compute the parallelism of the next one
+
+        Args:
+            parallelism (int): Parallelism the run used
+            result (CommandResult): Result of the run
+            chdir (str, optional): Directory the command ran at. Defaults to None.
+
+        Returns:
+            int: Parallelism for the next run
+        """
+        signals = ParallelismTuner.signals(result.stdout, result.stderr)
+        durations = signals["durations"]
+        mean_duration = round(sum(durations) / len(durations), 3) if durations else None
+        previous = (self.history(chdir) or {}).get("mean_duration")
+        # Operations getting slower is the provider saturating before it throttles
+        slower = (
+            mean_duration is not None
+            and previous is not None
+            and mean_duration > previous * SLOWDOWN_RATIO
+        )
+        following = parallelism
+        if signals["throttled"]:
+            following = parallelism // 2
+        elif result.success and signals["operations"] > parallelism and not slower:
+            following = parallelism + max(1, parallelism // 4)
+        following = min(self.maximum, max(self.minimum, following))
+        if following != parallelism:
+            log.info(f"Parallelism for the next run: {parallelism} -> {following}")
+
+        with __STORE_LOCK__:
+            store = self.__read_store__(chdir)
+            store[self._tf.workspace.current] = dict(
+                parallelism=following,
+                previous=parallelism,
+                throttled=signals["throttled"],
+                operations=signals["operations"],
+                mean_duration=mean_duration,
+                updated=time.time(),
+            )
+            self.__write_store__(store, chdir)
+        return following
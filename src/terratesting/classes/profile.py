@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional
+from .exceptions import *
+from .timeline import *
+
+PROFILE_KEYS = {
+    "resource": lambda entry: entry.address,
+    "type": lambda entry: entry.resource_type,
+    "provider": lambda entry: entry.provider,
+}
+
+
+class RefreshProfile:
+    """Refresh time of each resource instance, ranked by resource, type or provider
+
+    Attributes:
+        timeline (Timeline): Refresh operations of the run
+    """
+
+    timeline: Timeline
+
+    def __init__(self, timeline: Timeline):
+        self.timeline = timeline
+
+    @staticmethod
+    def from_plan_output(stdout: str) -> "RefreshProfile":
+        """Profile from the `refresh_*` events of `plan -json`, data source reads included"""
+        timeline = Timeline("refresh")
+        reads = Timeline("apply")
+        for event in iter_events(stdout):
+            timeline.add_event(event)
+            reads.add_event(event)
+        for address, entry in reads.entries.items():
+            if entry.action == "read" and address not in timeline.entries:
+                timeline.entries[address] = entry
+        return RefreshProfile(timeline)
+
+    @staticmethod
+    def from_trace(log: str) -> "RefreshProfile":
+        """Profile from the vertex visits of a `TF_LOG=trace` log"""
+        return RefreshProfile(Timeline.from_trace(log, "refresh"))
+
+    @property
+    def total_time(self) -> float:
+        return self.timeline.busy_time
+
+    def aggregate(self, by: str = "type") -> List[Dict[str, Any]]:
+        """Refresh time grouped by `resource`, `type` or `provider`, slowest first
+
+        Returns:
+            List[dict]: `key`, `count`, `total`, `mean`, `max` and the `slowest` address of each group
+        """
+        if by not in PROFILE_KEYS:
+            raise TerraformError(
+                f"Can't aggregate by '{by}', please choose one of: {', '.join(PROFILE_KEYS)}",
+                "profile",
+            )
+        groups = {}
+        for entry in self.timeline:
+            groups.setdefault(PROFILE_KEYS[by](entry), []).append(entry)
+        ranked = []
+        for key, entries in groups.items():
+            slowest = max(entries, key=lambda entry: entry.duration)
+            total = sum(entry.duration for entry in entries)
+            ranked.append(
+                dict(
+                    key=key,
+                    count=len(entries),
+                    total=round(total, 3),
+                    mean=round(total / len(entries), 3),
+                    max=round(slowest.duration, 3),
+                    slowest=slowest.address,
+                )
+            )
+        return sorted(ranked, key=lambda group: group["total"], reverse=True)
+
+    def report(self, count: Optional[int] = 10) -> Dict[str, Any]:
+        """Ranked refresh cost of the run
+
+        Args:
+            count (int, optional): Number of entries of each ranking. Defaults to 10.
+
+        Returns:
+            dict: `total_time`, `wall_time` and the `resources`, `types` and `providers` rankings
+        """
+        return dict(
+            operations=len(self.timeline),
+            total_time=round(self.total_time, 3),
+            wall_time=round(self.timeline.wall_time, 3),
+            resources=self.aggregate("resource")[:count],
+            types=self.aggregate("type")[:count],
+            providers=self.aggregate("provider")[:count],
+        )
+
+    def __str__(self):
+        return f"RefreshProfile(operations={len(self.timeline)}, total_time={round(self.total_time, 3)}s)"
@@ -1,13 +1,88 @@
-import sys
-
-sys.path.append("..")
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Union
 from .base import *
+from .defaults import *
 from .exceptions import *
-from ..utils import log
-import shlex
-from uuid import uuid4 as uuid
+from ..utils import in_log_context, log
+from ..utils.address import parse_resource_address
+from threading import Lock
+import copy
+import json as _json
 import os
+import shlex
+import time
+
+REFRESH_STORE = os.path.join("terratesting", "refresh.json")
+STATE_HEADER_BYTES = 4096
+
+__REFRESH_LOCK__ = Lock()
+
+
+def __state_chunks__(state: Any, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Serialize a state object to JSON incrementally.
+
+    Args:
+        state (Mapping|Any): State as a mapping or an object exposing `to_dict()`
+        chunk_size (int, optional): Approximate size of each yielded chunk. Defaults to 64KiB.
+
+    Yields:
+        bytes: Encoded JSON chunks, never the whole document at once
+    """
+    if not isinstance(state, Mapping) and hasattr(state, "to_dict"):
+        state = state.to_dict()
+    buffer = []
+    size = 0
+    for part in _json.JSONEncoder().iterencode(state):
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+class StateSnapshot:
+    """Parsed terraform state document, as returned by `terraform state pull`
+
+    Attributes:
+        data (dict): The raw state document
+    """
+
+    data: Dict[str, Any]
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    @staticmethod
+    def from_json(content: str) -> "StateSnapshot":
+        return StateSnapshot(_json.loads(content) if content.strip() else {})
+
+    @property
+    def version(self) -> Optional[int]:
+        return self.data.get("version")
+
+    @property
+    def serial(self) -> Optional[int]:
+        return self.data.get("serial")
+
+    @property
+    def lineage(self) -> Optional[str]:
+        return self.data.get("lineage")
+
+    @property
+    def outputs(self) -> Dict[str, Any]:
+        return self.data.get("outputs") or {}
+
+    @property
+    def resources(self) -> List[Dict[str, Any]]:
+        return self.data.get("resources") or []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.data
+
+    def __str__(self):
+        return f"StateSnapshot(serial={self.serial}, lineage={self.lineage}, resources={len(self.resources)})"
 
 
 class State:
@@ -17,7 +92,206 @@ class State:
     def __init__(self, terraform_object: Terraform):
         self._cmd = "state"
         self._tf = terraform_object
+        self.__snapshots__: Dict[Any, Any] = {}
+
+    @property
+    def log_context(self):
+        return self._tf.log_context
+
+    def __stamp__(self, chdir: Optional[str] = None):
+        """Identity of the local state file, None when the backend is not local"""
+        path = self._tf.workspace.__local_state_path__(chdir)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (path, None)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def invalidate(self):
+        """Drop cached state snapshots, called after state-mutating commands"""
+        self.__snapshots__.clear()
+
+    def snapshot(
+        self, refresh: Optional[bool] = False, chdir: Optional[str] = None
+    ) -> StateSnapshot:
+        """Current state of the workspace, pulled once and cached until it changes
+
+        Local state is cached until the state file changes. Other backends are cached
+        until `invalidate()`, called by every state-mutating command, use `refresh`
+        to read changes made from outside.
+
+        Args:
+            refresh (bool, optional): Ignore the cached snapshot. Defaults to False.
+            chdir (str, optional): Directory to run the command at. Defaults to None.
+
+        Returns:
+            StateSnapshot: Parsed state
+        """
+        key = (chdir or self._tf.chdir, self._tf.workspace.current)
+        stamp = self.__stamp__(chdir)
+        cached = self.__snapshots__.get(key)
+        if not refresh and cached is not None and cached[0] == stamp:
+            return cached[1]
+        snapshot = StateSnapshot.from_json(self.pull(chdir=chdir).result)
+        self.__snapshots__[key] = (stamp, snapshot)
+        return snapshot
+
+    def __serial__(self, chdir: Optional[str] = None) -> Optional[tuple]:
+        """Lineage and serial of the local state file, None for other backends"""
+        path = self._tf.workspace.__local_state_path__(chdir)
+        if path is None:
+            return None
+        try:
+            with open(path, "r") as file:
+                header = file.read(STATE_HEADER_BYTES)
+                serial = STATE_SERIAL_REGEX.search(header)
+                lineage = STATE_LINEAGE_REGEX.search(header)
+                if serial is None or lineage is None:
+                    data = _json.loads(header + file.read())
+                    return (data.get("lineage"), data.get("serial"))
+        except OSError:
+            return (None, None)
+        return (lineage.group("lineage"), int(serial.group("serial")))
+
+    def __refresh_path__(self, chdir: Optional[str] = None) -> str:
+        return os.path.join(self._tf.workspace.__data_dir__(chdir), REFRESH_STORE)
+
+    def __read_refreshed__(self, chdir: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            with open(self.__refresh_path__(chdir), "r") as file:
+                return _json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @in_log_context
+    def mark_refreshed(self, chdir: Optional[str] = None) -> bool:
+        """Record a full refresh of the current state serial of the workspace
+
+        The record is kept in the terraform data dir of the stack, only for the
+        local backend, whose serial is read from the state file.
+
+        Returns:
+            bool: True when the refresh was recorded
+        """
+        serial = self.__serial__(chdir)
+        if serial is None:
+            return False
+        path = self.__refresh_path__(chdir)
+        with __REFRESH_LOCK__:
+            store = self.__read_refreshed__(chdir)
+            store[self._tf.workspace.current] = dict(
+                lineage=serial[0], serial=serial[1], refreshed=time.time()
+            )
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "w") as file:
+                    _json.dump(store, file, indent=2)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                log.warn(f"Failed to save the refresh time: {e}")
+                return False
+        return True
+
+    def refresh_age(self, chdir: Optional[str] = None) -> Optional[float]:
+        """Seconds since the last full refresh of the workspace
+
+        Returns:
+            float: Age of the last refresh, None when the workspace was never refreshed,
+                the state serial changed since then or the backend is not local
+        """
+        record = self.__read_refreshed__(chdir).get(self._tf.workspace.current)
+        if not record:
+            return None
+        if self.__serial__(chdir) != (record.get("lineage"), record.get("serial")):
+            return None
+        return time.time() - record["refreshed"]
+
+    @in_log_context
+    def flag_instances(
+        self,
+        addresses: List[str],
+        tainted: bool = True,
+        allow_missing: Optional[bool] = False,
+        ignore_remote_version: Optional[bool] = None,
+        lock: Optional[bool] = None,
+        lock_timeout: Optional[str] = None,
+        chdir: Optional[str] = None,
+    ) -> TerraformResult:
+        """Taint or untaint many resource instances with a single state push
+
+        The state is pulled, the instances are flagged in memory and the result is
+        pushed back with a new serial, instead of one taint/untaint run per address.
+        Only the push takes the state lock, changes made between the pull and the
+        push are rejected by the serial check of terraform.
+
+        Args:
+            addresses (List[str]): Resource instance addresses.
+            tainted (bool, optional): Taint when True, untaint when False. Defaults to True.
+            allow_missing (bool, optional): Ignore addresses not found in the state. Defaults to False.
+            ignore_remote_version (bool, optional): Push even if the remote terraform version differs. Defaults to None.
+            lock (bool, optional): Lock the state during the push. Defaults to None.
+            lock_timeout (str, optional): Duration to retry a state lock. Defaults to None.
+            chdir (str, optional): Directory to run the command at. Defaults to None.
+
+        Raises:
+            TerraformError: If an address is invalid or missing and allow_missing is False
+
+        Returns:
+            TerraformResult: The list of flagged addresses
+        """
+        action = "taint" if tainted else "untaint"
+        wanted = {}
+        for address in addresses:
+            parts = parse_resource_address(address)
+            if parts is None or parts["mode"] != "managed":
+                raise TerraformError(
+                    f"Invalid managed resource address: {address}", action
+                )
+            key = (parts["module"], parts["type"], parts["name"], parts["index"])
+            wanted[key] = address
+
+        snapshot = self.snapshot(refresh=True, chdir=chdir)
+        data = copy.deepcopy(snapshot.to_dict())
+        found = []
+        for resource in data.get("resources", []):
+            if resource.get("mode") != "managed":
+                continue
+            for instance in resource.get("instances", []):
+                key = (
+                    resource.get("module", ""),
+                    resource["type"],
+                    resource["name"],
+                    instance.get("index_key"),
+                )
+                if key not in wanted:
+                    continue
+                found.append(wanted[key])
+                if tainted:
+                    instance["status"] = "tainted"
+                else:
+                    instance.pop("status", None)
+
+        missing = [address for address in wanted.values() if address not in found]
+        if missing and not allow_missing:
+            raise TerraformError(
+                f"Resource instances not found in state: {', '.join(missing)}",
+                action,
+            )
+        if not found:
+            return TerraformResult(True, [])
+        data["serial"] = (data.get("serial") or 0) + 1
+        self.push(
+            file_content=data,
+            ignore_remote_version=ignore_remote_version,
+            lock=lock,
+            lock_timeout=lock_timeout,
+            chdir=chdir,
+        )
+        return TerraformResult(True, found)
 
+    @in_log_context
     def list(
         self,
         address: Optional[str] = None,
@@ -57,6 +331,7 @@ class State:
         )
         return TerraformResult(True, result.stdout)
 
+    @in_log_context
     def show(
         self,
         address: Optional[str] = None,
@@ -92,6 +367,7 @@ class State:
         )
         return res
 
+    @in_log_context
     def mv(
         self,
         src: str,
@@ -129,6 +405,7 @@ class State:
         result = self._tf.cmd(cmd, "Terraform state mv", chdir=chdir)
 
         res = TerraformResult(True, result.stdout)
+        self.invalidate()
         if not result.success:
             log.failed(f"Terraform state mv failed in {result.duration}s", end_sub=True)
             raise TerraformError(
@@ -141,9 +418,10 @@ class State:
         log.success(f"Terraform state mv completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
     def rm(
         self,
-        address: str,
+        address: Union[str, List[str]],
         dry_run: Optional[bool] = None,
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
@@ -169,10 +447,15 @@ class State:
         cmd.append(self._tf._build_arg("backup", backup))
         cmd.append(self._tf._build_arg("ignore_remote_version", ignore_remote_version))
 
-        cmd.append(shlex.quote(address))
+        # Addresses go straight to argv, quoting would break index keys
+        if isinstance(address, str):
+            cmd.append(address)
+        else:
+            cmd.extend(dict.fromkeys(address))
 
         result = self._tf.cmd(cmd, "Terraform state rm", chdir=chdir)
 
+        self.invalidate()
         if not result.success:
             log.failed(f"Terraform state rm failed in {result.duration}s", end_sub=True)
             raise TerraformError(
@@ -185,6 +468,7 @@ class State:
         log.success(f"Terraform state rm completed in {result.duration}s", end_sub=True)
         return TerraformResult(True, result.stdout)
 
+    @in_log_context
     def replace_provider(
         self,
         src_provider: str,
@@ -219,6 +503,7 @@ class State:
 
         result = self._tf.cmd(cmd, "Terraform state replace-provider", chdir=chdir)
 
+        self.invalidate()
         if not result.success:
             log.failed(
                 f"Terraform state replace-provider failed in {result.duration}s",
@@ -237,6 +522,7 @@ class State:
         )
         return TerraformResult(True, result.stdout)
 
+    @in_log_context
     def pull(self, chdir: Optional[str] = None):
         cmd = [self._cmd, "pull"]
 
@@ -260,12 +546,15 @@ class State:
         )
         return TerraformResult(True, result.stdout)
 
+    @in_log_context
     def push(
         self,
         file_path: Optional[str] = None,
-        file_content: Optional[str] = None,
+        file_content: Optional[Any] = None,
         force: Optional[bool] = False,
         ignore_remote_version: Optional[bool] = None,
+        lock: Optional[bool] = None,
+        lock_timeout: Optional[str] = None,
         chdir: Optional[str] = None,
     ):
         cmd = [self._cmd, "push"]
@@ -281,25 +570,34 @@ class State:
             )
         cmd.append(self._tf._build_arg("force", force))
         cmd.append(self._tf._build_arg("ignore_remote_version", ignore_remote_version))
+        if not lock:
+            lock = self._tf.lock
+        if not lock_timeout:
+            lock_timeout = self._tf.lock_timeout
+        if lock is False:
+            cmd.append(self._tf._build_arg("lock", lock))
+        if lock_timeout != "0s":
+            cmd.append(self._tf._build_arg("lock_timeout", lock_timeout))
         if not chdir:
             chdir = self._tf.chdir
 
+        stdin = None
         if file_content is not None:
-            filename = f"terraform-temp-state-{uuid()}.tfstate"
-            with open(os.path.normpath(os.path.join(chdir, filename)), "w") as file:
-                res = file.write(file_content)
-                if res == len(file_content):
-                    log.info("Created temp state file")
-            file_path = filename
+            # Stream the content through stdin, nothing is written to the module dir
+            if isinstance(file_content, (str, bytes, bytearray)) or hasattr(
+                file_content, "read"
+            ):
+                stdin = file_content
+            else:
+                stdin = __state_chunks__(file_content)
+            file_path = "-"
 
         cmd.append(shlex.quote(file_path))
 
-        result = self._tf.cmd(cmd, "Terraform state push", chdir=chdir)
-
-        if file_content is not None:
-            os.unlink(os.path.normpath(os.path.join(chdir, file_path)))
+        result = self._tf.cmd(cmd, "Terraform state push", chdir=chdir, stdin=stdin)
 
         res = TerraformResult(True, result.stdout)
+        self.invalidate()
         if not result.success:
             log.failed(
                 f"Terraform state push failed in {result.duration}s",
@@ -0,0 +1,364 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from bisect import bisect_right
+from datetime import datetime
+from .graph import *
+from ..utils.address import parse_resource_address
+import json as _json
+import re
+
+TRACE_VISIT_REGEX = re.compile(
+    r"^(?P<time>\S+) \[TRACE\] vertex \"(?P<name>(?:[^\"\\]|\\.)*)\": (?P<step>starting visit|visit complete)"
+)
+EVENT_TIME_REGEX = re.compile(
+    r"^(?P<base>\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(?P<fraction>\d+))?(?P<zone>Z|[+-]\d\d:?\d\d)?$"
+)
+
+
+def event_time(timestamp: str) -> Optional[float]:
+    """Epoch seconds of a `@timestamp` field of the terraform -json output"""
+    match = EVENT_TIME_REGEX.match(timestamp or "")
+    if not match:
+        return None
+    fraction = (match.group("fraction") or "0")[:6].ljust(6, "0")
+    zone = match.group("zone") or "Z"
+    zone = "+00:00" if zone == "Z" else zone
+    if ":" not in zone:
+        zone = f"{zone[:3]}:{zone[3:]}"
+    return datetime.fromisoformat(f"{match.group('base')}.{fraction}{zone}").timestamp()
+
+
+def iter_events(stdout: str) -> Iterator[Dict[str, Any]]:
+    """JSON messages of a terraform -json output, other lines are skipped"""
+    for line in (stdout or "").splitlines():
+        if not line.startswith("{"):
+            continue
+        try:
+            yield _json.loads(line)
+        except ValueError:
+            continue
+
+
+def resource_address(address: str) -> str:
+    """Resource address of an instance address, without module and resource keys"""
+    result = []
+    depth = 0
+    quoted = False
+    for char in address:
+        if char == '"' and depth:
+            quoted = not quoted
+        elif not quoted and char == "[":
+            depth += 1
+            continue
+        elif not quoted and char == "]" and depth:
+            depth -= 1
+            continue
+        if not depth:
+            result.append(char)
+    return "".join(result)
+
+
+class TimelineEntry:
+    """Start and end of the operation on one resource instance
+
+    Attributes:
+        address (str): Resource instance address
+        action (str): Action reported by terraform, like create, update or read
+        start (float): Epoch seconds the operation started at
+        end (float): Epoch seconds the operation ended at, None if it never ended
+        status (str): complete, errored or running
+        resource_type (str): Resource type, like aws_instance
+        provider (str): Provider of the resource, implied from the type when terraform does not report it
+    """
+
+    address: str
+    action: Optional[str]
+    start: Optional[float]
+    end: Optional[float]
+    status: str
+    resource_type: Optional[str]
+    provider: Optional[str]
+
+    def __init__(
+        self,
+        address: str,
+        action: Optional[str] = None,
+        resource_type: Optional[str] = None,
+        provider: Optional[str] = None,
+    ):
+        self.address = address
+        self.action = action
+        self.start = None
+        self.end = None
+        self.status = "running"
+        if resource_type is None:
+            parsed = parse_resource_address(address)
+            resource_type = parsed["type"] if parsed else None
+        self.resource_type = resource_type
+        if provider is None and resource_type:
+            provider = resource_type.split("_", 1)[0]
+        self.provider = provider
+
+    @property
+    def duration(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return max(0.0, self.end - self.start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            address=self.address,
+            action=self.action,
+            start=self.start,
+            end=self.end,
+            duration=round(self.duration, 3),
+            status=self.status,
+            resource_type=self.resource_type,
+            provider=self.provider,
+        )
+
+    def __str__(self):
+        return f"TimelineEntry(address={self.address}, action={self.action}, duration={round(self.duration, 3)}s)"
+
+
+class Timeline:
+    """Per resource timeline built from the hooks of a terraform -json output
+
+    Args:
+        kind (str): Hook family to read, `apply` or `refresh`
+    """
+
+    kind: str
+    entries: Dict[str, TimelineEntry]
+
+    def __init__(self, kind: str = "apply"):
+        self.kind = kind
+        self.entries = {}
+
+    @staticmethod
+    def from_output(stdout: str, kind: str = "apply") -> "Timeline":
+        return Timeline.from_events(iter_events(stdout), kind)
+
+    @staticmethod
+    def from_events(
+        events: Iterable[Dict[str, Any]], kind: str = "apply"
+    ) -> "Timeline":
+        timeline = Timeline(kind)
+        for event in events:
+            timeline.add_event(event)
+        return timeline
+
+    @staticmethod
+    def from_trace(log: str, kind: str = "refresh") -> "Timeline":
+        """Timeline of the resource instance vertices visited in a `TF_LOG=trace` log"""
+        timeline = Timeline(kind)
+        for line in (log or "").splitlines():
+            match = TRACE_VISIT_REGEX.match(line)
+            if not match:
+                continue
+            name = match.group("name").replace('\\"', '"')
+            if " (" in name or GraphNode(name).kind not in ("resource", "data"):
+                continue
+            entry = timeline.entries.get(name)
+            if entry is None:
+                entry = TimelineEntry(name, "read")
+                timeline.entries[name] = entry
+            timestamp = event_time(match.group("time"))
+            if match.group("step") == "starting visit":
+                entry.start = timestamp
+            else:
+                entry.end = timestamp
+                entry.status = "complete"
+        return timeline
+
+    def add_event(self, event: Dict[str, Any]):
+        event_type = event.get("type") or ""
+        if not event_type.startswith(f"{self.kind}_"):
+            return
+        hook = event.get("hook") or {}
+        resource = hook.get("resource") or {}
+        address = resource.get("addr")
+        if not address:
+            return
+        timestamp = event_time(event.get("@timestamp"))
+        entry = self.entries.get(address)
+        if entry is None:
+            entry = TimelineEntry(
+                address,
+                hook.get("action"),
+                resource.get("resource_type"),
+                resource.get("implied_provider"),
+            )
+            self.entries[address] = entry
+        if event_type.endswith("_start"):
+            entry.start = timestamp
+        elif event_type.endswith("_complete") or event_type.endswith("_errored"):
+            entry.end = timestamp
+            entry.status = "complete" if event_type.endswith("_complete") else "errored"
+            elapsed = hook.get("elapsed_seconds")
+            if entry.start is None and timestamp is not None and elapsed is not None:
+                entry.start = timestamp - elapsed
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[TimelineEntry]:
+        return iter(self.entries.values())
+
+    @property
+    def start(self) -> Optional[float]:
+        return min((e.start for e in self if e.start is not None), default=None)
+
+    @property
+    def end(self) -> Optional[float]:
+        return max((e.end for e in self if e.end is not None), default=None)
+
+    @property
+    def wall_time(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    @property
+    def busy_time(self) -> float:
+        """Sum of the durations of every operation"""
+        return sum(entry.duration for entry in self)
+
+    def slowest(self, count: int = 10) -> List[TimelineEntry]:
+        return sorted(self, key=lambda entry: entry.duration, reverse=True)[:count]
+
+    def concurrency(self) -> List[tuple]:
+        """Steps of `(epoch seconds, running operations)` over the timeline"""
+        changes = {}
+        for entry in self:
+            if entry.start is None or entry.end is None:
+                continue
+            changes[entry.start] = changes.get(entry.start, 0) + 1
+            changes[entry.end] = changes.get(entry.end, 0) - 1
+        steps = []
+        running = 0
+        for moment in sorted(changes):
+            running += changes[moment]
+            steps.append((moment, running))
+        return steps
+
+    def idle_slots(self, parallelism: int) -> float:
+        """Slot-seconds left unused with the given parallelism"""
+        idle = 0.0
+        steps = self.concurrency()
+        for (moment, running), (following, _) in zip(steps, steps[1:]):
+            idle += max(0, parallelism - running) * (following - moment)
+        return idle
+
+    def critical_path(
+        self, graph: Optional[DependencyGraph] = None
+    ) -> List[TimelineEntry]:
+        """Longest chain of dependent operations
+
+        With a dependency graph the chain follows the resource dependencies,
+        instances of `count`/`for_each` resources sharing the dependencies of their
+        resource. Without one, each operation waits on the latest operation that
+        ended before it started.
+        """
+        entries = [
+            entry for entry in self if entry.start is not None and entry.end is not None
+        ]
+        if not entries:
+            return []
+        if graph is not None:
+            instances = {}
+            for entry in entries:
+                instances.setdefault(resource_address(entry.address), []).append(entry)
+            subgraph = graph.subgraph()
+
+            def waits_on(entry):
+                resource = resource_address(entry.address)
+                if resource not in subgraph:
+                    return []
+                return [
+                    dependency
+                    for name in subgraph.dependencies[resource]
+                    for dependency in instances.get(name, [])
+                ]
+
+        else:
+            ordered = sorted(entries, key=lambda entry: entry.end)
+            ends = [entry.end for entry in ordered]
+
+            def waits_on(entry):
+                index = bisect_right(ends, entry.start)
+                while index and ordered[index - 1] is entry:
+                    index -= 1
+                return ordered[index - 1 : index] if index else []
+
+        cost = {}
+        parent = {}
+        for entry in sorted(entries, key=lambda entry: entry.end):
+            # Walk the dependencies depth first, skipping back edges of destroy orders
+            stack = [(entry, iter(waits_on(entry)))]
+            visiting = {entry.address}
+            while stack:
+                current, pending = stack[-1]
+                dependency = next(pending, None)
+                if dependency is not None:
+                    if (
+                        dependency.address not in cost
+                        and dependency.address not in visiting
+                    ):
+                        visiting.add(dependency.address)
+                        stack.append((dependency, iter(waits_on(dependency))))
+                    continue
+                stack.pop()
+                visiting.discard(current.address)
+                best = None
+                for dependency in waits_on(current):
+                    if dependency.address in cost and (
+                        best is None or cost[dependency.address] > cost[best.address]
+                    ):
+                        best = dependency
+                cost[current.address] = current.duration + (
+                    cost[best.address] if best else 0
+                )
+                parent[current.address] = best
+        last = max(entries, key=lambda entry: cost[entry.address])
+        path = []
+        while last is not None:
+            path.append(last)
+            last = parent[last.address]
+        return list(reversed(path))
+
+    def report(
+        self,
+        parallelism: Optional[int] = None,
+        graph: Optional[DependencyGraph] = None,
+        count: int = 10,
+    ) -> Dict[str, Any]:
+        """Summary of where the time went
+
+        Args:
+            parallelism (int, optional): Parallelism of the run, to compute the idle slots. Defaults to None.
+            graph (DependencyGraph, optional): Dependency graph of the stack for the critical path. Defaults to None.
+            count (int, optional): Number of slowest operations to list. Defaults to 10.
+
+        Returns:
+            dict: wall and busy time, critical path and its length, idle slot-seconds,
+                peak concurrency, slowest and errored operations
+        """
+        path = self.critical_path(graph)
+        report = dict(
+            operations=len(self),
+            wall_time=round(self.wall_time, 3),
+            busy_time=round(self.busy_time, 3),
+            critical_path=[entry.to_dict() for entry in path],
+            critical_path_time=round(sum(entry.duration for entry in path), 3),
+            peak_concurrency=max(
+                (running for _, running in self.concurrency()), default=0
+            ),
+            slowest=[entry.to_dict() for entry in self.slowest(count)],
+            errored=[entry.address for entry in self if entry.status == "errored"],
+        )
+        if parallelism:
+            report["idle_slot_seconds"] = round(self.idle_slots(parallelism), 3)
+        return report
+
+    def __str__(self):
+        return f"Timeline(kind={self.kind}, operations={len(self)}, wall_time={round(self.wall_time, 3)}s)"
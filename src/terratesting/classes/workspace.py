@@ -1,9 +1,13 @@
 from typing import Any, Callable, Dict, List, Optional
 from .base import *
 from .exceptions import *
-from ..utils import log
+from ..utils import in_log_context, log
+import json as _json
+import os
 import shlex
 
+LOCAL_WORKSPACE_DIR = "terraform.tfstate.d"
+
 
 class Workspace:
     _tf: Terraform
@@ -11,15 +15,124 @@ class Workspace:
 
     def __init__(self, terraform_object: Terraform, workspace_name: str = "default"):
         self._cmd = "workspace"
-        self.current = workspace_name
         self._tf = terraform_object
+        self.__workspaces__: Optional[List[str]] = None
+        # Workspace asked for by the caller, only changed by `select` and `new`
+        self.__requested__ = workspace_name
+        self.current = workspace_name
+
+    @property
+    def log_context(self):
+        return self._tf.log_context
+
+    def __workdir__(self, chdir: Optional[str] = None) -> str:
+        return chdir or self._tf.chdir or "."
+
+    def __data_dir__(self, chdir: Optional[str] = None) -> str:
+        data_dir = os.environ.get("TF_DATA_DIR", ".terraform")
+        return os.path.join(self.__workdir__(chdir), data_dir)
+
+    def __backend__(self, chdir: Optional[str] = None) -> Dict[str, Any]:
+        """Backend block recorded by `terraform init`, local when there is none"""
+        try:
+            with open(
+                os.path.join(self.__data_dir__(chdir), "terraform.tfstate"), "r"
+            ) as file:
+                backend = _json.load(file).get("backend") or {}
+        except (OSError, ValueError):
+            backend = {}
+        if not backend.get("type"):
+            backend = {"type": "local", "config": {}}
+        return backend
+
+    def __read_current__(self, chdir: Optional[str] = None) -> Optional[str]:
+        """Current workspace as terraform resolves it, None if not initialized"""
+        override = self._tf.env.get("TF_WORKSPACE") or os.environ.get("TF_WORKSPACE")
+        if override:
+            return override
+        data_dir = self.__data_dir__(chdir)
+        if not os.path.isdir(data_dir):
+            return None
+        try:
+            with open(os.path.join(data_dir, "environment"), "r") as file:
+                return file.read().strip() or "default"
+        except OSError:
+            return "default"
+
+    def __read_local_list__(self, chdir: Optional[str] = None) -> Optional[List[str]]:
+        """Workspaces of a local backend read from disk, None for other backends"""
+        backend = self.__backend__(chdir)
+        if backend["type"] != "local":
+            return None
+        config = backend.get("config") or {}
+        workspace_dir = os.path.join(
+            self.__workdir__(chdir), config.get("workspace_dir") or LOCAL_WORKSPACE_DIR
+        )
+        workspaces = ["default"]
+        try:
+            with os.scandir(workspace_dir) as entries:
+                workspaces.extend(
+                    sorted(
+                        entry.name
+                        for entry in entries
+                        if entry.is_dir() and entry.name != "default"
+                    )
+                )
+        except OSError:
+            pass
+        return workspaces
+
+    def __local_state_path__(self, chdir: Optional[str] = None) -> Optional[str]:
+        """State file of the current workspace for the local backend, None otherwise"""
+        backend = self.__backend__(chdir)
+        if backend["type"] != "local":
+            return None
+        config = backend.get("config") or {}
+        workdir = self.__workdir__(chdir)
+        current = self.__read_current__(chdir) or self.__current__
+        if current == "default":
+            return os.path.join(workdir, config.get("path") or "terraform.tfstate")
+        return os.path.join(
+            workdir,
+            config.get("workspace_dir") or LOCAL_WORKSPACE_DIR,
+            current,
+            "terraform.tfstate",
+        )
+
+    @property
+    def current(self) -> str:
+        current = self.__read_current__()
+        return current if current is not None else self.__current__
 
+    @current.setter
+    def current(self, workspace_name: str):
+        self.__current__ = workspace_name
+
+    def invalidate(self):
+        """Drop the cached workspace list, called after workspace-mutating commands"""
+        self.__workspaces__ = None
+
+    @in_log_context
     def list(
         self,
         quiet: Optional[bool] = False,
         color: Optional[bool] = True,
         chdir: Optional[str] = None,
-    ) -> TerraformResult[bool, List[str]]:
+        refresh: Optional[bool] = False,
+    ) -> TerraformResult:
+        if not refresh:
+            workspaces = self.__read_local_list__(chdir)
+            if workspaces is None:
+                workspaces = self.__workspaces__
+            if workspaces is not None:
+                current = self.__read_current__(chdir)
+                if current is not None:
+                    self.current = current
+                self._tf.log_context.env = self.current
+                if not quiet:
+                    log.success("Terraform workspace list read without terraform")
+                return TerraformResult(True, list(workspaces))
+
         cmd = [self._cmd, "list"]
         if not color:
             color = self._tf.color
@@ -56,15 +169,17 @@ class Workspace:
             .replace("*", "")
             .strip()
         )
-        log.set_env(self.current)
+        self._tf.log_context.env = self.current
 
         res = TerraformResult(
             result.success,
             [line.replace("*", "").strip() for line in result.stdout.splitlines()],
         )
         res.result = list(filter(lambda x: len(x) > 0, res.result))
+        self.__workspaces__ = list(res.result)
         return res
 
+    @in_log_context
     def select(
         self,
         workspace: str,
@@ -118,11 +233,13 @@ class Workspace:
                 f"Terraform workspace select succeded in {result.duration}s",
                 end_sub=True,
             )
-        self._tf.workspace = workspace
         self.current = workspace
-        log.set_env(workspace)
+        self.__requested__ = workspace
+        self.invalidate()
+        self._tf.log_context.env = workspace
         return TerraformResult(result.success, workspace)
 
+    @in_log_context
     def new(
         self,
         workspace: str,
@@ -163,7 +280,8 @@ class Workspace:
         log.success(
             f"Terraform workspace new succeded in {result.duration}s", end_sub=True
         )
-        self._tf.workspace = workspace
         self.current = workspace
-        log.set_env(workspace)
+        self.__requested__ = workspace
+        self.invalidate()
+        self._tf.log_context.env = workspace
         return TerraformResult(result.success, workspace)
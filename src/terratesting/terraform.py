@@ -1,19 +1,56 @@
+import atexit
+import copy
 import json as _json
 import os
-import re
 import shlex
-from typing import Any, Callable, Dict, List, Optional
-
-from .utils import cmd_to_array, log, run_command, clean_command
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from uuid import uuid4 as uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from .utils import (
+    arg_max,
+    args_size,
+    chunk_args,
+    clean_command,
+    cmd_to_array,
+    collapse_addresses,
+    CommandResult,
+    in_log_context,
+    log,
+    merge_command_results,
+    run_command,
+)
+from .utils.logger import format_elapsed_time
 
 from .classes import *  # noqa  # isort:skip
 
-os.environ["TF_IN_AUTOMATION"] = "1"
 # os.environ['TF_LOG'] = 'trace'
 log.set_env("terratesting")
 log.show_file(False)
 log.set_level("info")
 
+# Var files generated from `vars`, keyed by content hash and removed on exit
+__VARS_DIR__: Optional[str] = None
+__VARS_FILES__: Dict[str, str] = {}
+__VARS_LOCK__ = Lock()
+
+
+def __clean_vars_files__():
+    global __VARS_DIR__
+    with __VARS_LOCK__:
+        if __VARS_DIR__ is not None:
+            shutil.rmtree(__VARS_DIR__, ignore_errors=True)
+        __VARS_DIR__ = None
+        __VARS_FILES__.clear()
+
+
+atexit.register(__clean_vars_files__)
+
 
 class Terraform:
 
@@ -24,10 +61,13 @@ class Terraform:
         lock: Optional[bool] = True,
         lock_timeout: Optional[str] = "0s",
         input: Optional[bool] = False,
-        parallelism: Optional[int] = 10,
+        parallelism: Optional[Union[int, str]] = 10,
         color: Optional[bool] = True,
         var_file: Optional[str] = None,
         plan_file: Optional[str] = "plan.tfplan",
+        refresh_ttl: Optional[float] = 300,
+        history_file: Optional[str] = None,
+        raw_output: Optional[bool] = False,
     ):
         self.chdir = chdir
         self.lock = lock
@@ -38,19 +78,31 @@ class Terraform:
         self.var_file = var_file
         self.version_dict = {}
         self.plan_file = plan_file
+        self.refresh_ttl = refresh_ttl
+        self.raw_output = raw_output
+        self.env = {}
+        # Env label and nesting of this instance's logs, active during its method calls
+        self.log_context = log.context(workspace)
         self.workspace = Workspace(self, workspace)
         self.state = State(self)
-        log.set_env(self.workspace.current)
+        self.outputs = Outputs(self)
+        self.tuner = ParallelismTuner(self)
+        self.__graphs__ = {}
+        self.__plan_runs__ = {}
+        self.history = DurationStore(history_file) if history_file else None
+        self.log_context.env = self.workspace.current
         self.version(quiet=True)
         if workspace != "default":
-            log.info("Trying to select workspace")
-            try:
-                self.workspace.select(workspace, or_create=True, quiet=True)
-            except Exception as e:
-                log.warn(
-                    "Failed to switch workspace, please run the 'init' command first."
-                )
-
+            with self.log_context.use():
+                log.info("Trying to select workspace")
+                try:
+                    self.workspace.select(workspace, or_create=True, quiet=True)
+                except Exception as e:
+                    log.warn(
+                        "Failed to switch workspace, please run the 'init' command first."
+                    )
+
+    @in_log_context
     def version(self, quiet: Optional[bool] = False) -> TerraformResult:
         if not quiet:
             log.info("Running: Terraform version", start_sub=True)
@@ -118,6 +170,76 @@ class Terraform:
             return ""
         return res
 
+    @staticmethod
+    def __build_args__(arg: str, values: Optional[Union[str, Iterable[str]]]) -> list:
+        # Repeatable args, values go to argv as is since no shell is involved
+        if not values:
+            return []
+        if isinstance(values, str):
+            values = [values]
+        return [TERRAFORM_ARGS[arg] + str(value) for value in dict.fromkeys(values)]
+
+    def __address_chunks__(
+        self,
+        cmd: list,
+        target: Optional[Union[str, Iterable[str]]] = None,
+        replace: Optional[Union[str, Iterable[str]]] = None,
+    ) -> List[list]:
+        # Targets are collapsed and split so that every command fits in ARG_MAX,
+        # the replace args are repeated in each targeted run
+        if isinstance(target, str):
+            target = [target]
+        target_args = Terraform.__build_args__(
+            "target", collapse_addresses(target) if target else None
+        )
+        replace_args = Terraform.__build_args__("replace", replace)
+        if target_args:
+            fixed, variable = replace_args, target_args
+        else:
+            fixed, variable = [], replace_args
+        budget = arg_max() - args_size(["terraform", *cmd, *fixed]) - 1024
+        chunks = chunk_args(variable, budget)
+        if len(chunks) > 1:
+            log.warn(
+                f"{len(variable)} addresses exceed the command line limit, running {len(chunks)} sequential commands"
+            )
+        return [[*fixed, *chunk] for chunk in chunks]
+
+    def __run_chunks__(
+        self,
+        runs: List[list],
+        title: str,
+        chdir=None,
+        success_codes=(0,),
+        replans: Optional[List[Optional[list]]] = None,
+        **kwargs,
+    ):
+        results = []
+        for index, run in enumerate(runs):
+            if index and replans and replans[index]:
+                # The previous run changed the state, the saved plan is stale
+                log.info(f"Planning part {index + 1} of {len(runs)} again")
+                planned = self.cmd(
+                    replans[index],
+                    title="Terraform plan",
+                    chdir=chdir,
+                    show_output=False,
+                )
+                if planned.code not in (0, 2):
+                    results.append(planned)
+                    break
+            result = self.cmd(run, title=title, chdir=chdir, **kwargs)
+            results.append(result)
+            if result.code not in success_codes:
+                break
+            result.success = True
+            if index < len(runs) - 1:
+                log.done(
+                    f"{title} part {index + 1} of {len(runs)} completed in: {result.duration} seconds",
+                    end_sub=True,
+                )
+        return merge_command_results(results)
+
     def _default_args(
         self,
         color: Optional[bool] = None,
@@ -161,9 +283,11 @@ class Terraform:
         command: list,
         title: Optional[str] = None,
         chdir: Optional[str] = None,
-        show_output: bool = True,
+        show_output: Union[bool, str] = True,
         callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
         line_callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
+        stdin: Optional[Any] = None,
+        env: Optional[Dict[str, str]] = None,
     ):
         cmd = ["terraform", *command]
         return run_command(
@@ -173,6 +297,8 @@ class Terraform:
             show_output=show_output,
             callback=callback,
             line_callback=line_callback,
+            stdin=stdin,
+            env={**TERRAFORM_ENV, **(env or {})},
         )
 
     def cmd(
@@ -180,22 +306,166 @@ class Terraform:
         command: list,
         title: Optional[str] = None,
         chdir: Optional[str] = None,
-        show_output: bool = True,
+        show_output: Union[bool, str] = True,
         callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
         line_callback: Optional[Callable[[Optional[str], Optional[str]], Any]] = None,
+        stdin: Optional[Any] = None,
+        env: Optional[Dict[str, str]] = None,
     ):
         if not chdir:
             chdir = self.chdir
+        env = {**TERRAFORM_ENV, **self.env, **(env or {})}
         cmd = ["terraform", *command]
-        return run_command(
-            cmd,
-            title=title,
-            cwd=chdir,
-            show_output=show_output,
-            callback=callback,
-            line_callback=line_callback,
+        name = Terraform.__command_name__(command)
+        stack = os.path.abspath(chdir or ".")
+        if show_output is True and self.raw_output:
+            show_output = "raw"
+        task = None
+        with self.log_context.use(), log.fields(
+            command_id=uuid().hex, command=name, stack=stack
+        ):
+            eta = self.__predict__(stack, name)
+            if eta is not None and eta >= ETA_MIN_SECONDS:
+                message = title or f"Terraform {name}"
+                # Streamed output would interleave with the spinner
+                if show_output:
+                    expected = format_elapsed_time(0, round(eta))
+                    log.info(f"{message} usually takes ~{expected}")
+                else:
+                    task = log.start(message, eta=eta)
+            result = run_command(
+                cmd,
+                title=title,
+                cwd=chdir,
+                show_output=show_output,
+                callback=callback,
+                line_callback=line_callback,
+                stdin=stdin,
+                env=env,
+            )
+            # Exit code 2 of -detailed-exitcode only means there are changes
+            success = result.success or (
+                result.code == 2 and TERRAFORM_ARGS["detailed_exitcode"] in command
+            )
+            if task is not None:
+                log.finish(task, success=success)
+            with log.fields(duration=result.duration, exit_code=result.code):
+                log.debug(
+                    f"Terraform {name} exited with code {result.code} in {result.duration}s"
+                )
+        self.__record__(stack, name, result, success)
+        return result
+
+    @staticmethod
+    def __command_name__(command: list) -> str:
+        args = [arg for arg in command if arg and not arg.startswith("-")]
+        if len(args) > 1 and args[0] in ("state", "workspace", "providers"):
+            return " ".join(args[:2])
+        return args[0] if args else ""
+
+    def __predict__(self, stack: str, name: str) -> Optional[float]:
+        if self.history is None or name in HISTORY_IGNORED:
+            return None
+        try:
+            return self.history.predict(stack, self.workspace.current, name)
+        except (sqlite3.Error, OSError):
+            return None
+
+    def __record__(self, stack: str, name: str, result: CommandResult, success: bool):
+        if self.history is None or name in HISTORY_IGNORED:
+            return
+        output = result.callback_output
+        if not isinstance(output, dict):
+            output = {}
+        changes = output.get("changes", output)
+        try:
+            self.history.record(
+                stack,
+                self.workspace.current,
+                name,
+                result.duration,
+                success=success,
+                resources=len(output["result"]) if "result" in output else None,
+                changes=changes if isinstance(changes, dict) else None,
+            )
+        except (sqlite3.Error, OSError) as e:
+            log.debug(f"Failed to record the command duration: {e}")
+
+    def duration_summary(
+        self,
+        command: str,
+        percentiles: Iterable[float] = (50, 90, 99),
+        chdir: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if self.history is None:
+            raise TerraformError(
+                "The duration history is disabled, pass a history_file", command
+            )
+        return self.history.summary(
+            os.path.abspath(chdir or self.chdir or "."),
+            self.workspace.current,
+            command,
+            percentiles,
         )
 
+    def __workspace_view__(self, workspace: str) -> "Terraform":
+        # Views run in worker threads, so none of the mutable caches are shared
+        view = copy.copy(self)
+        view.env = {**self.env, "TF_WORKSPACE": workspace}
+        view.version_dict = copy.deepcopy(self.version_dict)
+        name, ext = os.path.splitext(self.plan_file)
+        view.plan_file = f"{name}.{workspace}{ext}"
+        view.log_context = log.context(workspace)
+        view.workspace = Workspace(view, workspace)
+        view.state = State(view)
+        view.outputs = Outputs(view)
+        view.tuner = ParallelismTuner(view)
+        view.__graphs__ = {}
+        view.__plan_runs__ = {}
+        view.history = DurationStore(self.history.path) if self.history else None
+        return view
+
+    @in_log_context
+    def for_each_workspace(
+        self,
+        names: Iterable[str],
+        fn: Callable[["Terraform"], Any],
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, TerraformResult]:
+        names = list(dict.fromkeys(names))
+        existing = self.workspace.list(True).result
+        missing = [name for name in names if name not in existing]
+        if missing:
+            raise TerraformError(
+                f"Workspaces not found: {', '.join(missing)}",
+                "workspace",
+            )
+        if not max_workers:
+            max_workers = min(32, len(names)) or 1
+
+        def job(name: str) -> TerraformResult:
+            view = self.__workspace_view__(name)
+            with view.log_context.use():
+                try:
+                    return TerraformResult(True, fn(view))
+                except Exception as e:
+                    log.error(f"Workspace '{name}' failed: {e}")
+                    return TerraformResult(False, e)
+
+        log.info(
+            f"Running on {len(names)} workspaces with {max_workers} workers",
+            start_sub=True,
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip(names, executor.map(job, names)))
+        failed = [name for name, res in results.items() if not res.success]
+        if failed:
+            log.failed(f"Failed workspaces: {', '.join(failed)}", end_sub=True)
+        else:
+            log.success(f"All {len(names)} workspaces completed", end_sub=True)
+        return results
+
+    @in_log_context
     def init(
         self,
         color: Optional[bool] = None,
@@ -254,15 +524,15 @@ class Terraform:
         log.success(
             f"Terraform init completed in: {result.duration} seconds", end_sub=True
         )
-        log.info(self.workspace.current, self.workspace)
-        if self.workspace.current != self.workspace:
-            self.workspace.list(True)
-            if self.workspace.current != self.workspace:
-                self.workspace = self.workspace.select(
-                    self.workspace, or_create=True
-                ).result
+        # The backend may have changed, the cached workspace list is stale
+        self.workspace.invalidate()
+        # Select the requested workspace if init left another one
+        requested = self.workspace.__requested__
+        if self.workspace.current != requested:
+            self.workspace.select(requested, or_create=True)
         return TerraformResult(True, result.stdout)
 
+    @in_log_context
     def get(self, update: bool = None, color: bool = None):
         cmd = ["get"]
         cmd.append(Terraform._build_arg("update", update))
@@ -287,32 +557,59 @@ class Terraform:
 
     @staticmethod
     def __parse_vars__(vars: Optional[Dict[str, Any]] = None) -> List[str]:
+        global __VARS_DIR__
         if not vars:
             return []
-        args = []
-        for key in vars.keys():
-            value = vars[key]
-            if isinstance(value, str):
-                value = re.sub(r"\"", '\\"', value)
-                value = f'"{value}"'
-            elif (
-                isinstance(value, dict)
-                or isinstance(value, list)
-                or isinstance(value, tuple)
-            ):
-                value = _json.dumps(value)
-            args.append("-var")
-            args.append(f"{key}={value}")
-        return args
-
+        import hashlib  # Loads OpenSSL, kept off the import path
+
+        content = _json.dumps(vars, sort_keys=True, default=str)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        with __VARS_LOCK__:
+            path = __VARS_FILES__.get(digest)
+            if path is None or not os.path.exists(path):
+                if __VARS_DIR__ is None or not os.path.isdir(__VARS_DIR__):
+                    __VARS_DIR__ = tempfile.mkdtemp(prefix="terratesting-vars-")
+                path = os.path.join(__VARS_DIR__, f"{digest}.tfvars.json")
+                with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+                    file.write(content)
+                os.replace(f"{path}.tmp", path)
+                __VARS_FILES__[digest] = path
+        return [TERRAFORM_ARGS["var_file"] + path]
+
+    def __resolve_parallelism__(
+        self, parallelism: Optional[Union[int, str]], chdir: Optional[str] = None
+    ):
+        if not parallelism:
+            parallelism = self.paralellism
+        if parallelism == "auto":
+            return self.tuner.next(chdir), True
+        return parallelism, False
+
+    def __resolve_refresh__(
+        self, refresh: Optional[Union[bool, str]], chdir: Optional[str] = None
+    ) -> Optional[bool]:
+        if refresh != "auto":
+            return refresh
+        if not self.refresh_ttl:
+            return True
+        try:
+            age = self.state.refresh_age(chdir=chdir)
+        except (TerraformError, ValueError):
+            return True
+        if age is None or age > self.refresh_ttl:
+            return True
+        log.info(f"State refreshed {round(age)}s ago, skipping refresh")
+        return False
+
+    @in_log_context
     def plan(
         self,
         out: Optional[str] = None,
         destroy: bool = False,
-        refresh: Optional[bool] = True,
+        refresh: Optional[Union[bool, str]] = True,
         refresh_only: bool = False,
-        replace: Optional[str] = None,
-        target: Optional[str] = None,
+        replace: Optional[Union[str, List[str]]] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -321,9 +618,11 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         chdir: Optional[str] = None,
         state: Optional[str] = None,
+        detailed_exitcode: bool = False,
+        has_changes_only: bool = False,
     ):
         cmd = ["plan"]
         cmd.extend(
@@ -333,7 +632,6 @@ class Terraform:
         )
         if not out:
             out = self.plan_file
-        cmd.append(Terraform._build_arg("out", out))
 
         if (
             self.version_dict["version"]["major"] >= 1
@@ -344,6 +642,15 @@ class Terraform:
             log.warn(
                 f"the option '-refresh-only' is supported since the version 1.1.0, and your version is {self.version_dict['version_str']}"
             )
+        callback = None
+        line_callback = None
+        if has_changes_only:
+            # No plan file and no show, only the exit code and the change summary
+            detailed_exitcode = True
+            json = self.version_dict["version"]["major"] >= 1
+            callback = Terraform.__plan_summary_callback__
+            if json:
+                line_callback = Terraform.__plan_line_callback__
         if (
             self.version_dict["version"]["major"] >= 1
             and self.version_dict["version"]["minor"] >= 0
@@ -353,21 +660,48 @@ class Terraform:
             log.warn(
                 f"the option '-json' is supported since the version 1.0.0, and your version is {self.version_dict['version_str']}"
             )
-        if not parallelism:
-            parallelism = self.paralellism
+        parallelism, auto_parallelism = self.__resolve_parallelism__(parallelism, chdir)
         cmd.append(Terraform._build_arg("parallelism", parallelism))
 
+        auto_refresh = refresh == "auto" and bool(self.refresh_ttl)
+        refresh = self.__resolve_refresh__(refresh, chdir=chdir)
         cmd.append(Terraform._build_arg("destroy", destroy))
         cmd.append(Terraform._build_arg("refresh", refresh))
-        cmd.append(Terraform._build_arg("replace", replace))
-        cmd.append(Terraform._build_arg("target", target))
         cmd.append(Terraform._build_arg("var_file", var_file))
         cmd.append(Terraform._build_arg("state", state))
         cmd.append(Terraform._build_arg("compact_warnings", compact_warnings))
+        cmd.append(Terraform._build_arg("detailed_exitcode", detailed_exitcode))
 
         cmd.extend(Terraform.__parse_vars__(vars))
 
-        result = self.cmd(cmd, title="Terraform plan", chdir=chdir)
+        chunks = self.__address_chunks__(cmd, target=target, replace=replace)
+        plan_files = [out]
+        if has_changes_only:
+            plan_files = []
+        elif len(chunks) > 1:
+            name, ext = os.path.splitext(out)
+            plan_files = [f"{name}.{index + 1}{ext}" for index in range(len(chunks))]
+        runs = [
+            [*cmd, Terraform._build_arg("out", plan_file), *chunk]
+            for plan_file, chunk in zip(plan_files or [None] * len(chunks), chunks)
+        ]
+        # Applying a part of a split plan makes the next ones stale, apply plans
+        # them again with the same command
+        workdir = chdir or self.chdir
+        self.__plan_runs__.update(
+            ((workdir, plan_file), run) for plan_file, run in zip(plan_files, runs)
+        )
+        result = self.__run_chunks__(
+            runs,
+            "Terraform plan",
+            chdir=chdir,
+            success_codes=(0, 2) if detailed_exitcode else (0,),
+            callback=callback,
+            line_callback=line_callback,
+            show_output=line_callback is None,
+        )
+        if auto_parallelism:
+            self.tuner.observe(parallelism, result, chdir=chdir)
         if not result.success:
             log.failed(
                 f"Terraform plan failed in: {result.duration} seconds", end_sub=True
@@ -382,9 +716,91 @@ class Terraform:
         log.success(
             f"Terraform plan completed in: {result.duration} seconds", end_sub=True
         )
-        return TerraformResult(
-            True, dict(stdout=result.stdout, output=result.callback_output)
+        # Only refresh="auto" reads the records, the other plans skip the write
+        if auto_refresh and refresh is not False and not target and not state:
+            self.state.mark_refreshed(chdir=chdir)
+        if has_changes_only:
+            return TerraformResult(
+                True,
+                dict(
+                    has_changes=result.code == 2,
+                    changes=result.callback_output,
+                    stdout=result.stdout,
+                ),
+            )
+        res = dict(
+            stdout=result.stdout,
+            output=result.callback_output,
+            plan_files=plan_files,
         )
+        if detailed_exitcode:
+            res["has_changes"] = result.code == 2
+        return TerraformResult(True, res)
+
+    @in_log_context
+    def refresh_profile(
+        self,
+        target: Optional[Union[str, List[str]]] = None,
+        vars: Optional[dict] = None,
+        var_file: Optional[str] = None,
+        trace: bool = False,
+        parallelism: Optional[Union[int, str]] = None,
+        chdir: Optional[str] = None,
+    ) -> RefreshProfile:
+        if not trace and self.version_dict["version"]["major"] < 1:
+            log.warn(
+                f"plan -json is not available in {self.version_dict['version_str']}, profiling from a trace log"
+            )
+            trace = True
+        tf = self
+        log_path = None
+        if trace:
+            handle, log_path = tempfile.mkstemp(prefix="terratesting-", suffix=".log")
+            os.close(handle)
+            tf = copy.copy(self)
+            tf.env = {**self.env, "TF_LOG": "trace", "TF_LOG_PATH": log_path}
+        try:
+            result = tf.plan(
+                refresh=True,
+                target=target,
+                vars=vars,
+                var_file=var_file,
+                parallelism=parallelism,
+                chdir=chdir,
+                has_changes_only=True,
+            )
+            if not trace:
+                return RefreshProfile.from_plan_output(result.result["stdout"])
+            with open(log_path, "r", errors="replace") as file:
+                return RefreshProfile.from_trace(file.read())
+        finally:
+            if log_path:
+                os.remove(log_path)
+
+    @staticmethod
+    def __plan_summary_callback__(stdout: str = None, stderr: str = None):
+        changes = {"add": 0, "change": 0, "remove": 0}
+        for line in stdout.splitlines():
+            if line.startswith("{"):
+                try:
+                    line = _json.loads(line)
+                except ValueError:
+                    continue
+                if line.get("type") == "change_summary":
+                    changes = line["changes"]
+            else:
+                match = PLAN_SUMMARY_REGEX.search(line)
+                if match:
+                    changes = {
+                        key: int(value) for key, value in match.groupdict().items()
+                    }
+        return changes
+
+    @staticmethod
+    def __plan_line_callback__(stdout: str = None, stderr: str = None):
+        # Only the change summary matters here, the raw lines are kept for debugging
+        if stdout:
+            log.debug(stdout.rstrip())
 
     @staticmethod
     def __apply_line_callback__(stdout: str = None, stderr: str = None):
@@ -412,15 +828,16 @@ class Terraform:
                 pass
         return result
 
+    @in_log_context
     def apply(
         self,
-        plan_file: Optional[str] = None,
+        plan_file: Optional[Union[str, List[str]]] = None,
         auto_approve: bool = False,
         destroy: bool = False,
-        refresh: Optional[bool] = True,
+        refresh: Optional[Union[bool, str]] = True,
         refresh_only: bool = False,
-        replace: Optional[str] = None,
-        target: Optional[str] = None,
+        replace: Optional[Union[str, List[str]]] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -429,11 +846,12 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
         backup: Optional[str] = None,
         chdir: Optional[str] = None,
+        replan: bool = False,
     ):
         cmd = ["apply"]
         cmd.extend(
@@ -451,10 +869,8 @@ class Terraform:
                 line_callback = Terraform.__apply_line_callback__
                 callback = Terraform.__apply_callback__
 
-        if not parallelism:
-            cmd.append(Terraform._build_arg("parallelism", self.paralellism))
-        else:
-            cmd.append(Terraform._build_arg("parallelism", parallelism))
+        parallelism, auto_parallelism = self.__resolve_parallelism__(parallelism, chdir)
+        cmd.append(Terraform._build_arg("parallelism", parallelism))
         cmd.append(Terraform._build_arg("auto_approve", auto_approve))
         cmd.append(Terraform._build_arg("compact_warnings", compact_warnings))
 
@@ -465,9 +881,11 @@ class Terraform:
         cmd.extend(Terraform.__parse_vars__(vars))
 
         cmd.append(Terraform._build_arg("destroy", destroy))
-        cmd.append(Terraform._build_arg("refresh", refresh))
-        cmd.append(Terraform._build_arg("replace", replace))
-        cmd.append(Terraform._build_arg("target", target))
+        cmd.append(
+            Terraform._build_arg(
+                "refresh", self.__resolve_refresh__(refresh, chdir=chdir)
+            )
+        )
         if (
             self.version_dict["version"]["major"] >= 1
             and self.version_dict["version"]["minor"] >= 0
@@ -478,17 +896,43 @@ class Terraform:
                 f"the option '-refresh-only' is supported since the version 1.1.0, and your version is {self.version_dict['version_str']}"
             )
         if not plan_file:
-            cmd.append(shlex.quote(self.plan_file))
-        else:
-            cmd.append(shlex.quote(plan_file))
-        result = self.cmd(
-            cmd,
-            title="Terraform apply",
+            plan_file = self.plan_file
+        plan_files = [plan_file] if isinstance(plan_file, str) else list(plan_file)
+        chunks = self.__address_chunks__(cmd, target=target, replace=replace)
+        if len(chunks) > 1:
+            raise TerraformError(
+                "Can't split targets over a saved plan file, plan them and apply "
+                "the plan files",
+                "apply",
+            )
+        runs = [[*cmd, file] for file in plan_files]
+        replans = None
+        if len(plan_files) > 1:
+            workdir = chdir or self.chdir
+            replans = [self.__plan_runs__.get((workdir, file)) for file in plan_files]
+            if not replan or not all(replans[1:]):
+                raise TerraformError(
+                    "Applying a part of a split plan makes the next ones stale, "
+                    "plan again after each apply or pass replan=True to apply "
+                    "plans made by this instance",
+                    "apply",
+                )
+            log.warn(
+                f"Planning parts 2 to {len(plan_files)} again after the previous "
+                "apply, the applied plans differ from the reviewed ones"
+            )
+        result = self.__run_chunks__(
+            runs,
+            "Terraform apply",
             chdir=chdir,
+            replans=replans,
             line_callback=line_callback,
             callback=callback,
             show_output=not (json and self.version_dict["version"]["major"] >= 1),
         )
+        if auto_parallelism:
+            self.tuner.observe(parallelism, result, chdir=chdir)
+        self.state.invalidate()
         res = TerraformResult(True, result.stdout)
         if not result.success:
             log.failed(
@@ -505,12 +949,17 @@ class Terraform:
             f"Terraform apply completed in: {result.duration} seconds", end_sub=True
         )
         if json and self.version_dict["version"]["major"] >= 1:
-            res.result = dict(stdout=result.stdout, output=result.callback_output)
+            res.result = dict(
+                stdout=result.stdout,
+                output=result.callback_output,
+                timeline=Timeline.from_output(result.stdout),
+            )
         return res
 
+    @in_log_context
     def destroy(
         self,
-        target: Optional[str] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[Dict[str, Any]] = None,
         var_file: Optional[str] = None,
         auto_approve: bool = False,
@@ -518,7 +967,7 @@ class Terraform:
         color: Optional[bool] = None,
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         chdir: Optional[str] = None,
     ) -> bool:
         cmd = ["destroy"]
@@ -529,18 +978,19 @@ class Terraform:
             )
         )
 
-        if not parallelism:
-            cmd.append(Terraform._build_arg("parallelism", self.paralellism))
-        else:
-            cmd.append(Terraform._build_arg("parallelism", parallelism))
+        parallelism, auto_parallelism = self.__resolve_parallelism__(parallelism, chdir)
+        cmd.append(Terraform._build_arg("parallelism", parallelism))
 
         cmd.append(Terraform._build_arg("auto_approve", auto_approve))
-        cmd.append(Terraform._build_arg("target", target))
         cmd.append(Terraform._build_arg("var_file", var_file))
 
         cmd.extend(self.__parse_vars__(vars))
 
-        result = self.cmd(cmd, title="Terraform destroy", chdir=chdir)
+        runs = [[*cmd, *chunk] for chunk in self.__address_chunks__(cmd, target)]
+        result = self.__run_chunks__(runs, "Terraform destroy", chdir=chdir)
+        if auto_parallelism:
+            self.tuner.observe(parallelism, result, chdir=chdir)
+        self.state.invalidate()
         if not result.success:
             log.failed(
                 f"Terraform destroy failed in: {result.duration} seconds",
@@ -560,6 +1010,7 @@ class Terraform:
         )
         return TerraformResult(True, result.stdout)
 
+    @in_log_context
     def show(self, file: str = None, json=True, color: bool = None, chdir: str = None):
         cmd = ["show"]
         # log.info("Running Terraform show")
@@ -596,6 +1047,7 @@ class Terraform:
             res.result = _json.loads(result.stdout)
         return res
 
+    @in_log_context
     def login(self, hostname: str = None, chdir: str = None):
         cmd = ["login"]
         if hostname:
@@ -619,6 +1071,7 @@ class Terraform:
         )
         return res
 
+    @in_log_context
     def logout(self, hostname: str = None, chdir: str = None):
         cmd = ["logout"]
         if hostname:
@@ -644,38 +1097,7 @@ class Terraform:
         )
         return res
 
-    @staticmethod
-    def fmt(
-        chdir: str = ".",
-        list_files: bool = True,
-        diff: bool = False,
-        write: bool = True,
-        check: bool = False,
-        recursive: bool = False,
-    ):
-        cmd = ["fmt"]
-        cmd.append(Terraform._build_arg("diff", diff))
-        cmd.append(Terraform._build_arg("check", check))
-        cmd.append(Terraform._build_arg("recursive", recursive))
-        if list_files is False:
-            cmd.append(Terraform._build_arg("list", list_files))
-        if write is False:
-            cmd.append(Terraform._build_arg("write", write))
-
-        result = Terraform.cmd(cmd, "Terraform fmt", chdir=chdir)
-        res = TerraformResult(True, result.stdout)
-        if not result.success:
-            log.failed(f"Terraform fmt failed in {result.duration}s", end_sub=True)
-            raise TerraformError(
-                "Failed to run terraform fmt",
-                "fmt",
-                result.command,
-                result.stderr,
-                result.duration,
-            )
-        log.success(f"Terraform fmt completed in {result.duration}s", end_sub=True)
-        return res
-
+    @in_log_context
     def fmt(
         self,
         list_files: bool = True,
@@ -708,6 +1130,7 @@ class Terraform:
         log.success(f"Terraform fmt completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
     def validate(
         self,
         json: Optional[bool] = False,
@@ -734,6 +1157,7 @@ class Terraform:
         log.success(f"Terraform validate completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
     def output(
         self,
         output_name: Optional[str] = None,
@@ -770,6 +1194,7 @@ class Terraform:
             res.result = _json.loads(result.stdout)
         return res
 
+    @in_log_context
     def graph(
         self,
         type: Optional[str] = None,
@@ -805,6 +1230,33 @@ class Terraform:
         log.success(f"Terraform graph completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
+    def dependency_graph(
+        self,
+        type: Optional[str] = None,
+        plan: Optional[str] = None,
+        refresh: Optional[bool] = False,
+        chdir: Optional[str] = None,
+    ) -> DependencyGraph:
+        workdir = chdir or self.chdir or "."
+        plan_stamp = None
+        if plan:
+            try:
+                stat = os.stat(os.path.join(workdir, plan))
+                plan_stamp = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        key = (os.path.abspath(workdir), type, plan, plan_stamp, config_hash(workdir))
+        graph = self.__graphs__.get(key)
+        if graph is not None and not refresh:
+            return graph
+        graph = DependencyGraph.from_dot(
+            self.graph(type=type, plan=plan, chdir=chdir).result
+        )
+        self.__graphs__[key] = graph
+        return graph
+
+    @in_log_context
     def Import(
         self,
         address: str,
@@ -814,7 +1266,7 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[int] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         provider: Optional[str] = None,
         vars: Optional[Dict[str, Any]] = None,
         var_file: Optional[str] = None,
@@ -831,7 +1283,9 @@ class Terraform:
         )
 
         cmd.append(Terraform._build_arg("config", config))
-        cmd.append(Terraform._build_arg("paralellism", parallelism))
+        if parallelism == "auto":
+            parallelism = self.tuner.next(chdir)
+        cmd.append(Terraform._build_arg("parallelism", parallelism))
         cmd.append(Terraform._build_arg("provider", provider))
         cmd.append(Terraform._build_arg("var_file", var_file))
         cmd.append(Terraform._build_arg("state", state))
@@ -839,10 +1293,11 @@ class Terraform:
         cmd.append(Terraform._build_arg("backup", backup))
         cmd.extend(Terraform.__parse_vars__(vars))
 
-        cmd.append(shlex.quote(address))
-        cmd.append(shlex.quote(id))
+        cmd.append(address)
+        cmd.append(id)
 
         result = self.cmd(cmd, "Terraform import", chdir)
+        self.state.invalidate()
         res = TerraformResult(True, result.stdout)
         if not result.success:
             log.failed(f"Terraform import failed in {result.duration}s", end_sub=True)
@@ -856,9 +1311,167 @@ class Terraform:
         log.success(f"Terraform import completed in {result.duration}s", end_sub=True)
         return res
 
+    @staticmethod
+    def __hcl_string__(value: str) -> str:
+        # JSON string escapes are valid HCL, only template sequences need escaping
+        return _json.dumps(str(value)).replace("${", "$${").replace("%{", "%%{")
+
+    def __import_blocks__(
+        self,
+        mapping: Dict[str, str],
+        vars: Optional[Dict[str, Any]] = None,
+        var_file: Optional[str] = None,
+        parallelism: Optional[Union[int, str]] = None,
+        lock: Optional[bool] = None,
+        lock_timeout: Optional[str] = None,
+        allow_other_changes: bool = False,
+        chdir: Optional[str] = None,
+    ) -> Dict[str, TerraformResult]:
+        workdir = chdir or self.chdir or "."
+        token = uuid().hex[:8]
+        imports_file = os.path.join(workdir, f"terratesting-imports-{token}.tf")
+        plan_file = f"terratesting-imports-{token}.tfplan"
+        blocks = [
+            f"import {{\n  to = {address}\n  id = {Terraform.__hcl_string__(id)}\n}}\n"
+            for address, id in mapping.items()
+        ]
+        with open(imports_file, "w") as file:
+            file.write("\n".join(blocks))
+        try:
+            self.plan(
+                out=plan_file,
+                vars=vars,
+                var_file=var_file,
+                parallelism=parallelism,
+                lock=lock,
+                lock_timeout=lock_timeout,
+                chdir=chdir,
+            )
+            if not allow_other_changes:
+                changes = self.show(file=plan_file, chdir=chdir).result
+                others = [
+                    change["address"]
+                    for change in changes.get("resource_changes", [])
+                    if change["address"] not in mapping
+                    and change["change"]["actions"] not in (["no-op"], ["read"])
+                ]
+                if others:
+                    raise TerraformError(
+                        f"The import plan also changes {len(others)} other resources: {', '.join(others[:10])}",
+                        "import",
+                    )
+            self.apply(
+                plan_file=plan_file,
+                lock=lock,
+                lock_timeout=lock_timeout,
+                parallelism=parallelism,
+                chdir=chdir,
+            )
+        finally:
+            for path in (imports_file, os.path.join(workdir, plan_file)):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+        imported = set(self.state.list(chdir=chdir).result.splitlines())
+        return {
+            address: TerraformResult(
+                address in imported,
+                (
+                    mapping[address]
+                    if address in imported
+                    else "Address not found in state after apply"
+                ),
+            )
+            for address in mapping
+        }
+
+    def __import_each__(
+        self,
+        mapping: Dict[str, str],
+        max_workers: int = 4,
+        retries: int = 3,
+        vars: Optional[Dict[str, Any]] = None,
+        var_file: Optional[str] = None,
+        lock_timeout: Optional[str] = None,
+        chdir: Optional[str] = None,
+    ) -> Dict[str, TerraformResult]:
+        if not lock_timeout or lock_timeout == "0s":
+            # Concurrent imports share one state lock, they must wait for it
+            lock_timeout = "60s"
+
+        def job(address: str) -> TerraformResult:
+            for attempt in range(retries + 1):
+                try:
+                    self.Import(
+                        address,
+                        mapping[address],
+                        vars=vars,
+                        var_file=var_file,
+                        lock_timeout=lock_timeout,
+                        chdir=chdir,
+                    )
+                    return TerraformResult(True, mapping[address])
+                except TerraformError as e:
+                    if "state lock" not in (e.stderr or "") or attempt == retries:
+                        return TerraformResult(False, e)
+                    time.sleep(2**attempt)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(mapping, executor.map(job, mapping)))
+
+    @in_log_context
+    def bulk_import(
+        self,
+        mapping: Dict[str, str],
+        vars: Optional[Dict[str, Any]] = None,
+        var_file: Optional[str] = None,
+        parallelism: Optional[Union[int, str]] = None,
+        lock: Optional[bool] = None,
+        lock_timeout: Optional[str] = None,
+        allow_other_changes: bool = False,
+        max_workers: int = 4,
+        chdir: Optional[str] = None,
+    ) -> TerraformResult:
+        log.info(f"Importing {len(mapping)} resources", start_sub=True)
+        if (
+            self.version_dict["version"]["major"],
+            self.version_dict["version"]["minor"],
+        ) >= (1, 5):
+            result = self.__import_blocks__(
+                mapping,
+                vars=vars,
+                var_file=var_file,
+                parallelism=parallelism,
+                lock=lock,
+                lock_timeout=lock_timeout,
+                allow_other_changes=allow_other_changes,
+                chdir=chdir,
+            )
+        else:
+            log.warn(
+                f"Import blocks are supported since the version 1.5.0, and your version is {self.version_dict['version_str']}, importing one by one"
+            )
+            result = self.__import_each__(
+                mapping,
+                max_workers=max_workers,
+                vars=vars,
+                var_file=var_file,
+                lock_timeout=lock_timeout,
+                chdir=chdir,
+            )
+        failed = [address for address, res in result.items() if not res.success]
+        if failed:
+            log.failed(
+                f"Failed to import {len(failed)} of {len(mapping)} resources",
+                end_sub=True,
+            )
+        else:
+            log.success(f"Imported {len(mapping)} resources", end_sub=True)
+        return TerraformResult(not failed, result)
+
     def __legacy_refresh__(
         self,
-        target: Optional[str] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -866,7 +1479,7 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
         backup: Optional[str] = None,
@@ -878,11 +1491,8 @@ class Terraform:
                 color=color, lock=lock, lock_timeout=lock_timeout, input=input
             )
         )
-        if not parallelism:
-            cmd.append(Terraform._build_arg("parallelism", self.paralellism))
-        else:
-            cmd.append(Terraform._build_arg("parallelism", parallelism))
-        cmd.append(Terraform._build_arg("target", target))
+        parallelism, auto_parallelism = self.__resolve_parallelism__(parallelism, chdir)
+        cmd.append(Terraform._build_arg("parallelism", parallelism))
         cmd.append(Terraform._build_arg("compact_warnings", compact_warnings))
 
         cmd.append(Terraform._build_arg("state", state))
@@ -891,7 +1501,11 @@ class Terraform:
         cmd.append(Terraform._build_arg("var_file", var_file))
         cmd.extend(Terraform.__parse_vars__(vars))
 
-        result = self.cmd(cmd, "Terraform refresh", chdir)
+        runs = [[*cmd, *chunk] for chunk in self.__address_chunks__(cmd, target)]
+        result = self.__run_chunks__(runs, "Terraform refresh", chdir=chdir)
+        if auto_parallelism:
+            self.tuner.observe(parallelism, result, chdir=chdir)
+        self.state.invalidate()
         res = TerraformResult(True, result.stdout)
         if not result.success:
             log.failed(f"Terraform refresh failed in {result.duration}s", end_sub=True)
@@ -905,9 +1519,10 @@ class Terraform:
         log.success(f"Terraform refresh completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
     def refresh(
         self,
-        target: Optional[str] = None,
+        target: Optional[Union[str, List[str]]] = None,
         vars: Optional[dict] = None,
         var_file: Optional[str] = None,
         compact_warnings: bool = False,
@@ -916,7 +1531,7 @@ class Terraform:
         lock: Optional[bool] = None,
         lock_timeout: Optional[str] = None,
         color: Optional[bool] = None,
-        parallelism: Optional[int] = None,
+        parallelism: Optional[Union[int, str]] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
         backup: Optional[str] = None,
@@ -964,6 +1579,13 @@ class Terraform:
                 chdir=chdir,
             )
 
+    @staticmethod
+    def __reject_args__(command: str, reason: str, **args):
+        # Raise instead of silently dropping args the chosen command can't pass on
+        given = [name for name, value in args.items() if value]
+        if given:
+            raise TerraformError(f"{', '.join(given)} can't be used {reason}", command)
+
     def __legacy_taint__(
         self,
         address: str,
@@ -987,16 +1609,15 @@ class Terraform:
         if lock_timeout != "0s":
             cmd.append(Terraform._build_arg("lock_timeout", lock_timeout))
 
-        cmd.append(
-            Terraform._build_arg("ignore_remote_version", ignore_remote_version)
-        )
+        cmd.append(Terraform._build_arg("ignore_remote_version", ignore_remote_version))
         cmd.append(Terraform._build_arg("backup", backup))
         cmd.append(Terraform._build_arg("state", state))
         cmd.append(Terraform._build_arg("state_out", state_out))
         cmd.append(Terraform._build_arg("allow_missing", allow_missing))
-        cmd.append(shlex.quote(address))
+        cmd.append(address)
 
         result = self.cmd(cmd, "Terraform taint", chdir)
+        self.state.invalidate()
         res = TerraformResult(True, result.stdout)
         if not result.success:
             log.failed(f"Terraform taint failed in {result.duration}s", end_sub=True)
@@ -1010,9 +1631,10 @@ class Terraform:
         log.success(f"Terraform taint completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
     def taint(
         self,
-        address: str,
+        address: Union[str, List[str]],
         backup: Optional[str] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
@@ -1024,59 +1646,67 @@ class Terraform:
         var_file: Optional[str] = None,
         chdir: Optional[str] = None,
     ):
-        if (
-            self.version_dict["version"]["major"] == 0
-            and self.version_dict["version"]["minor"] <= 15
-        ):
-            if (
+        addresses = [address] if isinstance(address, str) else list(address)
+        if self.version_dict["version"]["major"] == 0 and (
+            self.version_dict["version"]["minor"] < 15
+            or (
                 self.version_dict["version"]["minor"] == 15
-                and self.version_dict["version"]["patch"] > 2
-            ):
-                log.warn(
-                    f"Command 'terraform taint' is deprecated since 0.15.2, using 'terraform apply -replace=<address>' instead"
-                )
-                return self.apply(
-                    replace=address,
-                    lock=lock,
-                    lock_timeout=lock_timeout,
-                    chdir=chdir,
-                    vars=vars,
-                    var_file=var_file,
+                and self.version_dict["version"]["patch"] <= 2
+            )
+        ):
+            if len(addresses) > 1:
+                Terraform.__reject_args__(
+                    "taint",
+                    "with several addresses, the state is pulled and pushed once",
                     backup=backup,
                     state=state,
                     state_out=state_out,
                 )
-            else:
-                return self.__legacy_taint__(
-                    address,
-                    lock=lock,
+                return self.state.flag_instances(
+                    addresses,
+                    tainted=True,
                     allow_missing=allow_missing,
+                    ignore_remote_version=ignore_remote_version,
+                    lock=lock,
                     lock_timeout=lock_timeout,
                     chdir=chdir,
-                    backup=backup,
-                    state=state,
-                    state_out=state_out,
-                    ignore_remote_version=ignore_remote_version,
                 )
-        else:
-            log.warn(
-                f"Command 'terraform taint' is deprecated since 0.15.2, using 'terraform apply -replace=<address>' instead"
-            )
-            return self.apply(
-                replace=address,
+            return self.__legacy_taint__(
+                addresses[0],
                 lock=lock,
+                allow_missing=allow_missing,
                 lock_timeout=lock_timeout,
                 chdir=chdir,
-                vars=vars,
-                var_file=var_file,
                 backup=backup,
                 state=state,
                 state_out=state_out,
+                ignore_remote_version=ignore_remote_version,
             )
+        Terraform.__reject_args__(
+            "taint",
+            "with 'terraform plan -replace', used since 0.15.2",
+            backup=backup,
+            state_out=state_out,
+            ignore_remote_version=ignore_remote_version,
+            allow_missing=allow_missing,
+        )
+        log.warn(
+            f"Command 'terraform taint' is deprecated since 0.15.2, using 'terraform plan -replace=<address>' instead, apply the plan to replace the resources"
+        )
+        return self.plan(
+            replace=addresses,
+            lock=lock,
+            lock_timeout=lock_timeout,
+            chdir=chdir,
+            vars=vars,
+            var_file=var_file,
+            state=state,
+        )
 
+    @in_log_context
     def untaint(
         self,
-        address: str,
+        address: Union[str, List[str]],
         backup: Optional[str] = None,
         state: Optional[str] = None,
         state_out: Optional[str] = None,
@@ -1086,6 +1716,26 @@ class Terraform:
         lock_timeout: Optional[str] = None,
         chdir: Optional[str] = None,
     ):
+        if not isinstance(address, str):
+            addresses = list(dict.fromkeys(address))
+            if len(addresses) > 1:
+                Terraform.__reject_args__(
+                    "untaint",
+                    "with several addresses, the state is pulled and pushed once",
+                    backup=backup,
+                    state=state,
+                    state_out=state_out,
+                )
+                return self.state.flag_instances(
+                    addresses,
+                    tainted=False,
+                    allow_missing=allow_missing,
+                    ignore_remote_version=ignore_remote_version,
+                    lock=lock,
+                    lock_timeout=lock_timeout,
+                    chdir=chdir,
+                )
+            address = addresses[0]
         cmd = ["untaint"]
         if not lock:
             lock = self.lock
@@ -1097,16 +1747,15 @@ class Terraform:
         if lock_timeout != "0s":
             cmd.append(Terraform._build_arg("lock_timeout", lock_timeout))
 
-        cmd.append(
-            Terraform._build_arg("ignore_remote_version", ignore_remote_version)
-        )
+        cmd.append(Terraform._build_arg("ignore_remote_version", ignore_remote_version))
         cmd.append(Terraform._build_arg("backup", backup))
         cmd.append(Terraform._build_arg("state", state))
         cmd.append(Terraform._build_arg("state_out", state_out))
         cmd.append(Terraform._build_arg("allow_missing", allow_missing))
-        cmd.append(shlex.quote(address))
+        cmd.append(address)
 
         result = self.cmd(cmd, "Terraform untaint", chdir)
+        self.state.invalidate()
         res = TerraformResult(True, result.stdout)
         if not result.success:
             log.failed(f"Terraform untaint failed in {result.duration}s", end_sub=True)
@@ -1120,6 +1769,7 @@ class Terraform:
         log.success(f"Terraform untaint completed in {result.duration}s", end_sub=True)
         return res
 
+    @in_log_context
     def force_unlock(
         self, lock_id: str, force: Optional[bool] = False, chdir: Optional[str] = None
     ):
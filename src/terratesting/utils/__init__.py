@@ -1,2 +1,3 @@
-from .logger import Logger, log
+from .logger import LogContext, Logger, in_log_context, log
 from .utils import *
+from .address import *
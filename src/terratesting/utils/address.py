@@ -0,0 +1,74 @@
+import json
+import re
+from typing import Iterable, List, Optional
+
+RESOURCE_ADDRESS_REGEX = re.compile(
+    r"^(?P<module>(?:module\.[^.\[]+(?:\[[^\]]+\])?\.)*)"
+    r"(?P<data>data\.)?(?P<type>[^.\[]+)\.(?P<name>[^.\[]+)"
+    r"(?:\[(?P<index>[^\]]+)\])?$"
+)
+
+
+def parse_resource_address(address: str) -> Optional[dict]:
+    """
+    Split a resource instance address into the fields used by the state file.
+
+    Args:
+        address: Resource address, e.g. 'module.app[0].aws_instance.web["a"]'
+
+    Returns:
+        A dict with module, mode, type, name and index keys, or None if the
+        address is not a resource address
+    """
+    match = RESOURCE_ADDRESS_REGEX.match(address.strip())
+    if not match or match.group("type") == "module":
+        return None
+    index = match.group("index")
+    if index is not None:
+        try:
+            index = json.loads(index)
+        except ValueError:
+            pass
+    return {
+        "module": match.group("module").rstrip("."),
+        "mode": "data" if match.group("data") else "managed",
+        "type": match.group("type"),
+        "name": match.group("name"),
+        "index": index,
+    }
+
+
+def __address_prefixes__(address: str) -> List[str]:
+    """Every enclosing address of the given one, split at '.' and '[' boundaries"""
+    prefixes = []
+    quoted = False
+    for position, char in enumerate(address):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in ".[" and position > 0:
+            prefixes.append(address[:position])
+    return prefixes
+
+
+def collapse_addresses(addresses: Iterable[str]) -> List[str]:
+    """
+    Deduplicate addresses and drop the ones already covered by a broader one.
+
+    A module or resource address covers all the addresses nested in it, so
+    ['module.app', 'module.app.aws_instance.web', 'aws_s3_bucket.b[0]', 'aws_s3_bucket.b']
+    collapses to ['module.app', 'aws_s3_bucket.b'].
+
+    Args:
+        addresses: Resource or module addresses
+
+    Returns:
+        The minimal list of addresses, in their original order
+    """
+    unique = list(dict.fromkeys(address.strip() for address in addresses))
+    present = set(unique)
+    return [
+        address
+        for address in unique
+        if address
+        and not any(prefix in present for prefix in __address_prefixes__(address))
+    ]
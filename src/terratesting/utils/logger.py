@@ -1,27 +1,101 @@
 import traceback
 import atexit
 import datetime
-import inspect
+import functools
 import json
 import logging
 import logging.handlers
 import shutil
+import re
 import sys
 import os
-from queue import Queue
-from threading import Event, Thread
+from contextlib import contextmanager
+from contextvars import ContextVar
+from queue import Empty, Queue
+from threading import Event, Lock, RLock, Thread
 from time import time
+from uuid import uuid4
 
 # ANSI escape codes for colors and styles (cross-platform)
 from .colors import color
 
 __LOGGERS__ = []
+__HOOKS_INSTALLED__ = False
 
 # Logger handle exception outputs
 HANDLE_EXCEPTIONS = True
 
 HORIZONTAL_SEPARATOR = "─"
 
+# Seconds between the progress lines of running tasks in compact mode
+HEARTBEAT_INTERVAL = 30.0
+SPINNER_INTERVAL = 0.2
+
+# Correlates the NDJSON records of every process of a run, set TERRATESTING_RUN_ID to share it
+RUN_ID = os.environ.get("TERRATESTING_RUN_ID") or uuid4().hex
+
+ANSI_ESCAPE_REGEX = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+JSON_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+# Buffered handlers write once this many records, bytes or seconds are pending
+BUFFER_RECORDS = 256
+BUFFER_BYTES = 64 * 1024
+BUFFER_INTERVAL = 0.1
+
+# Queue sentinels, wake the logger thread up or make it drain the queue and exit
+__WAKE__ = object()
+__STOP__ = object()
+
+
+class LogContext:
+    """Env label and sub process nesting of one user of the shared logger
+
+    Log calls made while the context is active, in the same thread or asyncio
+    task, are labeled with its env and nested on their own, so concurrent
+    Terraform instances don't mix their output.
+
+    Attributes:
+        env (str): Environment label of the log lines
+    """
+
+    env: str
+
+    def __init__(self, env: str):
+        self.env = env
+        self.__proc_level__ = 0
+
+    def bind(self):
+        """Makes this context the active one of the current thread or task"""
+        __LOG_CONTEXT__.set(self)
+
+    @contextmanager
+    def use(self):
+        """Makes this context the active one until the block exits"""
+        token = __LOG_CONTEXT__.set(self)
+        try:
+            yield self
+        finally:
+            __LOG_CONTEXT__.reset(token)
+
+    def __str__(self):
+        return f"LogContext(env={self.env})"
+
+
+def in_log_context(method):
+    """Runs a method in the `log_context` of its object, in whatever thread calls it"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.log_context.use():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+__LOG_CONTEXT__: ContextVar = ContextVar("terratesting_log_context", default=None)
+# Extra NDJSON fields of the active command, like its command_id, never mutated in place
+__LOG_FIELDS__: ContextVar = ContextVar("terratesting_log_fields", default={})
+
 
 def __catcher__(type, value, tback):
     global HANDLE_EXCEPTIONS
@@ -38,7 +112,15 @@ def __catcher__(type, value, tback):
         sys.__excepthook__(type, value, tback)
 
 
-sys.excepthook = __catcher__
+def __install_hooks__():
+    """Routes uncaught exceptions to the loggers and drains them at exit, once"""
+    global __HOOKS_INSTALLED__
+    if __HOOKS_INSTALLED__:
+        return
+    __HOOKS_INSTALLED__ = True
+    sys.excepthook = __catcher__
+    atexit.register(__clean__)
+
 
 LOGGER_LEVEL_COLORS = {
     "TRACE": color.bold(color.cyan("TRACE")),
@@ -55,6 +137,11 @@ LOGGER_LEVEL_COLORS = {
     "EXCEPTION": color.bold(color.bg_red("EXCEP")),
 }
 
+# Pre-rendered pieces of the colored file column, same output as
+# dark_green(filename) + orange(":") + dark_green(lineno)
+FILE_COLOR = color.GREEN_DARK
+FILE_LINE_SEPARATOR = color.orange(":") + color.GREEN_DARK
+
 # Map custom levels to standard logging levels (and define custom levels)
 LOGGER_LEVELS = {
     "TRACE": logging.DEBUG - 1,  # Below DEBUG
@@ -83,6 +170,32 @@ logging.addLevelName(LOGGER_LEVELS["DONE"], "DONE")
 logging.addLevelName(LOGGER_LEVELS["SEP"], "SEP")
 
 
+def __frame_info__(frame) -> tuple:
+    """Short filename and line number of a frame"""
+    return ("/".join(frame.f_code.co_filename.split(os.sep)[-2:]), frame.f_lineno)
+
+
+def compact_output(stream=None) -> bool:
+    """Whether the output should be compact: no colors, spinner or line rewrites
+
+    True when `NO_COLOR` or `CI` are set or the stream is not a terminal.
+
+    Args:
+        stream (IO, optional): Console stream. Defaults to sys.stdout.
+    """
+    if os.environ.get("NO_COLOR") or os.environ.get("CI", "").lower() not in (
+        "",
+        "0",
+        "false",
+    ):
+        return True
+    stream = sys.stdout if stream is None else stream
+    try:
+        return not stream.isatty()
+    except (AttributeError, ValueError):
+        return True
+
+
 def format_elapsed_time(start_time: float, end_time: float) -> str:
     """Function to format elapsed time in <h>h, <m>m, <s>s, <ms>ms
 
@@ -171,6 +284,7 @@ class LoggerFormatter(logging.Formatter):
         self.__start_proc_prefix__ = "\u256d○ "
         self.__end_proc_prefix__ = "\u2570● "
         self.__subproc_prefix__ = "│ "
+        self.__prefix_cache__ = {}
 
     def __process_line_fmt__(self, line: str, bold: bool, success: bool, fail: bool):
         if bold:
@@ -211,8 +325,8 @@ class LoggerFormatter(logging.Formatter):
         if raw:
             return msg
 
-        timestamp = args.get(
-            "timestamp", datetime.datetime.now().isoformat(timespec="milliseconds")
+        timestamp = args.get("timestamp") or datetime.datetime.now().isoformat(
+            timespec="milliseconds"
         )
 
         # Handle line continuation
@@ -222,20 +336,22 @@ class LoggerFormatter(logging.Formatter):
 
         lines = []
         if self.colors:
-            proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+            # Nesting is tracked per logging context, the formatter's own otherwise
+            state = args.get("context") or self
+            proc_prefix = self.__subproc_prefix__ * state.__proc_level__
             end_proc = args.get("end_proc", False)
             start_proc = args.get("start_proc", False)
             bold = args.get("bold", False)
             success = record.levelname == "SUCCESS"
             fail = record.levelname == "FAILED"
 
-            if end_proc and self.__proc_level__ <= 0:
+            if end_proc and state.__proc_level__ <= 0:
                 end_proc = False
             if start_proc:
-                self.__proc_level__ += 1
+                state.__proc_level__ += 1
             elif end_proc:
-                self.__proc_level__ -= 1
-            self.__proc_level__ = max(self.__proc_level__, 0)
+                state.__proc_level__ -= 1
+            state.__proc_level__ = max(state.__proc_level__, 0)
 
             if "\n" in msg:
                 lines = []
@@ -246,10 +362,10 @@ class LoggerFormatter(logging.Formatter):
                         + self.__start_proc_prefix__ * 2
                         + self.__process_line_fmt__(messages[0], bold, success, fail)
                     )
-                    self.__proc_level__ += 1
-                    proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+                    state.__proc_level__ += 1
+                    proc_prefix = self.__subproc_prefix__ * state.__proc_level__
                 elif end_proc:
-                    proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+                    proc_prefix = self.__subproc_prefix__ * state.__proc_level__
                     first_line = (
                         proc_prefix
                         + self.__start_proc_prefix__
@@ -263,8 +379,8 @@ class LoggerFormatter(logging.Formatter):
                         + self.__start_proc_prefix__
                         + self.__process_line_fmt__(messages[0], bold, success, fail)
                     )
-                    self.__proc_level__ += 1
-                    proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+                    state.__proc_level__ += 1
+                    proc_prefix = self.__subproc_prefix__ * state.__proc_level__
 
                 lines.append(first_line)
                 lines.extend(
@@ -275,8 +391,8 @@ class LoggerFormatter(logging.Formatter):
                     ]
                 )
 
-                self.__proc_level__ -= 1
-                proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+                state.__proc_level__ -= 1
+                proc_prefix = self.__subproc_prefix__ * state.__proc_level__
 
                 last_line = (
                     proc_prefix
@@ -301,7 +417,7 @@ class LoggerFormatter(logging.Formatter):
                     )
 
                 elif end_proc:
-                    proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+                    proc_prefix = self.__subproc_prefix__ * state.__proc_level__
                     message = (
                         proc_prefix
                         + self.__end_proc_prefix__
@@ -309,53 +425,262 @@ class LoggerFormatter(logging.Formatter):
                     )
 
                 else:
-                    proc_prefix = self.__subproc_prefix__ * self.__proc_level__
+                    proc_prefix = self.__subproc_prefix__ * state.__proc_level__
                     message = proc_prefix + self.__process_line_fmt__(
                         msg, bold, success, fail
                     )
 
                 lines.append(message)
 
-            if self._show_date:
-                prefix.append(color.dark_blue(timestamp))
-            if self._show_env:
-                prefix.append(color.purple(f"({env})"))
-            if self._show_level:
-                prefix.append(
-                    f"{LOGGER_LEVEL_COLORS.get(record.levelname, color.bold(record.levelname))}"
-                )
-            if self._show_file:
-                prefix.append(
-                    f"{color.dark_green(record.filename)}{color.orange(':')}{color.dark_green(str(record.lineno))}"
-                )
-
+            prefix = self.__prefix__(record, env, timestamp)
             message = (
-                delete_last
-                + " ".join(prefix)
-                + f" {lines[0]}"
-                + ("\n" if len(lines) > 1 else "")
-            )
-            message += "\n".join(
-                [(" ".join(prefix) + f" {line}").strip() for line in lines[1:]]
+                delete_last + prefix + f" {lines[0]}" + ("\n" if len(lines) > 1 else "")
             )
+            message += "\n".join([(prefix + f" {line}").strip() for line in lines[1:]])
             return message
         else:
-            if self._show_date:
-                prefix.append(f"{timestamp}")
+            return self.__prefix__(record, env, timestamp) + f" | {msg}"
+
+    def __prefix__(self, record, env: str, timestamp: str) -> str:
+        """Renders the line prefix, the env and level part is cached per (env, level)"""
+        key = (env, record.levelname)
+        static = self.__prefix_cache__.get(key)
+        if static is None:
+            parts = []
             if self._show_env:
-                prefix.append(f"({env})")
+                parts.append(color.purple(f"({env})") if self.colors else f"({env})")
             if self._show_level:
-                prefix.append(f"{record.levelname:9s}")
-            if self._show_file:
+                if self.colors:
+                    parts.append(
+                        LOGGER_LEVEL_COLORS.get(
+                            record.levelname, color.bold(record.levelname)
+                        )
+                    )
+                else:
+                    parts.append(f"{record.levelname:9s}")
+            static = " ".join(parts)
+            self.__prefix_cache__[key] = static
+        prefix = []
+        if self._show_date:
+            prefix.append(
+                f"{color.BLUE_DARK}{timestamp}{color.END}" if self.colors else timestamp
+            )
+        if static:
+            prefix.append(static)
+        if self._show_file:
+            if self.colors:
+                prefix.append(
+                    f"{FILE_COLOR}{record.filename}{FILE_LINE_SEPARATOR}{record.lineno}{color.END}"
+                )
+            else:
                 prefix.append(f"{record.filename}:{record.lineno}")
-            return " ".join(prefix) + f" | {msg}"
+        return " ".join(prefix)
+
+    def set_flags(self, **flags):
+        """Updates the displayed columns in place, dropping the cached prefixes
+
+        Args:
+            **flags: level, date, file and env booleans
+        """
+        self._show_level = flags.get("level", self._show_level)
+        self._show_date = flags.get("date", self._show_date)
+        self._show_file = flags.get("file", self._show_file)
+        self._show_env = flags.get("env", self._show_env)
+        self.__prefix_cache__ = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object, for NDJSON sinks
+
+    Every object has `timestamp`, `level`, `env`, `run_id` and `message`, the
+    `file` and `line` when known, and the fields bound with `Logger.fields`,
+    like the `command_id`, `command`, `stack` and `duration` of terraform commands.
+    """
+
+    def format(self, record):
+        args = record.args if isinstance(record.args, dict) else {}
+        message = record.msg if isinstance(record.msg, str) else str(record.msg)
+        if "\x1b" in message:
+            message = ANSI_ESCAPE_REGEX.sub("", message)
+        document = {
+            "timestamp": args.get("timestamp")
+            or datetime.datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "env": args.get("env", record.name),
+            "run_id": RUN_ID,
+            "message": message,
+        }
+        if record.lineno:
+            document["file"] = record.filename
+            document["line"] = record.lineno
+        fields = args.get("fields")
+        if fields:
+            document.update(fields)
+        return JSON_ENCODER.encode(document)
+
+
+class BufferedHandler:
+    """Handler mixin coalescing the formatted records into a single write
+
+    Pending records are written once `records` of them, `size` characters or
+    `interval` seconds since the first one are reached, right away for records
+    of `flush_level` and above, and on `flush()`.
+    """
+
+    def __init_buffer__(
+        self,
+        records: int = BUFFER_RECORDS,
+        size: int = BUFFER_BYTES,
+        interval: float = BUFFER_INTERVAL,
+        flush_level: int = logging.ERROR,
+    ):
+        self.buffer_records = records
+        self.buffer_size = size
+        self.buffer_interval = interval
+        self.flush_level = flush_level
+        self.__pending__ = []
+        self.__pending_size__ = 0
+        self.deadline = None
+
+    def emit(self, record):
+        try:
+            text = self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return
+        if not self.__pending__:
+            self.deadline = time() + self.buffer_interval
+        self.__pending__.append(text)
+        self.__pending_size__ += len(text)
+        if (
+            len(self.__pending__) >= self.buffer_records
+            or self.__pending_size__ >= self.buffer_size
+            or record.levelno >= self.flush_level
+        ):
+            self.flush()
+
+    def __write__(self, text: str):
+        self.stream.write(text)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.__pending__:
+                text = "".join(self.__pending__)
+                self.__pending__ = []
+                self.__pending_size__ = 0
+                self.deadline = None
+                try:
+                    self.__write__(text)
+                except (OSError, ValueError):
+                    # The stream was closed, like a captured stdout at exit
+                    return
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+            if self.stream and hasattr(self.stream, "flush"):
+                try:
+                    self.stream.flush()
+                except (OSError, ValueError):
+                    pass
+        finally:
+            self.release()
+
+
+class BufferedStreamHandler(BufferedHandler, logging.StreamHandler):
+    """StreamHandler writing its records in batches"""
+
+    def __init__(self, stream=None, **buffer):
+        logging.StreamHandler.__init__(self, stream)
+        self.__init_buffer__(**buffer)
+
+
+class BufferedRotatingFileHandler(
+    BufferedHandler, logging.handlers.RotatingFileHandler
+):
+    """RotatingFileHandler writing its records in batches
+
+    The size limit is checked once per batch from the written size, instead of
+    seeking the file for every record.
+    """
+
+    def __init__(
+        self,
+        filename,
+        maxBytes=0,
+        backupCount=0,
+        encoding=None,
+        delay=False,
+        **buffer,
+    ):
+        logging.handlers.RotatingFileHandler.__init__(
+            self,
+            filename,
+            maxBytes=maxBytes,
+            backupCount=backupCount,
+            encoding=encoding,
+            delay=delay,
+        )
+        self.__init_buffer__(**buffer)
+        self.__size__ = None
+
+    def __write__(self, text: str):
+        if self.stream is None:
+            self.stream = self._open()
+            self.__size__ = None
+        if self.__size__ is None:
+            self.stream.seek(0, 2)
+            self.__size__ = self.stream.tell()
+        if (
+            self.maxBytes > 0
+            and self.__size__
+            and self.__size__ + len(text) >= self.maxBytes
+            and os.path.isfile(self.baseFilename)
+        ):
+            self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.__size__ = 0
+        self.stream.write(text)
+        self.__size__ += len(text)
+
+    def close(self):
+        self.flush()
+        logging.handlers.RotatingFileHandler.close(self)
 
 
 class Logger:
-    """Logger helper to pretty format and follow processes in the background."""
+    """Logger helper to pretty format and follow processes in the background.
+
+    Creating a logger is cheap: the handlers, the root logger setup, the
+    exception hook and the background thread are set up on first use.
+    """
+
+    # Attributes created by __setup__, reading any of them sets the logger up
+    __LAZY_ATTRIBUTES__ = frozenset(
+        (
+            "logger",
+            "console_handler",
+            "file_handler",
+            "json_handler",
+            "formatter",
+            "file_formatter",
+            "compact",
+        )
+    )
 
     def __init__(
-        self, env: str, log_file=None, max_log_size_mb=10, backup_count=5, colors=True
+        self,
+        env: str,
+        log_file=None,
+        max_log_size_mb=10,
+        backup_count=5,
+        colors=True,
+        compact=None,
+        heartbeat=HEARTBEAT_INTERVAL,
+        buffered=True,
+        json_file=None,
     ):
         """
         Initializes the logger.
@@ -365,59 +690,111 @@ class Logger:
             log_file (str, optional): Path to the log file.  If None, file logging is disabled.
             max_log_size_mb (int, optional): Maximum log file size in MB (only used if log_file is provided).
             backup_count (int, optional): Number of backup log files to keep (only used if log_file is provided).
+            compact (bool, optional): Plain console output with heartbeat lines instead of a spinner. Detected with `compact_output` if None.
+            heartbeat (float, optional): Seconds between the heartbeat lines of running tasks in compact mode.
+            buffered (bool, optional): Write the console and file records in batches, see `BufferedHandler`.
+            json_file (str, optional): Path of an NDJSON log file, see `JsonFormatter`. If None, it is disabled.
         """
         self.env = env
         self.__tasks__ = []
         self.__total_tasks__ = 0
         self.__end_tasks__ = []
         self.__log_queue__ = Queue()
+        # Output buffers flushed by the log thread at their deadline
+        self.__scheduled__ = set()
+        self.__scheduled_lock__ = Lock()
         self.__animation__ = ["⠙", "⠘", "⠰", "⠴", "⠤", "⠦", "⠆", "⠃", "⠋", "⠉"]
         self.v_separator = " "
         self.__enable_colors__ = colors
         self.__log_file__ = log_file
         self.__max_log_size__ = max_log_size_mb
         self.__backup_count__ = backup_count
+        self.__compact__ = compact
+        self.heartbeat = heartbeat
+        self.__buffered__ = buffered
+        self.__json_file__ = json_file
         # Configuration flags
         self.flags = {"file": True, "date": True, "env": True, "level": True}
-
-        # --- Standard Library Logging Setup ---
-        self.logger = logging.getLogger()
-        self.logger.setLevel(logging.DEBUG)  # Set the *root* logger to DEBUG
-
-        # Create a handler that outputs to the console (StreamHandler)
-        self.console_handler = None
-        self.file_handler = None  # Initialize to None
-        # Create a formatter
-        self.file_formatter: LoggerFormatter = None
-        self.formatter: LoggerFormatter = None
-        self.__custom_formatters__()
+        self.__console_level__ = logging.INFO  # Default console level
 
         # --- Threading for background tasks and logging ---
         self.__log_thread__: Thread = None
         self.__stop_event__ = Event()  # Use an Event for cleaner thread stopping
+        self.__animation_index__ = 0
+        self.__last_log__ = True
+        self.__started__ = False
+
+        self.__ready__ = False
+        self.__setup_lock__ = RLock()
+
+    def __getattr__(self, name: str):
+        # Only called for missing attributes, the lazy ones until __setup__ ran
+        if name in Logger.__LAZY_ATTRIBUTES__ and not self.__dict__.get("__ready__"):
+            self.__setup__()
+            return getattr(self, name)
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
+        )
 
-        self.__start_log_thread__()
-        __LOGGERS__.append(self)
+    def __setup__(self):
+        """Creates the handlers and starts the logger thread, on first use."""
+        with self.__setup_lock__:
+            if self.__ready__:
+                return
+            if self.__compact__ is None:
+                self.compact = compact_output()
+            else:
+                self.compact = self.__compact__
+
+            # --- Standard Library Logging Setup ---
+            self.logger = logging.getLogger()
+            self.logger.setLevel(logging.DEBUG)  # Set the *root* logger to DEBUG
+
+            # Create a handler that outputs to the console (StreamHandler)
+            self.console_handler = None
+            self.file_handler = None  # Initialize to None
+            self.json_handler = None
+            # Create a formatter
+            self.file_formatter: LoggerFormatter = None
+            self.formatter: LoggerFormatter = None
+            self.__custom_formatters__()
+
+            self.__ready__ = True
+            self.__start_log_thread__()
+            __LOGGERS__.append(self)
+            __install_hooks__()
 
     def __custom_formatters__(self):
         """Formats log messages with colors and additional info."""
         self.file_formatter = LoggerFormatter(
             colors=False, **self.flags, old=self.file_formatter
         )
-        self.formatter = LoggerFormatter(colors=True, **self.flags, old=self.formatter)
+        self.formatter = LoggerFormatter(
+            colors=self.__enable_colors__ and not self.compact,
+            **self.flags,
+            old=self.formatter,
+        )
 
         if self.console_handler is not None:
             self.logger.removeHandler(self.console_handler)
-        console_handler = logging.StreamHandler(sys.stdout)
+        if self.__buffered__:
+            console_handler = BufferedStreamHandler(sys.stdout)
+        else:
+            console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(self.formatter)  # Use custom formatter
-        console_handler.setLevel(logging.INFO)  # Default console level
+        console_handler.setLevel(self.__console_level__)
         self.console_handler = console_handler
         self.logger.addHandler(self.console_handler)
 
         if self.__log_file__:
             if self.file_handler is not None:
                 self.logger.removeHandler(self.file_handler)
-            file_handler = logging.handlers.RotatingFileHandler(
+            file_handler_class = (
+                BufferedRotatingFileHandler
+                if self.__buffered__
+                else logging.handlers.RotatingFileHandler
+            )
+            file_handler = file_handler_class(
                 self.__log_file__,
                 maxBytes=self.__max_log_size__ * 1024 * 1024,  # Convert MB to bytes
                 backupCount=self.__backup_count__,
@@ -429,92 +806,310 @@ class Logger:
             self.file_handler = file_handler
             self.logger.addHandler(file_handler)
 
-    def __process_log_queue__(self):
-        """Processes the log queue in a separate thread."""
-        animation_index = 0
-        last_message_log = True
-        started = False
-        cycle_start = time()
-        delta = 0.2
-        while not self.__stop_event__.is_set() or not self.__log_queue__.empty():
-            cycle_period = time()
-            try:
-                # Get a task from the queue.  Use a timeout to allow checking _stop_event.
-                num_tasks = len(self.__tasks__)  # +1 for the current task
-                if num_tasks > 0 and (cycle_period - cycle_start) >= delta:
-                    cycle_start = time()
-                    task = self.__tasks__[0]
-                    message, start_time, now, frame, level_value = (
-                        task["message"],
-                        task["start_time"],
-                        task["now"],
-                        task["frame"],
-                        task["level"],
-                    )
-                    log_message = f"{message} ({num_tasks} bg tasks) {self.__animation__[animation_index]} ({format_elapsed_time(start_time, time())})"
-
-                    self.log("RUNNING", log_message, frame=task["frame"])
-                    # sleep(0.1)
-                    # self.remove_line()
-                    animation_index = (animation_index + 1) % len(self.__animation__)
-
-                if len(self.__end_tasks__) > 0:
-                    for task in self.__end_tasks__.copy():
-                        self.__end_tasks__.remove(task)
-                        if task["success"]:
-                            log_level = "COMPLETED"
-                            log_msg = f"{task['message']} ✅ ({format_elapsed_time(task['start_time'], time())}){task['postfix']}"
-                        else:
-                            log_level = "FAILED"
-                            log_msg = f"{task['message']} ❌ ({format_elapsed_time(task['start_time'], time())}){task['postfix']}"
-
-                        self.log(log_level, log_msg, frame=task["frame"])
-
-                if not self.__log_queue__.empty():
-                    log_event = self.__log_queue__.get(timeout=0.1)
-                    filename = (
-                        "/".join(
-                            log_event["frame"].f_code.co_filename.split(os.sep)[-2:]
-                        )
-                        if log_event["frame"]
-                        else "unknown"
-                    )
-                    line = log_event["frame"].f_lineno if log_event["frame"] else 0
-
-                    # Use standard library logging, but format as before.
-                    log_record = self.logger.makeRecord(
-                        self.env,
-                        log_event["level"],
-                        filename,
-                        line,
-                        log_event["log"],
+        if self.__json_file__:
+            self.__add_json_handler__(self.__json_file__)
+
+    def add_json_sink(self, path: str):
+        """Logs every record, DEBUG included, as NDJSON to the given file
+
+        Args:
+            path (str): NDJSON file, rotated like the text log file
+        """
+        if not self.__ready__:
+            self.__json_file__ = path
+            return
+        self.__add_json_handler__(path)
+
+    def __add_json_handler__(self, path: str):
+        if self.json_handler is not None:
+            self.logger.removeHandler(self.json_handler)
+            self.json_handler.close()
+        handler_class = (
+            BufferedRotatingFileHandler
+            if self.__buffered__
+            else logging.handlers.RotatingFileHandler
+        )
+        self.__json_file__ = path
+        self.json_handler = handler_class(
+            path,
+            maxBytes=self.__max_log_size__ * 1024 * 1024,
+            backupCount=self.__backup_count__,
+            encoding="utf-8",
+            delay=True,
+        )
+        self.json_handler.setFormatter(JsonFormatter())
+        self.json_handler.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.json_handler)
+
+    def __handlers__(self) -> list:
+        return [
+            handler
+            for handler in (self.console_handler, self.file_handler, self.json_handler)
+            if handler is not None
+        ]
+
+    def __render_spinner__(self):
+        """Logs the next animation frame of the oldest running task, a heartbeat line in compact mode."""
+        num_tasks = len(self.__tasks__)
+        if num_tasks == 0:
+            return
+        task = self.__tasks__[0]
+        message, start_time = task["message"], task["start_time"]
+        elapsed = format_elapsed_time(start_time, time())
+        if task.get("eta"):
+            remaining = start_time + task["eta"] - time()
+            if remaining > 0:
+                remaining = format_elapsed_time(0, max(1, round(remaining)))
+                elapsed += f" - ETA ~{remaining}"
+            else:
+                elapsed += " - over the expected time"
+        if self.compact:
+            log_message = f"{message} ({num_tasks} bg tasks) still running ({elapsed})"
+            self.__handle_event__(
+                self.__event__(
+                    "RUNNING",
+                    log_message,
+                    task["frame"],
+                    context=task["context"],
+                    fields=task["fields"],
+                )
+            )
+            return
+        frame = self.__animation__[self.__animation_index__]
+        log_message = f"{message} ({num_tasks} bg tasks) {frame} ({elapsed})"
+        self.__animation_index__ = (self.__animation_index__ + 1) % len(
+            self.__animation__
+        )
+        self.__handle_event__(
+            self.__event__(
+                "RUNNING",
+                log_message,
+                task["frame"],
+                context=task["context"],
+                fields=task["fields"],
+            )
+        )
+
+    def __flush_end_tasks__(self):
+        """Logs the result of the finished tasks."""
+        while self.__end_tasks__:
+            task = self.__end_tasks__.pop(0)
+            elapsed = format_elapsed_time(task["start_time"], time())
+            if task["success"]:
+                log_level = "COMPLETED"
+                log_msg = f"{task['message']} ✅ ({elapsed}){task['postfix']}"
+            else:
+                log_level = "FAILED"
+                log_msg = f"{task['message']} ❌ ({elapsed}){task['postfix']}"
+            self.__handle_event__(
+                self.__event__(
+                    log_level,
+                    log_msg,
+                    task["frame"],
+                    context=task["context"],
+                    fields=task["fields"],
+                )
+            )
+
+    def __handle_passthrough__(self, log_event: dict):
+        """Writes a chunk of command output as is, the file gets one prefix line per chunk."""
+        level = LOGGER_LEVELS["ERROR" if log_event["error"] else "INFO"]
+        chunk = log_event["log"]
+        context = log_event.get("context")
+        env = context.env if context is not None else self.env
+        stream = "stderr" if log_event["error"] else "stdout"
+        if self.console_handler is not None and level >= self.console_handler.level:
+            message = chunk
+            if not self.__last_log__ and self.__started__ and not self.compact:
+                message = "\033[A\033[K" + message  # Replace the spinner line
+            self.console_handler.handle(
+                self.logger.makeRecord(
+                    env, level, "output", 0, message, ({"raw": True},), None
+                )
+            )
+        if self.file_handler is not None and level >= self.file_handler.level:
+            lines = chunk.count("\n") + 1
+            for message, raw in ((f"{stream}, {lines} lines", False), (chunk, True)):
+                self.file_handler.handle(
+                    self.logger.makeRecord(
+                        env,
+                        level,
+                        "output",
+                        0,
+                        message,
                         (
                             {
                                 "timestamp": log_event["timestamp"],
-                                "last_log": last_message_log,
-                                "started": started,
-                                "env": self.env,
-                                "bold": log_event["bold"],
-                                "start_proc": log_event["start_proc"],
-                                "end_proc": log_event["end_proc"],
-                                "raw": log_event["raw"],
+                                "env": env,
+                                "raw": raw,
                             },
                         ),
                         None,
                     )
-                    self.logger.handle(log_record)
-                    if LOGGER_LEVELS["RUNNING"] == log_event["level"]:
-                        last_message_log = False
-                    else:
-                        last_message_log = True
-                    if not started:
-                        started = True
-                    if log_event["raise"]:
-                        raise Exception(message)
+                )
+        if self.json_handler is not None and level >= self.json_handler.level:
+            self.json_handler.handle(
+                self.logger.makeRecord(
+                    env,
+                    level,
+                    "output",
+                    0,
+                    chunk,
+                    (
+                        {
+                            "timestamp": log_event["timestamp"],
+                            "env": env,
+                            "fields": {
+                                **(log_event.get("fields") or {}),
+                                "stream": stream,
+                            },
+                        },
+                    ),
+                    None,
+                )
+            )
+        self.__last_log__ = True
+        self.__started__ = True
+
+    def __handle_event__(self, log_event: dict):
+        """Formats and emits one queued log event."""
+        if log_event.get("passthrough"):
+            return self.__handle_passthrough__(log_event)
+        filename, line = log_event["frame"] or ("unknown", 0)
+        context = log_event.get("context")
+        env = context.env if context is not None else self.env
+
+        # Use standard library logging, but format as before.
+        log_record = self.logger.makeRecord(
+            env,
+            log_event["level"],
+            filename,
+            line,
+            log_event["log"],
+            (
+                {
+                    "timestamp": log_event["timestamp"],
+                    "last_log": self.__last_log__,
+                    "started": self.__started__,
+                    "env": env,
+                    "context": context,
+                    "fields": log_event.get("fields"),
+                    "bold": log_event["bold"],
+                    "start_proc": log_event["start_proc"],
+                    "end_proc": log_event["end_proc"],
+                    "raw": log_event["raw"],
+                },
+            ),
+            None,
+        )
+        self.logger.handle(log_record)
+        self.__last_log__ = LOGGER_LEVELS["RUNNING"] != log_event["level"]
+        self.__started__ = True
+
+    def __flush_handlers__(self, due_only=False):
+        """Writes the records pending in the buffered handlers
+
+        Args:
+            due_only (bool, optional): Only the handlers whose flush interval elapsed. Defaults to False.
+        """
+        now = time()
+        for handler in self.__handlers__():
+            if not isinstance(handler, BufferedHandler) or handler.deadline is None:
+                continue
+            if not due_only or handler.deadline <= now:
+                handler.flush()
+
+    def __scheduled_buffers__(self):
+        """Scheduled buffers still holding output, the flushed ones are dropped"""
+        with self.__scheduled_lock__:
+            self.__scheduled__ = {
+                buffer for buffer in self.__scheduled__ if buffer.deadline is not None
+            }
+            return list(self.__scheduled__)
+
+    def __flush_buffers__(self, due_only=False):
+        """Flushes the scheduled buffers, see `schedule_flush`
 
+        Args:
+            due_only (bool, optional): Only the buffers whose deadline passed. Defaults to False.
+
+        Returns:
+            int: Number of flushed buffers
+        """
+        now = time()
+        flushed = 0
+        for buffer in self.__scheduled_buffers__():
+            deadline = buffer.deadline
+            if deadline is not None and (not due_only or deadline <= now):
+                buffer.flush()
+                flushed += 1
+        return flushed
+
+    def __flush_deadline__(self):
+        """Earliest time a buffered handler has to be flushed at, None if nothing is pending"""
+        deadlines = [
+            handler.deadline
+            for handler in self.__handlers__()
+            if isinstance(handler, BufferedHandler) and handler.deadline is not None
+        ]
+        deadlines.extend(
+            buffer.deadline
+            for buffer in self.__scheduled_buffers__()
+            if buffer.deadline is not None
+        )
+        return min(deadlines, default=None)
+
+    def __process_log_queue__(self):
+        """Processes the log queue in a separate thread.
+
+        Blocks on the queue while idle, waking up only for new events, task
+        changes, the spinner frames of running tasks, pending buffered records
+        and the stop sentinel.
+        """
+        next_frame = None
+        stopping = False
+        while True:
+            delta = self.heartbeat if self.compact else SPINNER_INTERVAL
+            timeout = None
+            if self.__tasks__ and not stopping:
+                now = time()
+                if next_frame is None:
+                    next_frame = now + delta
+                timeout = max(0.0, next_frame - now)
+            else:
+                next_frame = None
+            deadline = self.__flush_deadline__()
+            if deadline is not None:
+                wait = max(0.0, deadline - time())
+                timeout = wait if timeout is None else min(timeout, wait)
+            try:
+                if stopping:
+                    log_event = self.__log_queue__.get_nowait()
+                else:
+                    log_event = self.__log_queue__.get(timeout=timeout)
+            except Empty:
+                log_event = None
+                if stopping and self.__flush_buffers__():
+                    # The flushed output is queued, write it before stopping
+                    continue
+                if stopping:
+                    self.__flush_end_tasks__()
+                    self.__flush_handlers__()
+                    break
+            try:
+                if log_event is __STOP__:
+                    # Drain what was queued before stopping
+                    stopping = True
+                elif log_event is not None and log_event is not __WAKE__:
+                    self.__handle_event__(log_event)
+                self.__flush_end_tasks__()
+                if next_frame is not None and time() >= next_frame:
+                    next_frame = time() + delta
+                    self.__render_spinner__()
+                self.__flush_buffers__(due_only=True)
+                self.__flush_handlers__(due_only=True)
             except Exception as e:
                 print(e)
-                raise e
 
     def __start_log_thread__(self):
         """Starts the log processing thread."""
@@ -526,39 +1121,137 @@ class Logger:
     def __get_message__(self, *messages) -> str:
         res = []
         for msg in messages:
+            if callable(msg):
+                msg = msg()
             if isinstance(msg, (dict, list)):  # Use isinstance for type checking
                 res.append(json.dumps(msg))
             else:
                 res.append(str(msg))
         return self.v_separator.join(res)
 
+    def __caller__(self, depth: int):
+        """(filename, lineno) of the caller `depth` frames up, None when the file column is hidden
+
+        Only the location is kept, so no frame and its locals outlive the log call.
+        """
+        if not self.flags["file"]:
+            return None
+        return __frame_info__(sys._getframe(depth + 1))
+
+    def __event__(self, level: str, message: str, frame=None, **args) -> dict:
+        return {
+            "context": args.get("context"),
+            "fields": args.get("fields"),
+            "level_name": level,
+            "level": LOGGER_LEVELS[level],
+            "log": message,
+            "frame": frame,
+            "timestamp": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "raise": False,
+            "bold": args.get("bold", False),
+            "start_proc": args.get("start_proc", False),
+            "end_proc": args.get("end_proc", False),
+            "raw": args.get("raw", False),
+        }
+
+    def enabled_for(self, level) -> bool:
+        """Whether any handler would emit a message of the given level
+
+        Args:
+            level (str|int): Level name or value
+        """
+        if isinstance(level, str):
+            level = LOGGER_LEVELS[level.upper()]
+        if level < self.logger.getEffectiveLevel():
+            return False
+        return any(level >= handler.level for handler in self.logger.handlers)
+
+    def __update_formatters__(self):
+        """Applies the flags to the existing formatters, handlers are kept"""
+        if not self.__ready__:
+            return  # The formatters are created with the current flags
+        for formatter in (self.formatter, self.file_formatter):
+            if formatter is not None:
+                formatter.set_flags(**self.flags)
+
     def set_env(self, env: str):
-        self.env = env
-        self.__custom_formatters__()
+        """Sets the env label of the active logging context, the default one without any"""
+        # The env is read from each record, the formatters don't depend on it
+        context = __LOG_CONTEXT__.get()
+        if context is not None:
+            context.env = env
+        else:
+            self.env = env
+
+    def context(self, env: str = None) -> LogContext:
+        """New logging context sharing this logger's output
+
+        Args:
+            env (str, optional): Env label of the context. Defaults to the current env.
+        """
+        return LogContext(env if env is not None else self.env)
+
+    @staticmethod
+    @contextmanager
+    def fields(**fields):
+        """Adds fields to the NDJSON records logged until the block exits"""
+        token = __LOG_FIELDS__.set({**__LOG_FIELDS__.get(), **fields})
+        try:
+            yield
+        finally:
+            __LOG_FIELDS__.reset(token)
+
+    @staticmethod
+    def current_fields() -> dict:
+        """NDJSON fields bound in the current thread or task"""
+        return __LOG_FIELDS__.get()
+
+    @staticmethod
+    def current_context() -> LogContext:
+        """Active logging context of the current thread or task, None if there is none"""
+        return __LOG_CONTEXT__.get()
 
     def set_level(self, level: str):
         """Set the logging level for the console handler."""
         level = level.upper()
         if level not in LOGGER_LEVELS:
             raise ValueError(f"Invalid log level: {level}")
-        self.console_handler.setLevel(LOGGER_LEVELS[level])
-        self.__custom_formatters__()
+        self.__console_level__ = LOGGER_LEVELS[level]
+        if self.__ready__:
+            self.console_handler.setLevel(self.__console_level__)
+
+    def set_compact(self, compact=True, heartbeat=None):
+        """Switch the console between the compact and the interactive output
+
+        Args:
+            compact (bool, optional): Plain output with heartbeat lines. Defaults to True.
+            heartbeat (float, optional): Seconds between heartbeat lines, unchanged if None.
+        """
+        if heartbeat is not None:
+            self.heartbeat = heartbeat
+        if not self.__ready__:
+            self.__compact__ = compact
+            return
+        self.compact = compact
+        self.formatter.colors = self.__enable_colors__ and not compact
+        self.formatter.set_flags()
+        self.__log_queue__.put_nowait(__WAKE__)
 
     def show_file(self, show=True):
         self.flags["file"] = show
-        self.__custom_formatters__()
+        self.__update_formatters__()
 
     def show_date(self, show=True):
         self.flags["date"] = show
-        self.__custom_formatters__()
+        self.__update_formatters__()
 
     def show_env(self, show=True):
         self.flags["env"] = show
-        self.__custom_formatters__()
+        self.__update_formatters__()
 
     def show_level(self, show=True):
         self.flags["level"] = show
-        self.__custom_formatters__()
+        self.__update_formatters__()
 
     def log(
         self,
@@ -574,19 +1267,26 @@ class Logger:
         """Logs a message at the specified level.
 
         Adds the log entry to the queue for processing in a separate thread.
+        Nothing is built or queued when no handler accepts the level, and
+        callable messages are only called when the message is logged.
         """
-        now = datetime.datetime.now().isoformat(timespec="milliseconds")
-
         level_value = LOGGER_LEVELS.get(level.upper())
         if level_value is None:
             raise ValueError(f"Invalid log level: {level}")
+        if not self.enabled_for(level_value):
+            return None
 
-        if not frame:
-            frame = inspect.currentframe().f_back.f_back
+        now = datetime.datetime.now().isoformat(timespec="milliseconds")
+        if frame is None:
+            frame = self.__caller__(2)
+        elif not isinstance(frame, tuple):
+            frame = __frame_info__(frame)
 
         message = self.__get_message__(*messages)
 
         body = {
+            "context": __LOG_CONTEXT__.get(),
+            "fields": __LOG_FIELDS__.get(),
             "level_name": level.upper(),
             "level": level_value,
             "log": message,
@@ -600,119 +1300,145 @@ class Logger:
         }
         return self.__log_queue__.put_nowait(body)
 
+    def passthrough(
+        self,
+        chunk: str,
+        error: bool = False,
+        context: LogContext = None,
+        fields: dict = None,
+    ):
+        """Queues a chunk of command output to be written as is
+
+        The whole chunk is a single queue entry and record, so large outputs skip
+        the per line formatting while staying in order with the other messages.
+
+        Args:
+            chunk (str): Output lines, without the trailing new line, empty for one blank line
+            error (bool, optional): The chunk comes from stderr, logged as ERROR. Defaults to False.
+            context (LogContext, optional): Context the output belongs to. Defaults to the active one.
+            fields (dict, optional): NDJSON fields of the output. Defaults to the active ones.
+        """
+        level = "ERROR" if error else "INFO"
+        if chunk is None or not self.enabled_for(level):
+            return None
+        return self.__log_queue__.put_nowait(
+            {
+                "passthrough": True,
+                "context": context or __LOG_CONTEXT__.get(),
+                "fields": fields if fields is not None else __LOG_FIELDS__.get(),
+                "error": error,
+                "log": chunk,
+                "timestamp": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            }
+        )
+
+    def schedule_flush(self, buffer):
+        """Calls `buffer.flush()` on the log thread once its deadline passed
+
+        Saves a timer thread per buffered chunk, the log thread already wakes up for
+        the deadlines of the buffered handlers.
+
+        Args:
+            buffer: Object with a `deadline` timestamp, None once flushed, and a `flush()` method
+        """
+        if not self.__ready__:
+            self.__setup__()
+        with self.__scheduled_lock__:
+            self.__scheduled__.add(buffer)
+        self.__log_queue__.put_nowait(__WAKE__)
+
     def sep(self):
         global HORIZONTAL_SEPARATOR
         """Prints a horizontal separator."""
         width = shutil.get_terminal_size((80, 20))[0]
-        frame = inspect.currentframe().f_back
         # Use logger to go through the queue
-        self.log("SEP", HORIZONTAL_SEPARATOR * width, frame=frame)
+        self.log("SEP", HORIZONTAL_SEPARATOR * width)
 
     def trace(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "TRACE",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def debug(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "DEBUG",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def info(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "INFO",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def success(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "SUCCESS",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def failed(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "FAILED",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def warn(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "WARNING",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def error(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "ERROR",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def critical(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "CRITICAL",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def done(self, *messages, start_sub=False, end_sub=False, raw=False):
-        frame = inspect.currentframe().f_back
         self.log(
             "DONE",
             *messages,
-            frame=frame,
             start_sub=start_sub,
             end_sub=end_sub,
             raw=raw,
         )
 
     def exception(self, *messages, _raise=True):
-        frame = inspect.currentframe().f_back
         self.log(
             "EXCEPTION",
             *messages,
-            frame=frame,
             _raise=_raise,
             start_sub=False,
             end_sub=False,
@@ -732,13 +1458,19 @@ class Logger:
         for i in range(num):
             self.remove_line()
 
-    def start(self, *messages) -> str:
-        """Starts a background task, adding it to the queue."""
+    def start(self, *messages, eta: float = None) -> str:
+        """Starts a background task, adding it to the queue.
+
+        Args:
+            eta (float, optional): Expected duration in seconds, the spinner shows the remaining time.
+        """
+        if not self.__ready__:
+            self.__setup__()
         start_time = time()
         message = self.__get_message__(*messages)
         self.__total_tasks__ += 1
         task_id = self.__total_tasks__
-        frame = inspect.currentframe().f_back
+        frame = self.__caller__(1)
         task = {
             "id": task_id,
             "message": message,
@@ -746,9 +1478,24 @@ class Logger:
             "now": datetime.datetime.now().isoformat(timespec="milliseconds"),
             "frame": frame,
             "level": LOGGER_LEVELS.get("RUNNING"),
+            "eta": eta,
+            "context": __LOG_CONTEXT__.get(),
+            "fields": __LOG_FIELDS__.get(),
         }
         # Put the log information into the queue
         self.__tasks__.append(task)
+        if self.compact:
+            # No spinner to show the task, log it once when it starts
+            self.__log_queue__.put_nowait(
+                self.__event__(
+                    "RUNNING",
+                    message,
+                    frame,
+                    context=task["context"],
+                    fields=task["fields"],
+                )
+            )
+        self.__log_queue__.put_nowait(__WAKE__)
 
         # # Start the processing thread if it's not already running
         # if self._task_thread is None or not self._task_thread.is_alive():
@@ -766,7 +1513,7 @@ class Logger:
         Instead we log a completion message, and the processing thread
         will eventually clear the queue.
         """
-        frame = inspect.currentframe().f_back
+        frame = self.__caller__(1)
         message = self.__get_message__(*messages)
         postfix = f" {message}" if message.strip() else ""
         # Find the task in the queue by ID and remove it
@@ -780,12 +1527,14 @@ class Logger:
         task["success"] = success
         task["frame"] = frame
         self.__end_tasks__.append(task.copy())
+        self.__log_queue__.put_nowait(__WAKE__)
 
     def clear_threads(self) -> None:
         """Stop any running task animation threads."""
         self.__stop_event__.set()
 
         if self.__log_thread__:
+            self.__log_queue__.put_nowait(__STOP__)
             self.__log_thread__.join()
             self.__log_thread__ = None
         self.__stop_event__.clear()
@@ -804,8 +1553,5 @@ log = Logger("default", "test.log")
 
 
 def __clean__():
-    global log
-    log.clear_threads()
-
-
-atexit.register(__clean__)
+    for logger in __LOGGERS__:
+        logger.clear_threads()
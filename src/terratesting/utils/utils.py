@@ -1,16 +1,18 @@
-import sys
-
-sys.path.append("..")
-
 import os
 import shlex
 import subprocess
+from queue import Empty, Queue
+from threading import Lock, Thread
 from time import time
-from typing import Any, Callable, List, Optional, Union
+from typing import IO, Any, Callable, Iterable, List, Optional, Union
 
 from ..classes import CommandError
 from .logger import log
 
+# Raw output is handed to the logger once a chunk reaches this size or age
+PASSTHROUGH_CHUNK_BYTES = 64 * 1024
+PASSTHROUGH_INTERVAL = 0.25
+
 
 def split_array_by_value(array: List[str], split_value: str) -> List[List[str]]:
     """
@@ -73,6 +75,59 @@ def cmd_to_array(cmd: str) -> List[List[str]]:
         return [[]]
 
 
+def arg_max() -> int:
+    """
+    Bytes available for the arguments of a new process.
+
+    Returns:
+        The system argument limit minus the current environment size and some
+        headroom, so a command line of that size is safe to execute
+    """
+    try:
+        limit = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        # Windows command lines are limited to 32767 characters
+        limit = 32767
+    env_size = sum(len(key) + len(value) + 2 for key, value in os.environ.items())
+    return max(4096, limit - env_size - 4096)
+
+
+def args_size(args: List[str]) -> int:
+    """
+    Size of the given arguments in the process argument area.
+
+    Args:
+        args: Command arguments
+
+    Returns:
+        The bytes used by the strings, their terminators and argv pointers
+    """
+    return sum(len(arg.encode("utf-8")) + 1 + 8 for arg in args if arg)
+
+
+def chunk_args(args: List[str], budget: int) -> List[List[str]]:
+    """
+    Split arguments into groups that each fit in the given size.
+
+    Args:
+        args: Arguments to split, order is kept
+        budget: Maximum size of each group as computed by args_size
+
+    Returns:
+        A list of argument groups, a single empty group if there are no arguments
+    """
+    chunks = [[]]
+    size = 0
+    for arg in args:
+        arg_size = args_size([arg])
+        if chunks[-1] and size + arg_size > budget:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(arg)
+        size += arg_size
+    return chunks
+
+
 class CommandResult:
     """
     Container for the results of a command execution.
@@ -110,15 +165,174 @@ class CommandResult:
             raise CommandError("Command failed", self.code, self.stdout, self.stderr)
 
 
+def __merge_outputs__(first: Any, second: Any) -> Any:
+    """Merge callback outputs of consecutive runs, counts are added up"""
+    if isinstance(first, dict) and isinstance(second, dict):
+        merged = dict(first)
+        for key, value in second.items():
+            merged[key] = (
+                __merge_outputs__(merged[key], value) if key in merged else value
+            )
+        return merged
+    if isinstance(first, list) and isinstance(second, list):
+        return first + second
+    if (
+        isinstance(first, (int, float))
+        and isinstance(second, (int, float))
+        and not isinstance(first, bool)
+        and not isinstance(second, bool)
+    ):
+        return first + second
+    return second if second is not None else first
+
+
+def merge_command_results(results: List[CommandResult]) -> CommandResult:
+    """
+    Merge the results of sequential runs of a split command.
+
+    Args:
+        results: Results in execution order
+
+    Returns:
+        A CommandResult that fails if any run failed, with joined outputs, merged
+        callback outputs and the total duration
+    """
+    if len(results) == 1:
+        return results[0]
+    failed = [result for result in results if not result.success]
+    callback_output = None
+    line_callback_output = []
+    for result in results:
+        callback_output = __merge_outputs__(callback_output, result.callback_output)
+        line_callback_output.extend(result.line_callback_output)
+    merged = CommandResult(
+        not failed,
+        failed[0].code if failed else max(result.code for result in results),
+        "\n".join(result.command for result in results),
+        "".join(result.stdout for result in results),
+        "".join(result.stderr for result in results),
+        callback_output,
+        line_callback_output,
+    )
+    merged.duration = round(sum(result.duration for result in results), 4)
+    return merged
+
+
+class OutputBuffer:
+    """Buffers raw command output and passes it to the logger in large chunks
+
+    A chunk is flushed once it holds `size` bytes or `interval` seconds after its
+    first line, so slow outputs still show up while they are written. The timed
+    flushes run on the log thread, see `Logger.schedule_flush`.
+
+    Args:
+        error (bool, optional): The output comes from stderr. Defaults to False.
+        size (int, optional): Bytes buffered before a flush. Defaults to PASSTHROUGH_CHUNK_BYTES.
+        interval (float, optional): Seconds a line stays buffered at most. Defaults to PASSTHROUGH_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        error: bool = False,
+        size: int = PASSTHROUGH_CHUNK_BYTES,
+        interval: float = PASSTHROUGH_INTERVAL,
+    ):
+        self.error = error
+        self.size = size
+        self.interval = interval
+        self.deadline: Optional[float] = None
+        self.__lines__ = []
+        self.__bytes__ = 0
+        # Flushes may run on the log thread, keep the logging context and fields
+        self.__context__ = log.current_context()
+        self.__fields__ = log.current_fields()
+        self.__lock__ = Lock()
+
+    def write(self, line: str):
+        with self.__lock__:
+            self.__lines__.append(line)
+            self.__bytes__ += len(line)
+            if self.__bytes__ < self.size:
+                if self.deadline is None:
+                    self.deadline = time() + self.interval
+                    log.schedule_flush(self)
+                return
+        self.flush()
+
+    def flush(self):
+        with self.__lock__:
+            self.deadline = None
+            if self.__lines__:
+                chunk = "".join(self.__lines__)
+                # Only the line end of the last line, blank lines are output too
+                if chunk.endswith("\n"):
+                    chunk = chunk[:-1]
+                log.passthrough(
+                    chunk,
+                    error=self.error,
+                    context=self.__context__,
+                    fields=self.__fields__,
+                )
+            self.__lines__ = []
+            self.__bytes__ = 0
+
+
+def __read_lines__(pipe: IO[bytes], lines: Queue) -> None:
+    """
+    Read a process output pipe line by line into a queue until it is closed.
+
+    Args:
+        pipe: The stdout or stderr pipe of the child process
+        lines: Queue receiving the decoded lines
+    """
+    for line in iter(pipe.readline, b""):
+        lines.put(line.decode("utf-8", errors="ignore"))
+
+
+def __feed_stdin__(
+    pipe: IO[bytes], stdin: Union[bytes, str, IO, Iterable[Union[bytes, str]]]
+) -> None:
+    """
+    Write the given input into a process stdin pipe and close it.
+
+    Args:
+        pipe: The stdin pipe of the child process
+        stdin: Bytes, string, readable stream or iterable of chunks to write
+    """
+    try:
+        if isinstance(stdin, str):
+            pipe.write(stdin.encode("utf-8"))
+        elif isinstance(stdin, (bytes, bytearray, memoryview)):
+            pipe.write(stdin)
+        elif hasattr(stdin, "read"):
+            while True:
+                chunk = stdin.read(64 * 1024)
+                if not chunk:
+                    break
+                pipe.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        else:
+            for chunk in stdin:
+                pipe.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    except BrokenPipeError:
+        # The child exited before consuming all the input, its exit code tells why
+        pass
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
+
+
 def run_command(
     cmd: Union[List[str], List[List[str]]],
     line_callback: Optional[Callable[[str, str], Any]] = None,
     callback: Optional[Callable[[str, str], Any]] = None,
-    show_output: bool = True,
+    show_output: Union[bool, str] = True,
     cwd: str = ".",
     title: str = "",
     env: Optional[dict] = None,
     timeout: Optional[int] = None,
+    stdin: Optional[Union[bytes, str, IO, Iterable[Union[bytes, str]]]] = None,
 ) -> CommandResult:
     """
     Execute a command with optional callbacks for line-by-line processing.
@@ -127,11 +341,15 @@ def run_command(
         cmd: Command to execute, either a single list or a list of lists for piping
         line_callback: Optional callback function called for each line of output
         callback: Optional callback function called with complete stdout and stderr
-        show_output: Whether to display output in the logs
+        show_output: Whether to display output in the logs, `"raw"` writes it as is in
+            buffered chunks instead of one log record per line
         cwd: Working directory for the command
         title: Optional title to display in logs
         env: Optional environment variables to pass to the subprocess
         timeout: Optional timeout in seconds
+        stdin: Optional input for the (first) process, either bytes, a string, a readable
+            stream or an iterable of chunks. It is written from a background thread so
+            large inputs never block the output reading loop
 
     Returns:
         CommandResult object containing execution results
@@ -151,6 +369,7 @@ def run_command(
         if cwd != ".":
             log.info(f"Working directory: {cwd}")
 
+    stdin_pipe = None
     try:
         if isinstance(cmd[0], list):
             print(cmd)
@@ -159,10 +378,12 @@ def run_command(
                 cmd[0],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE if stdin is not None else None,
                 cwd=cwd,
                 env=process_env,
                 # universal_newlines=True,
             )
+            stdin_pipe = proc.stdin
             for _cmd in cmd[1:]:
                 _cmd = clean_command(_cmd)
                 proc = subprocess.Popen(
@@ -180,19 +401,33 @@ def run_command(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE if stdin is not None else None,
                 cwd=cwd,
                 env=process_env,
                 # universal_newlines=True,
             )
+            stdin_pipe = proc.stdin
     except FileNotFoundError as e:
         raise CommandError(e.strerror, 127, "", f"Command not found: {e}")
     except Exception as e:
         raise CommandError(e.with_traceback(), proc.returncode, "", proc.stderr.read())
 
-    stdout = ""
-    stderr = ""
+    stdout_lines = []
+    stderr_lines = []
     line_callback_result = []
 
+    raw_output = show_output == "raw"
+    if raw_output:
+        stdout_buffer = OutputBuffer()
+        stderr_buffer = OutputBuffer(error=True)
+
+    stdin_thread = None
+    if stdin is not None and stdin_pipe is not None:
+        stdin_thread = Thread(
+            target=__feed_stdin__, args=(stdin_pipe, stdin), daemon=True
+        )
+        stdin_thread.start()
+
     try:
         # Use a timeout if specified
         if timeout:
@@ -201,25 +436,19 @@ def run_command(
         else:
             proc_timeout = None
 
-        while True:
-            line = proc.stdout.readline().decode("utf-8", errors="ignore")
-            error_line = proc.stderr.readline().decode("utf-8", errors="ignore")
-
-            if not line and not error_line:
-                break
-
-            # try:
-
+        def handle_lines(line: str, error_line: str):
             if error_line:
-                # No need to decode since we're using text mode
-                stderr += error_line
-                if show_output:
+                stderr_lines.append(error_line)
+                if raw_output:
+                    stderr_buffer.write(error_line)
+                elif show_output:
                     log.error(error_line.rstrip())
 
             if line:
-                # No need to decode since we're using text mode
-                stdout += line
-                if show_output:
+                stdout_lines.append(line)
+                if raw_output:
+                    stdout_buffer.write(line)
+                elif show_output:
                     log.info(line.rstrip())
 
             if line_callback:
@@ -230,7 +459,34 @@ def run_command(
                 except Exception as e:
                     log.error(e)
 
+        def handle_errors():
+            while True:
+                try:
+                    handle_lines("", error_lines.get_nowait())
+                except Empty:
+                    return
+
+        # stderr is read in the background, reading both pipes line by line in turns
+        # blocks as soon as one of them fills up while the other one has nothing
+        error_lines = Queue()
+        stderr_thread = Thread(
+            target=__read_lines__, args=(proc.stderr, error_lines), daemon=True
+        )
+        stderr_thread.start()
+        for line in iter(proc.stdout.readline, b""):
+            handle_lines(line.decode("utf-8", errors="ignore"), "")
+            handle_errors()
+        stderr_thread.join()
+        handle_errors()
+        stdout = "".join(stdout_lines)
+        stderr = "".join(stderr_lines)
+
+        if raw_output:
+            stdout_buffer.flush()
+            stderr_buffer.flush()
         proc.wait(timeout=proc_timeout)
+        if stdin_thread is not None:
+            stdin_thread.join()
         res_callback = None
         if callback:
             try:
@@ -250,21 +506,27 @@ def run_command(
         )
     except subprocess.TimeoutExpired as e:
         proc.kill()
+        if raw_output:
+            stdout_buffer.flush()
+            stderr_buffer.flush()
         log.error(f"Command timed out after {timeout} seconds")
         raise CommandError(
             e.cmd,
             -1,
-            stdout,
-            stderr + f"\nCommand timed out after {timeout} seconds",
+            "".join(stdout_lines),
+            "".join(stderr_lines) + f"\nCommand timed out after {timeout} seconds",
         )
     except Exception as e:
         proc.kill()
+        if raw_output:
+            stdout_buffer.flush()
+            stderr_buffer.flush()
         log.error(f"Exception during command execution: {str(e)}")
         import json
 
         raise CommandError(
             json.dumps(e.args),
             -1,
-            stdout,
-            stderr + f"\nException during execution: {str(e)}",
+            "".join(stdout_lines),
+            "".join(stderr_lines) + f"\nException during execution: {str(e)}",
         )
@@ -0,0 +1,66 @@
+"""Import time benchmark, run with `python tests/benchmarks/import_bench.py`"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SIDE_EFFECTS = """
+import logging, sys, threading
+hook = sys.excepthook
+import terratesting
+print(json.dumps(dict(
+    threads=threading.active_count(),
+    root_handlers=len(logging.getLogger().handlers),
+    excepthook_replaced=sys.excepthook is not hook,
+    logger_ready=terratesting.log.__ready__,
+)))
+"""
+
+
+def python(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    # Cached bytecode, like an installed package, so only the import work is measured
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, env=env, **kwargs
+    )
+
+
+def import_times(module: str = "terratesting") -> dict:
+    """Self and cumulative microseconds of each module imported by `module`"""
+    stderr = python("-X", "importtime", "-c", f"import {module}").stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, total, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(own), int(total))
+    return times
+
+
+def bench_import(runs: int = 10, module: str = "terratesting") -> dict:
+    """Median wall time of `import module` in a fresh interpreter"""
+    import_times(module)  # Writes the bytecode cache
+    totals = [import_times(module)[module][1] / 1000 for _ in range(runs)]
+    return dict(median_ms=statistics.median(totals), min_ms=min(totals))
+
+
+def slowest_modules(count: int = 10, module: str = "terratesting") -> list:
+    times = import_times(module)
+    return sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:count]
+
+
+def side_effects() -> dict:
+    """What importing the package does before anything is logged"""
+    return json.loads(python("-c", "import json\n" + SIDE_EFFECTS).stdout)
+
+
+if __name__ == "__main__":
+    for key, value in bench_import().items():
+        print(f"{key}: {value:.1f}")
+    for name, (own, total) in slowest_modules():
+        print(f"{name}: {own / 1000:.2f}ms self, {total / 1000:.2f}ms total")
+    for key, value in side_effects().items():
+        print(f"{key}: {value}")
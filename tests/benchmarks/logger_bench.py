@@ -0,0 +1,102 @@
+"""Logger micro benchmarks, run with `python tests/benchmarks/logger_bench.py`"""
+
+import logging
+import os
+import time
+
+from terratesting.utils import log
+from terratesting.utils.logger import LoggerFormatter
+
+
+def silence():
+    log.console_handler.setStream(open(os.devnull, "w"))
+    if log.file_handler is not None:
+        log.logger.removeHandler(log.file_handler)
+
+
+def bench_idle(seconds: float = 2.0) -> float:
+    """CPU seconds used by the process per wall second while nothing is logged"""
+    log.info("warm up")
+    time.sleep(0.2)
+    start = time.process_time()
+    time.sleep(seconds)
+    return (time.process_time() - start) / seconds
+
+
+def bench_messages(count: int = 20000) -> dict:
+    """Caller side cost of a log call and the time until the queue is drained"""
+    start = time.perf_counter()
+    for index in range(count):
+        log.info("benchmark message", index)
+    enqueued = time.perf_counter() - start
+    log.clear_threads()
+    drained = time.perf_counter() - start
+    log.__start_log_thread__()
+    return dict(
+        per_call_us=enqueued / count * 1e6,
+        per_message_us=drained / count * 1e6,
+        messages_per_second=count / drained,
+    )
+
+
+def bench_suppressed(count: int = 200000) -> float:
+    """Microseconds per call of a level no handler accepts"""
+    payload = {"resources": list(range(1000))}
+    start = time.perf_counter()
+    for _ in range(count):
+        log.trace(payload)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench_formatting(count: int = 50000) -> dict:
+    """Lines per second formatted by the colored and the plain formatter"""
+    rates = {}
+    for colors in (True, False):
+        formatter = LoggerFormatter(colors=colors)
+        record = logging.LogRecord(
+            "bench", logging.INFO, "bench.py", 1, "benchmark message", None, None
+        )
+        record.args = dict(env="bench", last_log=True)
+        start = time.perf_counter()
+        for _ in range(count):
+            formatter.format(record)
+        rates["colored" if colors else "plain"] = count / (time.perf_counter() - start)
+    return rates
+
+
+class CountingStream:
+    def __init__(self):
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes += 1
+
+    def flush(self):
+        self.flushes += 1
+
+
+def bench_writes(count: int = 20000) -> dict:
+    """Console writes and flushes per logged line, one of each without buffering"""
+    stream = CountingStream()
+    previous = log.console_handler.setStream(stream)
+    for index in range(count):
+        log.info("benchmark message", index)
+    log.clear_threads()
+    log.__start_log_thread__()
+    log.console_handler.setStream(previous)
+    return dict(
+        writes_per_line=stream.writes / count, flushes_per_line=stream.flushes / count
+    )
+
+
+if __name__ == "__main__":
+    silence()
+    print(f"idle CPU: {bench_idle() * 100:.2f}% of a core")
+    print(f"suppressed call: {bench_suppressed():.2f}us")
+    for key, value in bench_formatting().items():
+        print(f"{key} lines per second: {value:.0f}")
+    for key, value in bench_writes().items():
+        print(f"{key}: {value:.4f}")
+    for key, value in bench_messages().items():
+        print(f"{key}: {value:.1f}")
@@ -0,0 +1,90 @@
+import pytest
+
+from terratesting import TerraformError
+from terratesting.classes import DependencyGraph
+
+LEGACY_DOT = r"""digraph {
+	compound = "true"
+	newrank = "true"
+	subgraph "root" {
+		"[root] aws_instance.web (expand)" [label = "aws_instance.web", shape = "box"]
+		"[root] aws_subnet.main (expand)" [label = "aws_subnet.main", shape = "box"]
+		"[root] aws_vpc.main (expand)" [label = "aws_vpc.main", shape = "box"]
+		"[root] data.aws_ami.ubuntu (expand)" [label = "data.aws_ami.ubuntu", shape = "box"]
+		"[root] provider[\"registry.terraform.io/hashicorp/aws\"]" [label = "provider[\"registry.terraform.io/hashicorp/aws\"]", shape = "diamond"]
+		"[root] var.region" [label = "var.region", shape = "note"]
+		"[root] aws_instance.web (expand)" -> "[root] aws_subnet.main (expand)"
+		"[root] aws_instance.web (expand)" -> "[root] data.aws_ami.ubuntu (expand)"
+		"[root] aws_subnet.main (expand)" -> "[root] aws_vpc.main (expand)"
+		"[root] aws_vpc.main (expand)" -> "[root] provider[\"registry.terraform.io/hashicorp/aws\"]"
+		"[root] data.aws_ami.ubuntu (expand)" -> "[root] provider[\"registry.terraform.io/hashicorp/aws\"]"
+		"[root] provider[\"registry.terraform.io/hashicorp/aws\"]" -> "[root] var.region"
+		"[root] root" -> "[root] aws_instance.web (expand)"
+	}
+}
+"""
+
+MODERN_DOT = """digraph G {
+  rankdir = "RL";
+  node [shape = rect, fontname = "sans-serif"];
+  "aws_instance.web" [label="aws_instance.web"];
+  "module.net.aws_vpc.this" [label="module.net.aws_vpc.this"];
+  "aws_instance.web" -> "module.net.aws_vpc.this";
+}
+"""
+
+
+def test_graph_parses_legacy_dot():
+    """Test that nodes are normalized and classified."""
+    graph = DependencyGraph.from_dot(LEGACY_DOT)
+
+    assert "root" not in graph
+    assert graph.nodes["aws_instance.web"].kind == "resource"
+    assert graph.nodes["data.aws_ami.ubuntu"].kind == "data"
+    assert graph.nodes["var.region"].kind == "variable"
+    assert graph.nodes["aws_vpc.main"].provider.startswith("provider[")
+    assert graph.ancestors("aws_subnet.main") == {
+        "aws_vpc.main",
+        'provider["registry.terraform.io/hashicorp/aws"]',
+        "var.region",
+    }
+    assert graph.descendants("aws_vpc.main") == {"aws_subnet.main", "aws_instance.web"}
+
+
+def test_graph_parses_modern_dot():
+    """Test that the terraform 1.7+ format is parsed."""
+    graph = DependencyGraph.from_dot(MODERN_DOT)
+
+    assert graph.nodes["module.net.aws_vpc.this"].module == "module.net"
+    assert graph.dependencies["aws_instance.web"] == {"module.net.aws_vpc.this"}
+
+
+def test_graph_layers_and_report():
+    """Test the layering of the resource subgraph and its width/depth report."""
+    graph = DependencyGraph.from_dot(LEGACY_DOT).subgraph()
+
+    assert graph.layers() == [
+        ["aws_vpc.main", "data.aws_ami.ubuntu"],
+        ["aws_subnet.main"],
+        ["aws_instance.web"],
+    ]
+    report = graph.report()
+    assert report["depth"] == 3
+    assert report["width"] == 2
+    assert report["cycles"] == []
+    assert graph.minimal_targets(["aws_vpc.main", "aws_instance.web"]) == [
+        "aws_instance.web"
+    ]
+
+
+def test_graph_cycles():
+    """Test that cycles are reported and block the layering."""
+    graph = DependencyGraph()
+    graph.add_edge("a.x", "b.x")
+    graph.add_edge("b.x", "c.x")
+    graph.add_edge("c.x", "a.x")
+    graph.add_edge("d.x", "a.x")
+
+    assert graph.cycles() == [["a.x", "b.x", "c.x"]]
+    with pytest.raises(TerraformError):
+        graph.layers()
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from terratesting.classes import DurationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DurationStore(str(tmp_path / "history.db"))
+
+
+def test_history_summary_percentiles(store):
+    """Test that percentiles are computed over the successful runs."""
+    for duration in range(1, 11):
+        store.record("/stack", "default", "plan", float(duration))
+    store.record("/stack", "default", "plan", 500.0, success=False)
+
+    summary = store.summary("/stack", "default", "plan", percentiles=(50, 90))
+
+    assert summary["count"] == 10
+    assert summary["p50"] == 5.5
+    assert summary["p90"] == pytest.approx(9.1)
+    assert store.predict("/stack", "other", "plan") is None
+
+
+def test_history_records_changes(store):
+    """Test that change counts are stored next to the duration."""
+    store.record(
+        "/stack", "dev", "apply", 3.0, resources=2, changes={"add": 2, "remove": 1}
+    )
+
+    run = store.runs("/stack", "dev", "apply")[0]
+
+    assert (run["resources"], run["changes_add"], run["changes_remove"]) == (2, 2, 1)
+
+
+def test_history_predict_fleet_longest_first(store):
+    """Test that the fleet prediction orders stacks and schedules them on workers."""
+    for stack, duration in (("a", 10.0), ("b", 30.0), ("c", 20.0)):
+        store.record(os.path.abspath(stack), "default", "plan", duration)
+
+    fleet = store.predict_fleet(["a", "b", "c", "d"], workers=2)
+
+    assert [os.path.basename(stack) for stack, _, _ in fleet["order"]] == [
+        "b",
+        "c",
+        "a",
+    ]
+    assert fleet["total"] == 30.0
+    assert fleet["unknown"] == [(os.path.abspath("d"), "default")]
+
+
+def test_history_keeps_latest_runs(tmp_path):
+    """Test that only the latest runs of each command are kept."""
+    store = DurationStore(str(tmp_path / "history.db"), limit=3)
+    for duration in range(1, 6):
+        store.record("/stack", "default", "plan", float(duration))
+    store.record("/stack", "default", "apply", 1.0)
+
+    runs = store.runs("/stack", "default", "plan", limit=10)
+
+    assert [run["duration"] for run in runs] == [5.0, 4.0, 3.0]
+    assert len(store.runs("/stack", "default", "apply")) == 1
@@ -0,0 +1,231 @@
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from terratesting.utils import log
+from terratesting.utils.logger import (
+    BufferedRotatingFileHandler,
+    BufferedStreamHandler,
+    JsonFormatter,
+    LoggerFormatter,
+    RUN_ID,
+    compact_output,
+)
+
+
+def test_logger_caller_is_a_location_not_a_frame():
+    """Test that only (filename, lineno) is captured, and only when shown."""
+    show_file = log.flags["file"]
+    try:
+        log.show_file(True)
+        line = sys._getframe().f_lineno + 1
+        caller = log.__caller__(0)
+        assert caller == ("tests/test_logger.py", line)
+
+        log.show_file(False)
+        assert log.__caller__(0) is None
+    finally:
+        log.show_file(show_file)
+
+
+def test_logger_skips_suppressed_levels():
+    """Test that suppressed levels build nothing and lazy messages are not called."""
+    calls = []
+
+    def payload():
+        calls.append(1)
+        return {"big": "result"}
+
+    assert log.enabled_for("TRACE") is False
+    assert log.trace(payload) is None
+    assert calls == []
+
+    log.warn(payload)
+    assert calls == [1]
+
+
+def test_logger_flags_keep_handlers():
+    """Test that env and display flags update the formatters in place."""
+    handlers = (log.console_handler, log.file_handler)
+    env = log.env
+    show_date = log.flags["date"]
+    try:
+        log.set_env("testing")
+        log.show_date(not show_date)
+        assert (log.console_handler, log.file_handler) == handlers
+        assert log.formatter._show_date is (not show_date)
+        assert log.formatter.__prefix_cache__ == {}
+    finally:
+        log.set_env(env)
+        log.show_date(show_date)
+
+
+def test_compact_output_detection(monkeypatch):
+    """Test that CI, NO_COLOR and non terminal streams select the compact mode."""
+
+    class Terminal(io.StringIO):
+        def isatty(self):
+            return True
+
+    monkeypatch.delenv("CI", raising=False)
+    monkeypatch.delenv("NO_COLOR", raising=False)
+    assert compact_output(Terminal()) is False
+    assert compact_output(io.StringIO()) is True
+
+    monkeypatch.setenv("CI", "false")
+    assert compact_output(Terminal()) is False
+    monkeypatch.setenv("CI", "true")
+    assert compact_output(Terminal()) is True
+
+    monkeypatch.delenv("CI")
+    monkeypatch.setenv("NO_COLOR", "1")
+    assert compact_output(Terminal()) is True
+
+
+def test_compact_mode_logs_heartbeats():
+    """Test that running tasks log plain heartbeat lines instead of spinner frames."""
+    compact, heartbeat = log.compact, log.heartbeat
+    events = []
+    handle_event = log.__handle_event__
+    log.__handle_event__ = events.append
+    try:
+        log.set_compact(True)
+        task = log.start("Applying")
+        log.__render_spinner__()
+        log.finish(task)
+    finally:
+        log.__handle_event__ = handle_event
+        log.set_compact(compact, heartbeat)
+
+    assert log.formatter.colors is (not compact and log.__enable_colors__)
+    heartbeats = [event for event in events if "still running" in event["log"]]
+    assert len(heartbeats) == 1
+    assert heartbeats[0]["level_name"] == "RUNNING"
+    assert "\033[" not in heartbeats[0]["log"]
+
+
+def test_log_contexts_keep_their_own_env_and_nesting():
+    """Test that concurrent contexts are labeled and nested independently."""
+    dev, prod = log.context("dev"), log.context("prod")
+    formatter = LoggerFormatter(colors=True, date=False, file=False, level=False)
+
+    def render(context, message, **args):
+        record = logging.LogRecord(
+            context.env, logging.INFO, "", 0, message, None, None
+        )
+        record.args = dict(env=context.env, context=context, **args)
+        return formatter.format(record)
+
+    render(dev, "dev", start_proc=True)
+    render(prod, "prod", start_proc=True)
+    assert render(dev, "inner").endswith("│ inner")
+    render(dev, "done", end_proc=True)
+    assert dev.__proc_level__ == 0
+    assert prod.__proc_level__ == 1
+
+    env = log.env
+    with dev.use():
+        assert log.current_context() is dev
+        log.set_env("staging")
+    assert dev.env == "staging"
+    assert log.env == env
+    assert log.current_context() is not dev
+
+
+def make_record(message, level=logging.INFO):
+    return logging.LogRecord("test", level, "", 0, message, None, None)
+
+
+def test_buffered_handler_flush_thresholds():
+    """Test that records are written in batches, and errors right away."""
+    stream = io.StringIO()
+    handler = BufferedStreamHandler(stream, records=3, size=1024, interval=60)
+
+    handler.handle(make_record("one"))
+    handler.handle(make_record("two"))
+    assert stream.getvalue() == ""
+    assert handler.deadline is not None
+
+    handler.handle(make_record("three"))
+    assert stream.getvalue() == "one\ntwo\nthree\n"
+    assert handler.deadline is None
+
+    handler.handle(make_record("failed", logging.ERROR))
+    assert stream.getvalue().endswith("failed\n")
+
+
+def test_buffered_file_handler_rotates(tmp_path):
+    """Test that the buffered file handler still rotates at the size limit."""
+    path = tmp_path / "test.log"
+    handler = BufferedRotatingFileHandler(
+        str(path), maxBytes=100, backupCount=2, delay=True, records=2
+    )
+    for index in range(20):
+        handler.handle(make_record(f"message {index:02d}"))
+    handler.close()
+
+    assert path.read_text().endswith("message 19\n")
+    assert (tmp_path / "test.log.1").exists()
+    assert all(
+        len(file.read_text()) <= 100 for file in tmp_path.iterdir() if file.is_file()
+    )
+
+
+def test_json_formatter_carries_command_fields():
+    """Test that NDJSON records hold the run id and the bound command fields."""
+    with log.fields(command_id="abc", command="plan"):
+        with log.fields(duration=1.5):
+            fields = log.current_fields()
+    assert log.current_fields() == {}
+
+    record = make_record("\x1b[32mPlan:\x1b[0m 1 to add")
+    record.args = dict(env="dev", timestamp="2024-01-01T00:00:00.000", fields=fields)
+    document = json.loads(JsonFormatter().format(record))
+
+    assert document == {
+        "timestamp": "2024-01-01T00:00:00.000",
+        "level": "INFO",
+        "env": "dev",
+        "run_id": RUN_ID,
+        "message": "Plan: 1 to add",
+        "command_id": "abc",
+        "command": "plan",
+        "duration": 1.5,
+    }
+
+
+def test_buffered_handler_ignores_closed_streams():
+    """Test that pending records are dropped when the stream was closed."""
+    stream = io.StringIO()
+    handler = BufferedStreamHandler(stream, interval=60)
+    handler.handle(make_record("late"))
+    stream.close()
+
+    handler.flush()
+
+    assert handler.deadline is None
+
+
+def test_import_has_no_logging_side_effects():
+    """Test that importing the package sets nothing up until the first log."""
+    script = (
+        "import logging, os, sys, threading\n"
+        "hook = sys.excepthook\n"
+        "import terratesting\n"
+        "assert threading.active_count() == 1\n"
+        "assert logging.getLogger().handlers == []\n"
+        "assert sys.excepthook is hook\n"
+        "assert 'TF_IN_AUTOMATION' not in os.environ\n"
+        "terratesting.log.info('first')\n"
+        "assert threading.active_count() == 2\n"
+        "assert sys.excepthook is not hook\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key != "TF_IN_AUTOMATION"}
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, env=env
+    )
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,84 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from terratesting.classes import ParallelismTuner, Workspace
+
+
+@pytest.fixture
+def tf(tmp_path, monkeypatch):
+    monkeypatch.delenv("TF_WORKSPACE", raising=False)
+    monkeypatch.delenv("TF_DATA_DIR", raising=False)
+    tf = MagicMock()
+    tf.chdir = str(tmp_path)
+    tf.env = {}
+    tf.paralellism = "auto"
+    tf.workspace = Workspace(tf, "default")
+    return tf
+
+
+def test_parallelism_signals_from_json_and_stderr():
+    """Test that throttling lines and resource operations are counted."""
+    stdout = "\n".join(
+        json.dumps(line)
+        for line in [
+            {"type": "apply_complete", "hook": {"elapsed_seconds": 2}},
+            {"type": "apply_complete", "hook": {"elapsed_seconds": 4}},
+            {"type": "diagnostic", "diagnostic": {"detail": "Rate exceeded"}},
+        ]
+    )
+
+    signals = ParallelismTuner.signals(stdout, "Error: TooManyRequests\n")
+
+    assert signals == dict(throttled=2, operations=2, durations=[2, 4])
+
+
+def test_parallelism_tuner_adapts_and_persists(tf):
+    """Test that throttled runs halve the parallelism and saturated runs raise it."""
+    tuner = ParallelismTuner(tf)
+    assert tuner.next() == 10
+
+    saturated = "\n".join(f"aws_s3_bucket.b{i}: Refreshing state..." for i in range(20))
+    tuner.observe(10, MagicMock(success=True, stdout=saturated, stderr=""))
+    assert tuner.next() == 12
+
+    tuner.observe(12, MagicMock(success=False, stdout="", stderr="Throttling"))
+    assert ParallelismTuner(tf).next() == 6
+    assert tuner.history()["throttled"] == 1
+
+
+def test_parallelism_signals_ignore_plan_values():
+    """Test that only stderr and error or warning blocks count as throttling."""
+    stdout = "\n".join(
+        [
+            "  # aws_lb_listener.web will be created",
+            '  + resource "aws_lb_listener" "web" {',
+            "      + port        = 429",
+            '      + description = "slow down"',
+            "    }",
+            "Plan: 1 to add, 0 to change, 0 to destroy.",
+            "╷",
+            "│ Warning: Rate exceeded, retrying",
+            "│ ",
+            "│ 429 Too Many Requests",
+            "╵",
+        ]
+    )
+
+    assert ParallelismTuner.signals(stdout, "")["throttled"] == 2
+    assert ParallelismTuner.signals(stdout.split("Plan:")[0], "")["throttled"] == 0
+
+
+def test_parallelism_tuner_holds_when_operations_slow_down(tf):
+    """Test that slower operations than the previous run stop the increase."""
+    tuner = ParallelismTuner(tf)
+
+    def run(seconds):
+        lines = [{"type": "apply_complete", "hook": {"elapsed_seconds": seconds}}]
+        stdout = "\n".join(json.dumps(line) for line in lines * 20)
+        return MagicMock(success=True, stdout=stdout, stderr="")
+
+    assert tuner.observe(10, run(1)) == 12
+    assert tuner.observe(12, run(2)) == 12
+    assert tuner.history()["mean_duration"] == 2
@@ -0,0 +1,84 @@
+import json
+
+from terratesting.classes import RefreshProfile
+
+
+def event(type, address, timestamp, resource_type, action=None):
+    return json.dumps(
+        {
+            "@timestamp": timestamp,
+            "type": type,
+            "hook": {
+                "resource": {
+                    "addr": address,
+                    "resource_type": resource_type,
+                    "implied_provider": resource_type.split("_")[0],
+                },
+                "action": action,
+            },
+        }
+    )
+
+
+def test_refresh_profile_from_plan_output():
+    """Test that refreshes and data source reads are ranked by type and provider."""
+    output = "\n".join(
+        [
+            event(
+                "refresh_start",
+                "aws_instance.a",
+                "2024-01-01T00:00:00Z",
+                "aws_instance",
+            ),
+            event(
+                "refresh_start",
+                "aws_instance.b",
+                "2024-01-01T00:00:00Z",
+                "aws_instance",
+            ),
+            event(
+                "refresh_complete",
+                "aws_instance.a",
+                "2024-01-01T00:00:01Z",
+                "aws_instance",
+            ),
+            event(
+                "refresh_complete",
+                "aws_instance.b",
+                "2024-01-01T00:00:03Z",
+                "aws_instance",
+            ),
+            event("apply_start", "data.http.x", "2024-01-01T00:00:00Z", "http", "read"),
+            event(
+                "apply_complete", "data.http.x", "2024-01-01T00:00:10Z", "http", "read"
+            ),
+        ]
+    )
+
+    report = RefreshProfile.from_plan_output(output).report()
+
+    assert report["operations"] == 3
+    assert report["total_time"] == 14
+    assert report["resources"][0]["key"] == "data.http.x"
+    assert report["types"][1] == dict(
+        key="aws_instance", count=2, total=4, mean=2, max=3, slowest="aws_instance.b"
+    )
+    assert [group["key"] for group in report["providers"]] == ["http", "aws"]
+
+
+def test_refresh_profile_from_trace():
+    """Test that the resource vertices of a trace log are timed."""
+    log = "\n".join(
+        [
+            '2024-01-01T00:00:00.000Z [TRACE] vertex "aws_s3_bucket.b (expand)": starting visit (*terraform.nodeExpandPlannableResource)',
+            '2024-01-01T00:00:00.500Z [TRACE] vertex "aws_s3_bucket.b": starting visit (*terraform.NodePlannableResourceInstance)',
+            '2024-01-01T00:00:02.500Z [TRACE] vertex "aws_s3_bucket.b": visit complete',
+            '2024-01-01T00:00:02.600Z [TRACE] vertex "var.region": visit complete',
+        ]
+    )
+
+    profile = RefreshProfile.from_trace(log)
+
+    assert [entry.address for entry in profile.timeline] == ["aws_s3_bucket.b"]
+    assert profile.total_time == 2
+    assert profile.aggregate("provider")[0]["key"] == "aws"
@@ -0,0 +1,157 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from terratesting import TerraformError
+from terratesting.classes import Outputs, State, StateSnapshot, Workspace
+
+STATE = {
+    "version": 4,
+    "serial": 3,
+    "lineage": "abc",
+    "outputs": {
+        "bucket": {"value": "test_bucket", "type": "string"},
+        "password": {"value": "secret", "type": "string", "sensitive": True},
+    },
+    "resources": [],
+}
+
+
+@pytest.fixture
+def tf(tmp_path, monkeypatch):
+    monkeypatch.delenv("TF_WORKSPACE", raising=False)
+    (tmp_path / "terraform.tfstate").write_text(json.dumps(STATE))
+    tf = MagicMock()
+    tf.chdir = str(tmp_path)
+    tf.env = {}
+    tf.workspace = Workspace(tf, "default")
+    tf.state = State(tf)
+    tf.outputs = Outputs(tf)
+    tf.cmd.return_value = MagicMock(
+        success=True, stdout=json.dumps(STATE), duration=0.1
+    )
+    return tf
+
+
+def test_outputs_pull_state_once(tf):
+    """Test that several outputs are read with a single state pull."""
+    values = tf.outputs.get_many(["bucket", "password"])
+
+    assert values == {"bucket": "test_bucket", "password": "secret"}
+    assert tf.outputs["bucket"] == "test_bucket"
+    assert tf.outputs.sensitive("password") is True
+    assert tf.outputs.type("bucket") == "string"
+    assert tf.cmd.call_count == 1
+
+
+def test_outputs_reload_after_invalidate(tf):
+    """Test that the snapshot is pulled again once the state changed."""
+    tf.outputs.get("bucket")
+    tf.state.invalidate()
+    tf.outputs.get("bucket")
+
+    assert tf.cmd.call_count == 2
+
+
+def test_outputs_missing_name_raises(tf):
+    """Test that unknown outputs raise a TerraformError."""
+    with pytest.raises(TerraformError):
+        tf.outputs.get_many(["bucket", "missing"])
+
+
+def test_state_snapshot_to_dict():
+    """Test the snapshot accessors."""
+    snapshot = StateSnapshot.from_json(json.dumps(STATE))
+
+    assert snapshot.serial == 3
+    assert snapshot.lineage == "abc"
+    assert snapshot.to_dict() == STATE
+
+
+def test_state_flag_instances_pushes_once(tf):
+    """Test that many instances are tainted with a single state push."""
+    state = dict(
+        STATE,
+        resources=[
+            {
+                "mode": "managed",
+                "type": "aws_instance",
+                "name": "web",
+                "instances": [{"index_key": i, "attributes": {}} for i in range(3)],
+            },
+            {
+                "module": "module.app",
+                "mode": "managed",
+                "type": "aws_instance",
+                "name": "api",
+                "instances": [{"index_key": "a", "attributes": {}}],
+            },
+        ],
+    )
+    tf.cmd.return_value = MagicMock(
+        success=True, stdout=json.dumps(state), duration=0.1
+    )
+
+    result = tf.state.flag_instances(
+        [
+            "aws_instance.web[0]",
+            "aws_instance.web[2]",
+            'module.app.aws_instance.api["a"]',
+        ]
+    )
+
+    assert len(result.result) == 3
+    assert tf.cmd.call_count == 2
+    pushed = json.loads(b"".join(tf.cmd.call_args.kwargs["stdin"]))
+    assert pushed["serial"] == state["serial"] + 1
+    statuses = [i.get("status") for i in pushed["resources"][0]["instances"]]
+    assert statuses == ["tainted", None, "tainted"]
+    assert pushed["resources"][1]["instances"][0]["status"] == "tainted"
+
+
+def test_state_flag_instances_missing_raises(tf):
+    """Test that unknown addresses raise unless allow_missing is set."""
+    with pytest.raises(TerraformError):
+        tf.state.flag_instances(["aws_instance.missing"])
+
+
+def test_refresh_age_tracks_serial(tf, tmp_path):
+    """Test that a recorded refresh is persisted and only fresh for the same serial."""
+    assert tf.state.refresh_age() is None
+
+    assert tf.state.mark_refreshed() is True
+    assert 0 <= State(tf).refresh_age() < 5
+    assert (tmp_path / ".terraform" / "terratesting" / "refresh.json").exists()
+
+    (tmp_path / "terraform.tfstate").write_text(json.dumps({**STATE, "serial": 4}))
+    assert tf.state.refresh_age() is None
+    tf.cmd.assert_not_called()
+
+
+def test_refresh_not_recorded_for_remote_state(tf, tmp_path):
+    """Test that remote backends are never recorded, their serial needs a pull."""
+    (tmp_path / ".terraform").mkdir()
+    (tmp_path / ".terraform" / "terraform.tfstate").write_text(
+        json.dumps({"backend": {"type": "s3", "config": {}}})
+    )
+
+    assert tf.state.mark_refreshed() is False
+    assert tf.state.refresh_age() is None
+    tf.cmd.assert_not_called()
+
+
+def test_remote_state_outputs_pull_once(tf, tmp_path):
+    """Test that remote state is pulled once for many reads, until refreshed."""
+    (tmp_path / ".terraform").mkdir()
+    (tmp_path / ".terraform" / "terraform.tfstate").write_text(
+        json.dumps({"backend": {"type": "s3", "config": {}}})
+    )
+
+    tf.outputs.get("bucket")
+    tf.outputs["bucket"]
+    tf.outputs.all()
+    assert tf.cmd.call_count == 1
+
+    tf.outputs.refresh()
+    assert tf.cmd.call_count == 2
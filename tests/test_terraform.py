@@ -1,7 +1,13 @@
 import pytest
 import json
+import threading
 from unittest.mock import patch, MagicMock
 from terratesting import Terraform, TerraformResult, TerraformError
+from terratesting.utils import CommandResult, log
+
+VERSION_OUTPUT = json.dumps(
+    {"terraform_version": "1.9.0", "terraform_outdated": False, "platform": "linux"}
+)
 
 
 @pytest.fixture
@@ -10,6 +16,49 @@ def mock_terraform():
     return Terraform()
 
 
+@pytest.fixture
+def fake_terraform(tmp_path, monkeypatch):
+    """Fixture to create a Terraform instance whose commands are answered by `respond`.
+
+    `respond(args, env)` returns `(code, stdout, stderr)`, every call is recorded
+    in the returned list with its `args`, `env`, `cwd` and `stdin`.
+    """
+
+    def make(respond=None, **kwargs):
+        calls = []
+
+        def run_command(
+            cmd, line_callback=None, callback=None, cwd=None, env=None, stdin=None, **_
+        ):
+            args = [arg for arg in cmd[1:] if not arg.startswith("-chdir=")]
+            calls.append(dict(args=args, env=env or {}, cwd=cwd, stdin=stdin))
+            if args[0] == "version":
+                code, stdout, stderr = 0, VERSION_OUTPUT, ""
+            elif respond is None:
+                code, stdout, stderr = 0, "", ""
+            else:
+                code, stdout, stderr = respond(args, env or {})
+            lines = []
+            if line_callback:
+                for line in stdout.splitlines():
+                    output = line_callback(line, None)
+                    if output is not None:
+                        lines.append(output)
+            output = callback(stdout, stderr) if callback else None
+            return CommandResult(
+                code == 0, code, " ".join(cmd), stdout, stderr, output, lines
+            )
+
+        monkeypatch.setattr("terratesting.terraform.run_command", run_command)
+        kwargs.setdefault("chdir", str(tmp_path))
+        kwargs.setdefault("history_file", None)
+        terraform = Terraform(**kwargs)
+        calls.clear()
+        return terraform, calls
+
+    return make
+
+
 @patch("terraform_python.Terraform.init")
 def test_terraform_init(mock_terraform):
     """Test Terraform initialization with default values."""
@@ -120,3 +169,326 @@ def test_terraform_show(mock_cmd, mock_terraform):
 
     assert result.success is True
     assert result.result["output"] == "success"
+
+
+def test_terraform_parse_vars_writes_var_file():
+    """Test that vars are written once to a content-hashed var file."""
+    vars = {"bucket_name": "test_bucket", "test_variable": {"test1": 1, "test2": None}}
+
+    args = Terraform.__parse_vars__(vars)
+    same_args = Terraform.__parse_vars__(dict(reversed(list(vars.items()))))
+
+    assert len(args) == 1
+    assert args == same_args
+    assert args[0].startswith("-var-file=")
+    with open(args[0].split("=", 1)[1]) as file:
+        assert json.load(file) == vars
+
+
+def test_terraform_plan_summary_callback():
+    """Test that change counts are read from JSON and human plan output."""
+    summary = {
+        "type": "change_summary",
+        "changes": {"add": 1, "change": 2, "remove": 0},
+    }
+
+    json_changes = Terraform.__plan_summary_callback__(json.dumps(summary) + "\n")
+    text_changes = Terraform.__plan_summary_callback__(
+        "Plan: 3 to add, 0 to change, 1 to destroy.\n"
+    )
+    no_changes = Terraform.__plan_summary_callback__("No changes.\n")
+
+    assert json_changes == summary["changes"]
+    assert text_changes == {"add": 3, "change": 0, "remove": 1}
+    assert no_changes == {"add": 0, "change": 0, "remove": 0}
+
+
+def test_terraform_for_each_workspace_isolates_views(fake_terraform, tmp_path):
+    """Test that each workspace runs with its own env, plan file and caches."""
+    for name in ("dev", "prod"):
+        (tmp_path / "terraform.tfstate.d" / name).mkdir(parents=True)
+    terraform, calls = fake_terraform()
+    terraform.__graphs__["key"] = "graph"
+
+    def job(view):
+        view.version_dict["version_str"] = view.workspace.current
+        view.cmd(["plan", f"-out={view.plan_file}"])
+        return view
+
+    results = terraform.for_each_workspace(["dev", "prod"], job)
+
+    views = {name: result.result for name, result in results.items()}
+    assert all(result.success for result in results.values())
+    assert {call["env"]["TF_WORKSPACE"] for call in calls} == {"dev", "prod"}
+    for name, view in views.items():
+        call = next(c for c in calls if c["env"]["TF_WORKSPACE"] == name)
+        assert call["args"] == ["plan", f"-out=plan.{name}.tfplan"]
+        assert view.plan_file == f"plan.{name}.tfplan"
+        assert view.__graphs__ == {}
+    assert views["dev"].version_dict is not views["prod"].version_dict
+    assert terraform.version_dict["version_str"] == "1.9.0"
+    assert terraform.__graphs__ == {"key": "graph"}
+    assert "TF_WORKSPACE" not in terraform.env
+
+
+def test_terraform_init_selects_requested_workspace(
+    fake_terraform, tmp_path, monkeypatch
+):
+    """Test that init selects the requested workspace after a list read the disk."""
+    monkeypatch.delenv("TF_WORKSPACE", raising=False)
+    terraform, calls = fake_terraform(workspace="dev")
+    (tmp_path / ".terraform").mkdir()
+    (tmp_path / ".terraform" / "environment").write_text("default")
+    (tmp_path / "terraform.tfstate.d" / "dev").mkdir(parents=True)
+
+    terraform.workspace.list(True)
+    terraform.init()
+
+    assert calls[-1]["args"][:2] == ["workspace", "select"]
+    assert calls[-1]["args"][-1] == "dev"
+
+
+def test_terraform_hcl_string_escapes_templates():
+    """Test that import ids are rendered as literal HCL strings."""
+    assert Terraform.__hcl_string__('a"b\\c') == '"a\\"b\\\\c"'
+    assert Terraform.__hcl_string__("${var.id}/%{if}") == '"$${var.id}/%%{if}"'
+
+
+def test_terraform_bulk_import_removes_files_on_failure(fake_terraform, tmp_path):
+    """Test that import blocks are rendered and the temp files removed on failure."""
+    rendered = []
+
+    def respond(args, env):
+        if args[0] == "plan":
+            rendered.extend(path.read_text() for path in tmp_path.glob("*.tf"))
+            out = next(arg for arg in args if arg.startswith("-out="))
+            (tmp_path / out.split("=", 1)[1]).write_text("plan")
+            return 1, "", "Error: invalid import id"
+        return 0, "", ""
+
+    terraform, calls = fake_terraform(respond)
+
+    with pytest.raises(TerraformError):
+        terraform.bulk_import(
+            {"aws_s3_bucket.logs": "logs", 'aws_s3_bucket.this["a"]': "${a}"}
+        )
+
+    assert rendered == [
+        'import {\n  to = aws_s3_bucket.logs\n  id = "logs"\n}\n\n'
+        'import {\n  to = aws_s3_bucket.this["a"]\n  id = "$${a}"\n}\n'
+    ]
+    assert list(tmp_path.glob("terratesting-imports-*")) == []
+
+
+def test_terraform_bulk_import_retries_state_lock(fake_terraform, monkeypatch):
+    """Test that one-by-one imports retry lock errors and stop on other errors."""
+    monkeypatch.setattr("terratesting.terraform.time.sleep", lambda seconds: None)
+    attempts = {}
+
+    def respond(args, env):
+        address = args[-2]
+        attempts[address] = attempts.get(address, 0) + 1
+        if address == "aws_s3_bucket.logs" and attempts[address] == 1:
+            return 1, "", "Error: Error acquiring the state lock"
+        if address == "aws_s3_bucket.data":
+            return 1, "", "Error: Cannot import non-existent remote object"
+        return 0, "", ""
+
+    terraform, calls = fake_terraform(respond)
+    terraform.version_dict["version"] = {"major": 1, "minor": 4, "patch": 6}
+
+    result = terraform.bulk_import(
+        {"aws_s3_bucket.logs": "logs", "aws_s3_bucket.data": "data"}
+    )
+
+    assert result.success is False
+    assert result.result["aws_s3_bucket.logs"].success is True
+    assert result.result["aws_s3_bucket.data"].success is False
+    assert attempts == {"aws_s3_bucket.logs": 2, "aws_s3_bucket.data": 1}
+    assert all("-lock-timeout=60s" in call["args"] for call in calls)
+
+
+def test_terraform_untaint_many_pushes_state_once(fake_terraform):
+    """Test that several addresses are untainted with one pull and one locked push."""
+    instances = [{"index_key": i, "status": "tainted"} for i in range(2)]
+    state = {
+        "version": 4,
+        "serial": 1,
+        "lineage": "abc",
+        "resources": [
+            {
+                "mode": "managed",
+                "type": "aws_instance",
+                "name": "web",
+                "instances": instances,
+            }
+        ],
+    }
+
+    def respond(args, env):
+        if args[:2] == ["state", "pull"]:
+            return 0, json.dumps(state), ""
+        return 0, "", ""
+
+    terraform, calls = fake_terraform(respond)
+
+    result = terraform.untaint(
+        ["aws_instance.web[0]", "aws_instance.web[1]", "aws_instance.web[0]"],
+        lock_timeout="30s",
+    )
+
+    assert result.result == ["aws_instance.web[0]", "aws_instance.web[1]"]
+    assert [call["args"][:2] for call in calls] == [
+        ["state", "pull"],
+        ["state", "push"],
+    ]
+    assert "-lock-timeout=30s" in calls[1]["args"]
+    pushed = json.loads(b"".join(calls[1]["stdin"]))
+    assert all("status" not in i for i in pushed["resources"][0]["instances"])
+    with pytest.raises(TerraformError):
+        terraform.untaint(["aws_instance.web[0]", "aws_instance.web[1]"], backup="b")
+
+
+def test_terraform_state_rm_many_addresses(fake_terraform):
+    """Test that several addresses are removed with a single state rm."""
+    terraform, calls = fake_terraform()
+
+    terraform.state.rm(
+        ['aws_instance.web["a"]', "aws_instance.api", "aws_instance.api"]
+    )
+
+    assert len(calls) == 1
+    assert calls[0]["args"][:2] == ["state", "rm"]
+    assert calls[0]["args"][-2:] == ['aws_instance.web["a"]', "aws_instance.api"]
+
+
+def test_terraform_taint_plans_replace(fake_terraform):
+    """Test that taint plans a replacement of every address on recent versions."""
+    terraform, calls = fake_terraform()
+
+    result = terraform.taint(["aws_instance.web[0]", "aws_instance.api"])
+    with pytest.raises(TerraformError):
+        terraform.taint("aws_instance.api", state_out="out.tfstate")
+
+    plan = next(call for call in calls if call["args"][0] == "plan")
+    assert "-replace=aws_instance.web[0]" in plan["args"]
+    assert "-replace=aws_instance.api" in plan["args"]
+    assert result.result["plan_files"] == ["plan.tfplan"]
+
+
+def test_terraform_apply_split_plan_plans_each_part_again(fake_terraform, monkeypatch):
+    """Test that the parts of a split plan are planned again after each apply."""
+    monkeypatch.setattr(
+        "terratesting.terraform.chunk_args",
+        lambda args, budget: [[arg] for arg in args] or [[]],
+    )
+    serial = {"value": 1}
+    plans = {}
+
+    def respond(args, env):
+        if args[0] == "plan":
+            out = next(arg for arg in args if arg.startswith("-out="))
+            plans[out.split("=", 1)[1]] = serial["value"]
+        elif args[0] == "apply":
+            if plans[args[-1]] != serial["value"]:
+                return 1, "", "Error: Saved plan is stale"
+            serial["value"] += 1
+        return 0, "", ""
+
+    terraform, calls = fake_terraform(respond)
+    targets = ["aws_instance.web", "aws_instance.api", "aws_instance.db"]
+
+    plan = terraform.plan(target=targets)
+    result = terraform.apply(plan_file=plan.result["plan_files"], replan=True)
+
+    assert result.success is True
+    assert serial["value"] == 4
+    assert [call["args"][0] for call in calls] == ["plan"] * 3 + [
+        "apply",
+        "plan",
+        "apply",
+        "plan",
+        "apply",
+    ]
+
+
+def test_terraform_apply_split_plan_needs_replan(fake_terraform, monkeypatch):
+    """Test that a split plan or split targets are not applied without replan."""
+    monkeypatch.setattr(
+        "terratesting.terraform.chunk_args",
+        lambda args, budget: [[arg] for arg in args] or [[]],
+    )
+    terraform, calls = fake_terraform(lambda args, env: (0, "", ""))
+    targets = ["aws_instance.web", "aws_instance.api"]
+
+    plan = terraform.plan(target=targets)
+    with pytest.raises(TerraformError, match="replan=True"):
+        terraform.apply(plan_file=plan.result["plan_files"])
+    with pytest.raises(TerraformError, match="saved plan file"):
+        terraform.apply(plan_file=plan.result["plan_files"][0], target=targets)
+
+    assert [call["args"][0] for call in calls] == ["plan"] * 2
+
+
+def test_terraform_plan_records_refresh_only_for_auto(fake_terraform, tmp_path):
+    """Test that only refresh="auto" plans record and skip refreshes."""
+    (tmp_path / "terraform.tfstate").write_text(
+        json.dumps({"version": 4, "serial": 7, "lineage": "abc"})
+    )
+    terraform, calls = fake_terraform()
+
+    terraform.plan()
+    assert terraform.state.refresh_age() is None
+    terraform.plan(refresh="auto")
+    terraform.plan(refresh="auto")
+
+    plans = [call["args"] for call in calls]
+    assert [args[0] for args in plans] == ["plan"] * 3
+    assert "-refresh=false" not in plans[1]
+    assert "-refresh=false" in plans[2]
+
+
+def test_terraform_history_skips_quick_commands(fake_terraform, tmp_path, monkeypatch):
+    """Test that quick commands are not recorded and the ETA matches the output mode."""
+    terraform, calls = fake_terraform(history_file=str(tmp_path / "history.db"))
+    stack = str(tmp_path)
+    predictions = []
+    terraform.history.predict = lambda *args: predictions.append(args) or 90
+    infos, tasks = [], []
+    monkeypatch.setattr(log, "info", lambda *messages, **kwargs: infos.append(messages))
+    monkeypatch.setattr(log, "start", lambda *messages, eta=None: tasks.append(eta))
+
+    terraform.version()
+    terraform.cmd(["plan"])
+    terraform.cmd(["plan"], show_output=False)
+
+    assert terraform.history.runs(stack, "default", "version") == []
+    assert len(terraform.history.runs(stack, "default", "plan")) == 2
+    assert predictions == [(stack, "default", "plan")] * 2
+    assert ("Terraform plan usually takes ~1min, 30s",) in infos
+    assert tasks == [90]
+
+
+def test_terraform_methods_log_in_their_instance_context(fake_terraform, monkeypatch):
+    """Test that instances used from several threads log under their own env."""
+    first, _ = fake_terraform()
+    second, _ = fake_terraform()
+    first.log_context.env, second.log_context.env = "dev", "prod"
+    seen = []
+
+    def record(*messages, **kwargs):
+        seen.append((threading.current_thread().name, log.current_context().env))
+
+    monkeypatch.setattr(log, "info", record)
+    monkeypatch.setattr(log, "success", record)
+    threads = [
+        threading.Thread(target=tf.version, name=tf.log_context.env)
+        for tf in (first, second)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert log.current_context() is None
+    assert sorted(seen) == [("dev", "dev")] * 2 + [("prod", "prod")] * 2
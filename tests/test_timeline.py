@@ -0,0 +1,61 @@
+import json
+
+from terratesting.classes import DependencyGraph, Timeline
+
+
+def event(type, address, timestamp, **hook):
+    return json.dumps(
+        {
+            "@timestamp": timestamp,
+            "type": type,
+            "hook": {"resource": {"addr": address}, "action": "create", **hook},
+        }
+    )
+
+
+OUTPUT = "\n".join(
+    [
+        event("apply_start", "aws_vpc.main", "2024-01-01T00:00:00.000000Z"),
+        event("apply_start", "aws_s3_bucket.logs", "2024-01-01T00:00:00.000000Z"),
+        event("apply_complete", "aws_s3_bucket.logs", "2024-01-01T00:00:02.000000Z"),
+        event("apply_complete", "aws_vpc.main", "2024-01-01T00:00:10.000000Z"),
+        event("apply_start", "aws_subnet.main[0]", "2024-01-01T00:00:10.500000Z"),
+        event("apply_start", "aws_subnet.main[1]", "2024-01-01T00:00:10.500000Z"),
+        event("apply_complete", "aws_subnet.main[0]", "2024-01-01T00:00:15.500000Z"),
+        event(
+            "apply_errored",
+            "aws_subnet.main[1]",
+            "2024-01-01T00:00:20.500000Z",
+            elapsed_seconds=10,
+        ),
+    ]
+)
+
+
+def test_timeline_from_apply_output():
+    """Test that start and end of each instance are read from the hooks."""
+    timeline = Timeline.from_output(OUTPUT)
+
+    assert len(timeline) == 4
+    assert timeline.wall_time == 20.5
+    assert timeline.entries["aws_vpc.main"].duration == 10
+    assert timeline.entries["aws_subnet.main[1]"].status == "errored"
+    assert timeline.slowest(1)[0].address == "aws_vpc.main"
+    assert timeline.idle_slots(2) == 2 * 20.5 - timeline.busy_time
+
+
+def test_timeline_critical_path_with_graph():
+    """Test that the critical path follows the resource dependencies."""
+    graph = DependencyGraph()
+    graph.add_edge("aws_subnet.main", "aws_vpc.main")
+    graph.add_node("aws_s3_bucket.logs")
+
+    report = Timeline.from_output(OUTPUT).report(parallelism=10, graph=graph)
+
+    assert [entry["address"] for entry in report["critical_path"]] == [
+        "aws_vpc.main",
+        "aws_subnet.main[1]",
+    ]
+    assert report["critical_path_time"] == 20
+    assert report["peak_concurrency"] == 2
+    assert report["errored"] == ["aws_subnet.main[1]"]
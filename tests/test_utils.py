@@ -0,0 +1,122 @@
+import io
+import json
+import sys
+import threading
+import time
+
+from terratesting.utils import (
+    OutputBuffer,
+    args_size,
+    chunk_args,
+    collapse_addresses,
+    log,
+    run_command,
+)
+from terratesting.classes.state import __state_chunks__
+
+
+def test_run_command_stdin_bytes():
+    """Test that bytes are written to the process stdin."""
+    result = run_command(["cat"], stdin=b"hello", show_output=False)
+
+    assert result.success is True
+    assert result.stdout == "hello"
+
+
+def test_run_command_stdin_stream():
+    """Test that readable streams are copied to the process stdin."""
+    result = run_command(
+        ["wc", "-c"], stdin=io.BytesIO(b"x" * 200000), show_output=False
+    )
+
+    assert result.success is True
+    assert result.stdout.strip() == "200000"
+
+
+def test_run_command_large_stdout_and_stderr():
+    """Test that outputs larger than the pipe buffers on both streams don't block."""
+    script = (
+        "import sys\n"
+        "for i in range(20000):\n"
+        "    print('line', i)\n"
+        "    print('error', i, file=sys.stderr)\n"
+    )
+    result = run_command([sys.executable, "-c", script], show_output="raw", timeout=60)
+
+    assert result.success is True
+    assert result.stdout.count("\n") == 20000
+    assert result.stderr.count("\n") == 20000
+
+
+def test_output_buffer_flushes_chunks(monkeypatch):
+    """Test that raw output is passed to the logger in chunks, not per line."""
+    chunks = []
+    monkeypatch.setattr(log, "passthrough", lambda chunk, **args: chunks.append(chunk))
+    buffer = OutputBuffer(size=100, interval=60)
+
+    for index in range(30):
+        buffer.write(f"line {index:02d}\n")
+    buffer.flush()
+
+    assert len(chunks) == 3
+    assert "\n".join(chunks).splitlines() == [f"line {i:02d}" for i in range(30)]
+
+
+def test_output_buffer_flushes_on_the_log_thread(monkeypatch):
+    """Test that timed flushes need no thread and keep the trailing blank lines."""
+    chunks = []
+    monkeypatch.setattr(log, "passthrough", lambda chunk, **args: chunks.append(chunk))
+    log.logger  # Starts the log thread
+    threads = threading.active_count()
+    buffer = OutputBuffer(interval=0.05)
+
+    for line in ("line\n", "\n", "\n"):
+        buffer.write(line)
+    assert threading.active_count() == threads
+    deadline = time.time() + 5
+    while not chunks and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert chunks == ["line\n\n"]
+    assert buffer.deadline is None
+
+
+def test_state_chunks_streams_json():
+    """Test that state objects are serialized in chunks."""
+    state = {"version": 4, "resources": [{"name": f"r{i}"} for i in range(5000)]}
+
+    chunks = list(__state_chunks__(state, chunk_size=1024))
+
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks)) == state
+
+
+def test_collapse_addresses_drops_nested():
+    """Test that duplicated and nested addresses are removed."""
+    addresses = [
+        "module.app",
+        "module.app.aws_instance.web",
+        'module.app["a"].aws_instance.web',
+        "aws_s3_bucket.b[0]",
+        "aws_s3_bucket.b",
+        "aws_s3_bucket.bb",
+        "module.app",
+    ]
+
+    assert collapse_addresses(addresses) == [
+        "module.app",
+        "aws_s3_bucket.b",
+        "aws_s3_bucket.bb",
+    ]
+
+
+def test_chunk_args_respects_budget():
+    """Test that arguments are split into groups that fit the budget."""
+    args = [f"-target=aws_instance.web[{i}]" for i in range(100)]
+    budget = args_size(args[:10])
+
+    chunks = chunk_args(args, budget)
+
+    assert len(chunks) > 9
+    assert [arg for chunk in chunks for arg in chunk] == args
+    assert all(args_size(chunk) <= budget for chunk in chunks)
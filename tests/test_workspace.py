@@ -0,0 +1,61 @@
+import json
+from unittest.mock import MagicMock
+
+from terratesting.classes import Workspace
+
+
+def make_workspace(path, name="default"):
+    tf = MagicMock()
+    tf.chdir = str(path)
+    tf.color = True
+    tf.env = {}
+    return Workspace(tf, name)
+
+
+def test_workspace_list_local_backend_from_disk(tmp_path, monkeypatch):
+    """Test that local workspaces are read without running terraform."""
+    monkeypatch.delenv("TF_WORKSPACE", raising=False)
+    (tmp_path / ".terraform").mkdir()
+    (tmp_path / ".terraform" / "environment").write_text("prod")
+    (tmp_path / "terraform.tfstate.d" / "prod").mkdir(parents=True)
+    (tmp_path / "terraform.tfstate.d" / "dev").mkdir()
+    workspace = make_workspace(tmp_path)
+
+    result = workspace.list(quiet=True)
+
+    assert result.result == ["default", "dev", "prod"]
+    assert workspace.current == "prod"
+    workspace._tf.cmd.assert_not_called()
+
+
+def test_workspace_list_remote_backend_is_cached(tmp_path, monkeypatch):
+    """Test that remote backends use the CLI once until invalidated."""
+    monkeypatch.delenv("TF_WORKSPACE", raising=False)
+    (tmp_path / ".terraform").mkdir()
+    (tmp_path / ".terraform" / "terraform.tfstate").write_text(
+        json.dumps({"backend": {"type": "s3", "config": {}}})
+    )
+    workspace = make_workspace(tmp_path)
+    workspace._tf.cmd.return_value = MagicMock(
+        success=True, stdout="  default\n* staging\n", duration=0.1
+    )
+
+    workspace.list(quiet=True)
+    result = workspace.list(quiet=True)
+
+    assert result.result == ["default", "staging"]
+    assert workspace._tf.cmd.call_count == 1
+    workspace.invalidate()
+    workspace.list(quiet=True)
+    assert workspace._tf.cmd.call_count == 2
+
+
+def test_workspace_current_follows_tf_workspace_override(tmp_path, monkeypatch):
+    """Test that per-instance TF_WORKSPACE wins over the selected workspace."""
+    monkeypatch.delenv("TF_WORKSPACE", raising=False)
+    (tmp_path / ".terraform").mkdir()
+    (tmp_path / ".terraform" / "environment").write_text("prod")
+    workspace = make_workspace(tmp_path)
+    workspace._tf.env = {"TF_WORKSPACE": "dev"}
+
+    assert workspace.current == "dev"